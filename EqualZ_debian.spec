@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['ziamath.fonts', 'colorbutton', 'latexeditor', 'renderlabel'],
+    hiddenimports=['ziamath.fonts', 'colorbutton', 'latexeditor', 'previewview'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
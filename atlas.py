@@ -0,0 +1,41 @@
+########################################
+# Shelf packing of rectangles into one or more atlases of at most
+# max_size x max_size. Rectangles are placed tallest first, left to right
+# into horizontal shelves, each in the first shelf (of any atlas) it fits
+# into. A rectangle larger than max_size gets an atlas of its own.
+# sizes is a list of (width, height), returns the position of each as
+# (atlas, x, y) in the same order, and the size of each atlas as
+# (width, height).
+########################################
+def pack(sizes, max_size=2048, padding=1):
+    positions = [None] * len(sizes)
+    atlases = []  # [width, height, shelves], a shelf is [y, height, used width]
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0])):
+        w, h = sizes[i]
+        positions[i] = _place(atlases, w, h, max_size, padding)
+    return positions, [(atlas[0], atlas[1]) for atlas in atlases]
+
+
+########################################
+#
+########################################
+def _place(atlases, w, h, max_size, padding):
+    for a, atlas in enumerate(atlases):
+        if atlas[0] > max_size or atlas[1] > max_size:
+            # of an oversized rectangle
+            continue
+        for shelf in atlas[2]:
+            x = shelf[2] + padding if shelf[2] else 0
+            if h <= shelf[1] and x + w <= max_size:
+                shelf[2] = x + w
+                atlas[0] = max(atlas[0], x + w)
+                return a, x, shelf[0]
+        y = atlas[1] + padding
+        # a new shelf must not widen the atlas beyond max_size either
+        if w <= max_size and y + h <= max_size:
+            atlas[2].append([y, h, w])
+            atlas[0] = max(atlas[0], w)
+            atlas[1] = y + h
+            return a, 0, y
+    atlases.append([w, h, [[0, h, w]]])
+    return len(atlases) - 1, 0, 0
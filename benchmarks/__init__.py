@@ -0,0 +1 @@
+"""Benchmarks of the render pipeline, see README.md."""
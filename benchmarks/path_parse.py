@@ -0,0 +1,74 @@
+"""
+Benchmark of the SVG path parser in cairosvg_min.
+
+Parses paths of growing length and prints the time per path segment, which
+should stay (roughly) constant if parsing is linear:
+
+    python -m benchmarks.path_parse
+    python -m benchmarks.path_parse --segments 1000 10000 100000
+
+"""
+
+import argparse
+import time
+
+from cairosvg_min import Document
+from cairosvg_min.path import parse_path
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"/>'
+
+
+class PathNode(dict):
+    """Minimal stand-in for a parsed <path> node."""
+
+
+def make_path(segments):
+    """Return a "d" attribute with a mix of commands and number formats."""
+    commands = []
+    for i in range(segments):
+        kind = i % 4
+        if kind == 0:
+            commands.append(f'c{i % 7}.5-{i % 5}.25 {i % 3},{i % 11}.125 '
+                            f'{i % 13}-.75')
+        elif kind == 1:
+            commands.append(f'L{i % 17}.5 {i % 19}e-1')
+        elif kind == 2:
+            commands.append(f'a5 5 0 01{i % 7} {i % 3}')
+        else:
+            commands.append(f'h{i % 23}.5v-{i % 29}')
+    return 'M0 0' + ''.join(commands) + 'z'
+
+
+def benchmark(segments, repeat=3):
+    """Return the best parse time in seconds for a path of ``segments``."""
+    surface = Document(SVG).record()
+    d = make_path(segments)
+    best = None
+    for _ in range(repeat):
+        surface.context.new_path()
+        t = time.perf_counter()
+        parse_path(surface, PathNode(d=d), d)
+        t = time.perf_counter() - t
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main(argv=None):
+    """Entry-point of the benchmark."""
+    parser = argparse.ArgumentParser(
+        prog='path_parse', description='Benchmark the SVG path parser')
+    parser.add_argument(
+        '--segments', nargs='+', type=int, default=[1000, 10000, 100000],
+        help='path lengths in segments')
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='runs per path, best is kept')
+    options = parser.parse_args(argv)
+
+    print(f'{"segments":>10} {"total ms":>10} {"us/segment":>12}')
+    for segments in options.segments:
+        t = benchmark(segments, options.repeat)
+        print(f'{segments:>10} {t * 1000:>10.1f} {t / segments * 1e6:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
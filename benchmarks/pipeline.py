@@ -0,0 +1,330 @@
+"""
+Benchmark of the equation render pipeline.
+
+Renders a corpus of equations - all symbols and templates from the resources
+folder plus long Text mode documents - through the same functions as the app
+(renderer.render_recording() and replay_image()) and times each stage
+separately:
+
+    layout  ziamath layout
+    svg     ziamath SVG output (includes the layout for Text mode, which
+            ziamath lays out lazily)
+    parse   cairosvg Document parsing (renderer.compile_svg)
+    draw    drawing into a cairo recording surface (renderer.record_svg,
+            without its cache of recent recordings)
+    replay  replaying the recording to an ARGB32 image surface
+            (renderer.replay_image)
+    encode  PNG encoding
+    decode  PNG decoding with Qt
+
+Reports p50/p95 latency per stage, throughput and peak RSS. Results can be
+saved as JSON and compared with a stored baseline, regressions are listed
+and make the exit status 1. Run it from the root folder of the repository:
+
+    python -m benchmarks.pipeline -o results.json
+    python -m benchmarks.pipeline --baseline results.json
+
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+from PyQt5.QtCore import QSettings
+from PyQt5.QtGui import QImage
+
+from cairosvg_min import path
+from renderer import (
+    DEFAULT_COLOR, DEFAULT_FONTSIZE, ENGINE_VERSION, RenderMode, compile_svg,
+    image_to_png, layout, replay_image)
+
+RES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resources')
+
+STAGES = ('layout', 'svg', 'parse', 'draw', 'replay', 'encode', 'decode')
+
+# paragraphs of the generated Text mode documents
+TEXT_DOCUMENT_SIZES = (10, 25, 50)
+
+
+def load_corpus():
+    """Return the corpus as list of ``(group, name, tex, render_mode)``."""
+    corpus = []
+
+    settings = QSettings(
+        os.path.join(RES_DIR, 'symbols', 'symbols.ini'), QSettings.IniFormat)
+    for group in settings.childGroups():
+        settings.beginGroup(group)
+        for i in range(1, int(settings.value('symbols/size')) + 1):
+            corpus.append((
+                'symbols', f"{group}/{settings.value(f'symbols/{i}/name')}",
+                settings.value(f'symbols/{i}/latex'), RenderMode.Display))
+        settings.endGroup()
+
+    templates = []
+    settings = QSettings(
+        os.path.join(RES_DIR, 'templates', 'templates.ini'),
+        QSettings.IniFormat)
+    for group in settings.childGroups():
+        settings.beginGroup(group)
+        for key in settings.allKeys():
+            tex = settings.value(key)
+            if type(tex) == list:
+                tex = ','.join(tex)
+            templates.append(tex)
+            corpus.append((
+                'templates', f'{group}/{os.path.splitext(key)[0]}', tex,
+                RenderMode.Display))
+        settings.endGroup()
+
+    for size in TEXT_DOCUMENT_SIZES:
+        corpus.append((
+            'text', f'document-{size}', make_document(templates, size),
+            RenderMode.Text))
+
+    return corpus
+
+
+def make_document(templates, paragraphs):
+    """Return a Text mode document mixing prose, inline and display math."""
+    lines = []
+    for i in range(paragraphs):
+        inline = templates[i % len(templates)]
+        display = templates[(i * 7 + 3) % len(templates)]
+        lines.append(
+            f'In step {i + 1} the term ${inline}$ is substituted into '
+            f'$${display}$$ which simplifies the remaining expression.')
+    return '\n'.join(lines)
+
+
+def render_stages(tex, render_mode, fontsize):
+    """Render a single equation, return the stage times in seconds.
+
+    These are the steps of ``renderer.render_recording()`` followed by
+    ``replay_image()``, as for the history and exports. ``record_svg()`` is
+    split into its parse and draw steps, which also bypasses its cache.
+
+    """
+    times = {}
+    t = time.perf_counter()
+    res = layout(tex, render_mode, fontsize, DEFAULT_COLOR)
+    times['layout'], t = time.perf_counter() - t, time.perf_counter()
+    svg = res.svg()
+    times['svg'], t = time.perf_counter() - t, time.perf_counter()
+    document = compile_svg(svg)
+    times['parse'], t = time.perf_counter() - t, time.perf_counter()
+    recording = document.record()
+    times['draw'], t = time.perf_counter() - t, time.perf_counter()
+    image = replay_image(recording)
+    times['replay'], t = time.perf_counter() - t, time.perf_counter()
+    png = image_to_png(image)
+    times['encode'], t = time.perf_counter() - t, time.perf_counter()
+    if QImage.fromData(png, 'png').isNull():
+        raise ValueError('PNG decoding failed')
+    times['decode'] = time.perf_counter() - t
+    return times
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of the sorted ``values``."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(samples):
+    """Return p50/p95/mean in milliseconds for a list of seconds."""
+    samples = sorted(samples)
+    return {
+        'p50_ms': percentile(samples, .5) * 1000,
+        'p95_ms': percentile(samples, .95) * 1000,
+        'mean_ms': sum(samples) / len(samples) * 1000 if samples else 0,
+    }
+
+
+def peak_rss():
+    """Return the peak resident set size in bytes, or None if unknown."""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+                process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run(corpus, repeat=5, warmup=1, fontsize=DEFAULT_FONTSIZE, cold=False):
+    """Run the benchmark, return the results as JSON-serializable dict."""
+    stage_samples = {stage: [] for stage in STAGES}
+    total_samples = []
+    group_samples = {}
+    failures = {}
+
+    t_start = time.perf_counter()
+    rendered = 0
+    for i in range(warmup + repeat):
+        for group, name, tex, render_mode in corpus:
+            if name in failures:
+                continue
+            if cold:
+                path.PATH_CACHE.clear()
+            try:
+                times = render_stages(tex, render_mode, fontsize)
+            except Exception as e:
+                failures[name] = f'{type(e).__name__}: {e}'
+                continue
+            if i < warmup:
+                continue
+            rendered += 1
+            total = sum(times.values())
+            total_samples.append(total)
+            group_samples.setdefault(group, []).append(total)
+            for stage, t in times.items():
+                stage_samples[stage].append(t)
+        if i == warmup - 1:
+            t_start = time.perf_counter()
+    elapsed = time.perf_counter() - t_start
+
+    rss = peak_rss()
+    return {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'engine': ENGINE_VERSION,
+            'corpus': len(corpus),
+            'repeat': repeat,
+            'fontsize': fontsize,
+            'cold': cold,
+        },
+        'stages': {
+            stage: summarize(samples)
+            for stage, samples in stage_samples.items()},
+        'total': summarize(total_samples),
+        'groups': {
+            group: summarize(samples)
+            for group, samples in group_samples.items()},
+        'throughput': rendered / elapsed if elapsed else 0,
+        'peak_rss_mb': rss / 1024 / 1024 if rss is not None else None,
+        'failures': failures,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions of ``results`` against ``baseline``."""
+    regressions = []
+    sections = [('total', results['total'], baseline.get('total', {}))]
+    for key in ('stages', 'groups'):
+        for name, stats in results[key].items():
+            sections.append((
+                name, stats, baseline.get(key, {}).get(name, {})))
+    for name, stats, base in sections:
+        for metric in ('p50_ms', 'p95_ms'):
+            if base.get(metric) and (
+                    stats[metric] > base[metric] * (1 + tolerance)):
+                regressions.append(
+                    f'{name} {metric}: {stats[metric]:.2f} '
+                    f'(baseline {base[metric]:.2f})')
+    base_throughput = baseline.get('throughput')
+    if base_throughput and (
+            results['throughput'] < base_throughput / (1 + tolerance)):
+        regressions.append(
+            f"throughput: {results['throughput']:.1f}/s "
+            f'(baseline {base_throughput:.1f}/s)')
+    return regressions
+
+
+def print_results(results):
+    """Print a human readable report to stdout."""
+    print(f"{'stage':<12} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+    rows = list(results['stages'].items()) + [('total', results['total'])]
+    rows += [(f'[{group}]', stats)
+             for group, stats in results['groups'].items()]
+    for name, stats in rows:
+        print(f"{name:<12} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+              f"{stats['mean_ms']:>9.2f}")
+    print(f"throughput: {results['throughput']:.1f} equations/s")
+    if results['peak_rss_mb'] is not None:
+        print(f"peak RSS: {results['peak_rss_mb']:.1f} MB")
+    for name, error in results['failures'].items():
+        print(f'failed: {name}: {error}')
+
+
+def main(argv=None):
+    """Entry-point of the benchmark."""
+    parser = argparse.ArgumentParser(
+        prog='pipeline', description='Benchmark the equation render pipeline')
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='measured runs over the corpus (default: 5)')
+    parser.add_argument(
+        '-w', '--warmup', type=int, default=1,
+        help='unmeasured runs before (default: 1)')
+    parser.add_argument(
+        '-s', '--fontsize', type=float, default=DEFAULT_FONTSIZE,
+        help='font size')
+    parser.add_argument(
+        '--cold', action='store_true',
+        help='clear the path cache before each equation')
+    parser.add_argument(
+        '-o', '--output', metavar='FILE', help='save the results as JSON')
+    parser.add_argument(
+        '-b', '--baseline', metavar='FILE',
+        help='JSON results to compare with')
+    parser.add_argument(
+        '-t', '--tolerance', metavar='PERCENT', type=float, default=10,
+        help='allowed slowdown against the baseline (default: 10)')
+    options = parser.parse_args(argv)
+
+    results = run(
+        load_corpus(), options.repeat, options.warmup, options.fontsize,
+        options.cold)
+    print_results(results)
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, options.tolerance / 100)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print('no regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1302,6 +1302,29 @@ class Context(object):
         cairo.cairo_append_path(self._pointer, path)
         self._check_status()
 
+    def copy_path_data(self):
+        """Return a copy of the current path as an opaque object.
+
+        Unlike :meth:`copy_path`, the path data is not converted to Python
+        objects. This makes it cheap to keep and to append many times
+        with :meth:`append_path_data`.
+
+        :returns: A ``cairo_path_t *`` cdata object.
+
+        """
+        path = cairo.cairo_copy_path(self._pointer)
+        _check_status(path.status)
+        return ffi.gc(path, _keepref(cairo, cairo.cairo_path_destroy))
+
+    def append_path_data(self, path):
+        """Append ``path`` onto the current path.
+
+        :param path: A path returned by :meth:`copy_path_data`.
+
+        """
+        cairo.cairo_append_path(self._pointer, path)
+        self._check_status()
+
     def path_extents(self):
         """Computes a bounding box in user-space coordinates
         covering the points on the current path.
@@ -0,0 +1,137 @@
+"""
+    cairocffi.ffi_build
+    ~~~~~~~~~~~~~~~~~~~
+
+    Declare the cffi bindings, and precompile them when run as a script::
+
+        python cairocffi_min/ffi_build.py
+
+    The declarations are then stored in ``_generated/ffi.py`` and
+    ``_generated/ffi_pixbuf.py`` (out-of-line ABI mode, no C compiler is
+    needed), which are loaded by ``ffi`` without parsing the headers with
+    pycparser at runtime.
+
+    :copyright: Copyright 2013-2019 by Simon Sapin
+    :license: BSD, see LICENSE for details.
+
+"""
+
+import os
+
+from cffi import FFI
+
+if __package__:
+    from . import constants
+else:
+    # run as a script, without importing the package (and loading cairo)
+    import constants
+
+GENERATED = os.path.basename(os.path.dirname(os.path.abspath(__file__))) + '._generated'
+
+_GDK_PIXBUF_HEADERS = '''
+    typedef unsigned long   gsize;
+    typedef unsigned int    guint32;
+    typedef unsigned int    guint;
+    typedef unsigned char   guchar;
+    typedef char            gchar;
+    typedef int             gint;
+    typedef gint            gboolean;
+    typedef guint32         GQuark;
+    typedef void*           gpointer;
+    typedef ...             GdkPixbufLoader;
+    typedef ...             GdkPixbufFormat;
+    typedef ...             GdkPixbuf;
+    typedef struct {
+        GQuark              domain;
+        gint                code;
+        gchar              *message;
+    } GError;
+    typedef enum {
+        GDK_COLORSPACE_RGB
+    } GdkColorspace;
+
+
+    GdkPixbufLoader * gdk_pixbuf_loader_new          (void);
+    GdkPixbufFormat * gdk_pixbuf_loader_get_format   (GdkPixbufLoader *loader);
+    GdkPixbuf *       gdk_pixbuf_loader_get_pixbuf   (GdkPixbufLoader *loader);
+    gboolean          gdk_pixbuf_loader_write        (
+        GdkPixbufLoader *loader, const guchar *buf, gsize count,
+        GError **error);
+    void              gdk_pixbuf_loader_set_size (
+        GdkPixbufLoader *loader, int width, int height);
+    gboolean          gdk_pixbuf_loader_close        (
+        GdkPixbufLoader *loader, GError **error);
+
+    gchar *           gdk_pixbuf_format_get_name     (GdkPixbufFormat *format);
+
+    GdkColorspace     gdk_pixbuf_get_colorspace      (const GdkPixbuf *pixbuf);
+    int               gdk_pixbuf_get_n_channels      (const GdkPixbuf *pixbuf);
+    gboolean          gdk_pixbuf_get_has_alpha       (const GdkPixbuf *pixbuf);
+    int               gdk_pixbuf_get_bits_per_sample (const GdkPixbuf *pixbuf);
+    int               gdk_pixbuf_get_width           (const GdkPixbuf *pixbuf);
+    int               gdk_pixbuf_get_height          (const GdkPixbuf *pixbuf);
+    int               gdk_pixbuf_get_rowstride       (const GdkPixbuf *pixbuf);
+    guchar *          gdk_pixbuf_get_pixels          (const GdkPixbuf *pixbuf);
+    gsize             gdk_pixbuf_get_byte_length     (const GdkPixbuf *pixbuf);
+    gboolean          gdk_pixbuf_save_to_buffer      (
+        GdkPixbuf *pixbuf, gchar **buffer, gsize *buffer_size,
+        const char *type, GError **error, ...);
+
+    void              gdk_cairo_set_source_pixbuf    (
+        cairo_t *cr, const GdkPixbuf *pixbuf,
+        double pixbuf_x, double pixbuf_y);
+
+
+    void              g_object_ref                   (gpointer object);
+    void              g_object_unref                 (gpointer object);
+    void              g_error_free                   (GError *error);
+    void              g_type_init                    (void);
+'''
+
+
+def build_ffi(xcb=True):
+    """Return the cairo and GDK-PixBuf ``FFI`` objects.
+
+    If ``xcb`` is true and xcffib is installed, the cairo definitions
+    include the XCB support.
+
+    """
+    # Primary cffi definitions
+    ffi = FFI()
+    ffi.set_source(GENERATED + '.ffi', None)
+    ffi.cdef(constants._CAIRO_HEADERS)
+
+    # include xcffib cffi definitions for cairo xcb support
+    if xcb:
+        try:
+            from xcffib.ffi import ffi as xcb_ffi
+        except ImportError:
+            pass
+        else:
+            ffi.include(xcb_ffi)
+            ffi.cdef(constants._CAIRO_XCB_HEADERS)
+
+    # gdk pixbuf cffi definitions
+    ffi_pixbuf = FFI()
+    ffi_pixbuf.set_source(GENERATED + '.ffi_pixbuf', None)
+    ffi_pixbuf.include(ffi)
+    ffi_pixbuf.cdef(_GDK_PIXBUF_HEADERS)
+
+    return ffi, ffi_pixbuf
+
+
+def compile_ffi():
+    """Write the precompiled bindings to the ``_generated`` package."""
+    # xcffib's bindings are not out-of-line, so they can't be included
+    ffi, ffi_pixbuf = build_ffi(xcb=False)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    generated = os.path.join(root, *GENERATED.split('.'))
+    os.makedirs(generated, exist_ok=True)
+    with open(os.path.join(generated, '__init__.py'), 'w') as file_object:
+        file_object.write('')
+    ffi.compile(tmpdir=root)
+    ffi_pixbuf.compile(tmpdir=root)
+
+
+if __name__ == '__main__':
+    compile_ffi()
@@ -887,6 +887,13 @@ def test_context_path():
     with pytest.raises(ValueError):
         context.append_path([(cairocffi.PATH_LINE_TO, (30, 150, 1, 4))])
 
+    path = context.copy_path()
+    path_data = context.copy_path_data()
+    context.new_path()
+    context.append_path_data(path_data)
+    context.append_path_data(path_data)
+    assert context.copy_path() == path + path
+
 
 def test_context_properties():
     surface = ImageSurface(cairocffi.FORMAT_ARGB32, 1, 1)
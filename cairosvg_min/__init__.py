@@ -35,6 +35,60 @@ SURFACES = {
 }
 
 
+class Document(object):
+    """An SVG document that is parsed once and can be converted many times.
+
+    The input is given as for ``svg2png``: pass one of ``bytestring``,
+    ``file_obj`` or ``url``, and ``unsafe`` to allow external file access.
+
+    """
+
+    def __init__(self, bytestring=None, *, file_obj=None, url=None,
+                 unsafe=False):
+        self.tree = surface.Tree(
+            bytestring=bytestring, file_obj=file_obj, url=url, unsafe=unsafe)
+
+    def convert(self, format_name, *, dpi=96, parent_width=None,
+                parent_height=None, scale=1, background_color=None,
+                negate_colors=False, invert_images=False, write_to=None,
+                output_width=None, output_height=None):
+        """Convert the document to ``format_name``, a key of ``SURFACES``.
+
+        The output options are the same as for ``svg2png``.
+
+        """
+        return SURFACES[format_name.upper()].convert_tree(
+            self.tree, dpi=dpi, parent_width=parent_width,
+            parent_height=parent_height, scale=scale,
+            background_color=background_color, negate_colors=negate_colors,
+            invert_images=invert_images, write_to=write_to,
+            output_width=output_width, output_height=output_height)
+
+    def record(self, *, dpi=96, parent_width=None, parent_height=None,
+               negate_colors=False, invert_images=False):
+        """Draw the document once to a ``surface.RecordingSurface``.
+
+        The result can be painted to any of the ``SURFACES`` at any scale
+        with their ``replay`` method, without drawing the document again.
+
+        """
+        return surface.RecordingSurface.convert_tree(
+            self.tree, dpi=dpi, parent_width=parent_width,
+            parent_height=parent_height, negate_colors=negate_colors,
+            invert_images=invert_images)
+
+    def image(self, *, dpi=96, parent_width=None, parent_height=None,
+              scale=1, background_color=None, negate_colors=False,
+              invert_images=False, output_width=None, output_height=None):
+        """Render the document to a ``cairo.ImageSurface``."""
+        return surface.ImageSurface.convert_tree(
+            self.tree, dpi=dpi, parent_width=parent_width,
+            parent_height=parent_height, scale=scale,
+            background_color=background_color, negate_colors=negate_colors,
+            invert_images=invert_images, output_width=output_width,
+            output_height=output_height)
+
+
 def svg2svg(bytestring=None, *, file_obj=None, url=None, dpi=96,
             parent_width=None, parent_height=None, scale=1, unsafe=False,
             background_color=None, negate_colors=False, invert_images=False,
@@ -60,6 +114,18 @@ def svg2png(bytestring=None, *, file_obj=None, url=None, dpi=96,
         output_width=output_width, output_height=output_height)
 
 
+def svg2image(bytestring=None, *, file_obj=None, url=None, dpi=96,
+              parent_width=None, parent_height=None, scale=1, unsafe=False,
+              background_color=None, negate_colors=False,
+              invert_images=False, output_width=None, output_height=None):
+    return surface.ImageSurface.convert(
+        bytestring=bytestring, file_obj=file_obj, url=url, dpi=dpi,
+        parent_width=parent_width, parent_height=parent_height, scale=scale,
+        background_color=background_color, negate_colors=negate_colors,
+        invert_images=invert_images, unsafe=unsafe,
+        output_width=output_width, output_height=output_height)
+
+
 def svg2pdf(bytestring=None, *, file_obj=None, url=None, dpi=96,
             parent_width=None, parent_height=None, scale=1, unsafe=False,
             background_color=None, negate_colors=False, invert_images=False,
@@ -101,6 +167,9 @@ if __debug__:
         'the format for this class', 'SVG')
     svg2png.__doc__ = surface.Surface.convert.__doc__.replace(
         'the format for this class', 'PNG')
+    svg2image.__doc__ = surface.Surface.convert.__doc__.replace(
+        'the format for this class', 'an in-memory image').replace(
+        'return a byte string', 'return a ``cairo.ImageSurface``')
     svg2pdf.__doc__ = surface.Surface.convert.__doc__.replace(
         'the format for this class', 'PDF')
     svg2ps.__doc__ = surface.Surface.convert.__doc__.replace(
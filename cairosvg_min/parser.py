@@ -3,6 +3,7 @@ SVG Parser.
 
 """
 
+import copy
 import gzip
 import re
 from urllib.parse import urlunparse
@@ -312,6 +313,20 @@ class Node(dict):
     def get_href(self):
         return self.get('{http://www.w3.org/1999/xlink}href', self.get('href'))
 
+    def clone(self, parent=None):
+        """Return a copy of the node and its descendants.
+
+        Drawing modifies nodes (``use``, ``mask`` and ``pattern`` for
+        example), so a tree has to be cloned to be drawn more than once. The
+        XML elements and the parsed stylesheets are shared, not copied.
+
+        """
+        node = copy.copy(self)
+        if parent is not None:
+            node.parent = parent
+        node.children = [child.clone(node) for child in self.children]
+        return node
+
 
 class Tree(Node):
     """SVG tree."""
@@ -3,14 +3,32 @@ Paths manager.
 
 """
 
+import re
+import threading
+from collections import OrderedDict
 from math import pi, radians
 
 from .bounding_box import calculate_bounding_box
 from .helpers import (
-    PATH_LETTERS, clip_marker_box, node_format, normalize, point, point_angle,
+    PATH_LETTERS, PointError, clip_marker_box, node_format, point_angle,
     preserve_ratio, quadratic_points, rotate, size)
 from .url import parse_url
 
+# Drawn paths by "d" attribute, font size and dpi (which units are resolved
+# against), least recently used first, see path()
+PATH_CACHE = OrderedDict()
+PATH_CACHE_SIZE = 4096
+PATH_CACHE_LOCK = threading.Lock()
+
+# Tokens of the "d" attribute: a command letter, a number (possibly followed
+# by a unit) or any other character but separators
+PATH_TOKEN = re.compile(rf'''
+    [{PATH_LETTERS}]
+    | [+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?
+      [^\s,+\-.0-9{PATH_LETTERS}]*
+    | [^\s,]
+''', re.VERBOSE)
+
 
 def draw_markers(surface, node):
     """Draw the markers attached to a path ``node``."""
@@ -119,16 +137,94 @@ def draw_markers(surface, node):
 
 
 def path(surface, node):
-    """Draw a path ``node``."""
+    """Draw a path ``node``.
+
+    Paths starting with an absolute moveto don't depend on the current point,
+    they are kept in ``PATH_CACHE`` and appended again without parsing when
+    the same ``d`` attribute is found at the same font size and dpi, for
+    example for repeated glyphs. The least recently used paths are dropped
+    when the cache is full.
+
+    """
     string = node.get('d', '')
+    context = surface.context
+
+    key = (string, surface.font_size, surface.dpi)
+    with PATH_CACHE_LOCK:
+        cached = PATH_CACHE.get(key)
+        if cached is not None:
+            PATH_CACHE.move_to_end(key)
+    if cached is not None:
+        path_data, vertices, tolerance = cached
+        if tolerance is not None:
+            context.set_tolerance(tolerance)
+        context.append_path_data(path_data)
+        node.vertices = list(vertices)
+        return
 
-    node.vertices = []
+    if not string.lstrip().startswith('M') or '%' in string:
+        parse_path(surface, node, string)
+        return
+
+    # Draw the path alone to copy it, then put it after the previous path
+    previous_path = context.copy_path_data()
+    previous_tolerance = context.get_tolerance()
+    context.new_path()
+    try:
+        parse_path(surface, node, string)
+    finally:
+        path_data = context.copy_path_data()
+        context.new_path()
+        context.append_path_data(previous_path)
+        context.append_path_data(path_data)
+    tolerance = context.get_tolerance()
+
+    with PATH_CACHE_LOCK:
+        PATH_CACHE[key] = (
+            path_data, tuple(node.vertices),
+            None if tolerance == previous_tolerance else tolerance)
+        while len(PATH_CACHE) > PATH_CACHE_SIZE:
+            PATH_CACHE.popitem(last=False)
+
+
+def tokenize_path(string):
+    """Split the ``d`` attribute ``string`` into command and number tokens.
 
-    for letter in PATH_LETTERS:
-        string = string.replace(letter, f' {letter} ')
+    The tokens are returned in reverse order, so that they can be consumed
+    with ``pop()``.
+
+    """
+    tokens = PATH_TOKEN.findall(string)
+    tokens.reverse()
+    return tokens
+
+
+def pop_point(surface, tokens):
+    """Remove and return the next ``(x, y)`` point from ``tokens``."""
+    if len(tokens) < 2:
+        raise PointError
+    return size(surface, tokens.pop(), 'x'), size(surface, tokens.pop(), 'y')
+
+
+def pop_flag(tokens):
+    """Remove and return the next arc flag from ``tokens``.
+
+    Flags are not always separated from the following values. They can only
+    be 0 or 1, so reading a single digit suffices.
+
+    """
+    token = tokens.pop()
+    if len(token) > 1:
+        tokens.append(token[1:])
+    return token[0]
+
+
+def parse_path(surface, node, string):
+    """Parse the ``d`` attribute ``string`` and draw the path ``node``."""
+    node.vertices = []
 
     last_letter = None
-    string = normalize(string)
+    tokens = tokenize_path(string)
 
     # Keep the current point because Cairo's get_current_point is not accurate
     # enough. See https://github.com/Kozea/CairoSVG/issues/111.
@@ -138,10 +234,9 @@ def path(surface, node):
         surface.context.move_to(0, 0)
         current_point = 0, 0
 
-    while string:
-        string = string.strip()
-        if string.split(' ', 1)[0] in PATH_LETTERS:
-            letter, string = (string + ' ').split(' ', 1)
+    while tokens:
+        if tokens[-1] in PATH_LETTERS:
+            letter = tokens.pop()
             if last_letter in (None, 'z', 'Z') and letter not in 'mM':
                 node.vertices.append(current_point)
                 first_path_point = current_point
@@ -160,18 +255,15 @@ def path(surface, node):
             # Elliptic curve
             surface.context.set_tolerance(0.00001)
             x1, y1 = current_point
-            rx, ry, string = point(surface, string)
-            rotation, string = string.split(' ', 1)
-            rotation = radians(float(rotation))
-
-            # The large and sweep values are not always separated from the
-            # following values. These flags can only be 0 or 1, so reading a
-            # single digit suffices.
-            large, string = string[0], string[1:].strip()
-            sweep, string = string[0], string[1:].strip()
+            rx, ry = pop_point(surface, tokens)
+            if len(tokens) < 3:
+                raise PointError
+            rotation = radians(float(tokens.pop()))
+            large = pop_flag(tokens)
+            sweep = pop_flag(tokens)
 
-            # Retrieve end point and set remainder (before checking flags)
-            x3, y3, string = point(surface, string)
+            # Retrieve end point (before checking flags)
+            x3, y3 = pop_point(surface, tokens)
 
             # Only allow 0 or 1 for flags
             large, sweep = int(large), int(sweep)
@@ -186,14 +278,12 @@ def path(surface, node):
 
             # rx=0 or ry=0 means straight line
             if not rx or not ry:
-                if string and string[0] not in PATH_LETTERS:
+                if tokens and tokens[-1] not in PATH_LETTERS:
                     # As we replace the current operation by l, we must be sure
                     # that the next letter is set to the real current letter (a
                     # or A) in case it’s omitted
-                    next_letter = f'{letter} '
-                else:
-                    next_letter = ''
-                string = f'l {x3} {y3} {next_letter}{string}'
+                    tokens.append(letter)
+                tokens.extend((str(y3), str(x3), 'l'))
                 continue
 
             radii_ratio = ry / rx
@@ -247,9 +337,9 @@ def path(surface, node):
         elif letter == 'c':
             # Relative curve
             x, y = current_point
-            x1, y1, string = point(surface, string)
-            x2, y2, string = point(surface, string)
-            x3, y3, string = point(surface, string)
+            x1, y1 = pop_point(surface, tokens)
+            x2, y2 = pop_point(surface, tokens)
+            x3, y3 = pop_point(surface, tokens)
             node.vertices.append((
                 point_angle(x2, y2, x1, y1), point_angle(x2, y2, x3, y3)))
             surface.context.rel_curve_to(x1, y1, x2, y2, x3, y3)
@@ -265,9 +355,9 @@ def path(surface, node):
 
         elif letter == 'C':
             # Curve
-            x1, y1, string = point(surface, string)
-            x2, y2, string = point(surface, string)
-            x3, y3, string = point(surface, string)
+            x1, y1 = pop_point(surface, tokens)
+            x2, y2 = pop_point(surface, tokens)
+            x3, y3 = pop_point(surface, tokens)
             node.vertices.append((
                 point_angle(x2, y2, x1, y1), point_angle(x2, y2, x3, y3)))
             surface.context.curve_to(x1, y1, x2, y2, x3, y3)
@@ -275,7 +365,7 @@ def path(surface, node):
 
         elif letter == 'h':
             # Relative horizontal line
-            x, string = (string + ' ').split(' ', 1)
+            x = tokens.pop() if tokens else ''
             old_x, old_y = current_point
             angle = 0 if size(surface, x, 'x') > 0 else pi
             node.vertices.append((pi - angle, angle))
@@ -285,7 +375,7 @@ def path(surface, node):
 
         elif letter == 'H':
             # Horizontal line
-            x, string = (string + ' ').split(' ', 1)
+            x = tokens.pop() if tokens else ''
             old_x, old_y = current_point
             angle = 0 if size(surface, x, 'x') > old_x else pi
             node.vertices.append((pi - angle, angle))
@@ -295,7 +385,7 @@ def path(surface, node):
 
         elif letter == 'l':
             # Relative straight line
-            x, y, string = point(surface, string)
+            x, y = pop_point(surface, tokens)
             angle = point_angle(0, 0, x, y)
             node.vertices.append((pi - angle, angle))
             surface.context.rel_line_to(x, y)
@@ -303,7 +393,7 @@ def path(surface, node):
 
         elif letter == 'L':
             # Straight line
-            x, y, string = point(surface, string)
+            x, y = pop_point(surface, tokens)
             old_x, old_y = current_point
             angle = point_angle(old_x, old_y, x, y)
             node.vertices.append((pi - angle, angle))
@@ -312,7 +402,7 @@ def path(surface, node):
 
         elif letter == 'm':
             # Current point relative move
-            x, y, string = point(surface, string)
+            x, y = pop_point(surface, tokens)
             if last_letter and last_letter not in 'zZ':
                 node.vertices.append(None)
             surface.context.rel_move_to(x, y)
@@ -320,7 +410,7 @@ def path(surface, node):
 
         elif letter == 'M':
             # Current point move
-            x, y, string = point(surface, string)
+            x, y = pop_point(surface, tokens)
             if last_letter and last_letter not in 'zZ':
                 node.vertices.append(None)
             surface.context.move_to(x, y)
@@ -329,8 +419,8 @@ def path(surface, node):
         elif letter == 'q':
             # Relative quadratic curve
             x1, y1 = 0, 0
-            x2, y2, string = point(surface, string)
-            x3, y3, string = point(surface, string)
+            x2, y2 = pop_point(surface, tokens)
+            x3, y3 = pop_point(surface, tokens)
             xq1, yq1, xq2, yq2, xq3, yq3 = quadratic_points(
                 x1, y1, x2, y2, x3, y3)
             surface.context.rel_curve_to(xq1, yq1, xq2, yq2, xq3, yq3)
@@ -340,8 +430,8 @@ def path(surface, node):
         elif letter == 'Q':
             # Quadratic curve
             x1, y1 = current_point
-            x2, y2, string = point(surface, string)
-            x3, y3, string = point(surface, string)
+            x2, y2 = pop_point(surface, tokens)
+            x3, y3 = pop_point(surface, tokens)
             xq1, yq1, xq2, yq2, xq3, yq3 = quadratic_points(
                 x1, y1, x2, y2, x3, y3)
             surface.context.curve_to(xq1, yq1, xq2, yq2, xq3, yq3)
@@ -353,8 +443,8 @@ def path(surface, node):
             x, y = current_point
             x1 = x3 - x2 if last_letter in 'csCS' else 0
             y1 = y3 - y2 if last_letter in 'csCS' else 0
-            x2, y2, string = point(surface, string)
-            x3, y3, string = point(surface, string)
+            x2, y2 = pop_point(surface, tokens)
+            x3, y3 = pop_point(surface, tokens)
             node.vertices.append((
                 point_angle(x2, y2, x1, y1), point_angle(x2, y2, x3, y3)))
             surface.context.rel_curve_to(x1, y1, x2, y2, x3, y3)
@@ -373,8 +463,8 @@ def path(surface, node):
             x, y = current_point
             x1 = x3 + (x3 - x2) if last_letter in 'csCS' else x
             y1 = y3 + (y3 - y2) if last_letter in 'csCS' else y
-            x2, y2, string = point(surface, string)
-            x3, y3, string = point(surface, string)
+            x2, y2 = pop_point(surface, tokens)
+            x3, y3 = pop_point(surface, tokens)
             node.vertices.append((
                 point_angle(x2, y2, x1, y1), point_angle(x2, y2, x3, y3)))
             surface.context.curve_to(x1, y1, x2, y2, x3, y3)
@@ -392,7 +482,7 @@ def path(surface, node):
             x2 = x3 - x2
             y2 = y3 - y2
             x1, y1 = 0, 0
-            x3, y3, string = point(surface, string)
+            x3, y3 = pop_point(surface, tokens)
             xq1, yq1, xq2, yq2, xq3, yq3 = quadratic_points(
                 x1, y1, x2, y2, x3, y3)
             node.vertices.append((0, 0))
@@ -412,7 +502,7 @@ def path(surface, node):
             x2 = abs_x + (x3 - x2)
             y2 = abs_y + (y3 - y2)
             x1, y1 = abs_x, abs_y
-            x3, y3, string = point(surface, string)
+            x3, y3 = pop_point(surface, tokens)
             xq1, yq1, xq2, yq2, xq3, yq3 = quadratic_points(
                 x1, y1, x2, y2, x3, y3)
             node.vertices.append((0, 0))
@@ -421,7 +511,7 @@ def path(surface, node):
 
         elif letter == 'v':
             # Relative vertical line
-            y, string = (string + ' ').split(' ', 1)
+            y = tokens.pop() if tokens else ''
             old_x, old_y = current_point
             angle = pi / 2 if size(surface, y, 'y') > 0 else -pi / 2
             node.vertices.append((-angle, angle))
@@ -431,7 +521,7 @@ def path(surface, node):
 
         elif letter == 'V':
             # Vertical line
-            y, string = (string + ' ').split(' ', 1)
+            y = tokens.pop() if tokens else ''
             old_x, old_y = current_point
             angle = pi / 2 if size(surface, y, 'y') > old_y else -pi / 2
             node.vertices.append((-angle, angle))
@@ -448,5 +538,4 @@ def path(surface, node):
         if letter not in 'zZ':
             node.vertices.append(current_point)
 
-        string = string.strip()
         last_letter = letter
@@ -5,6 +5,8 @@ Cairo surface creators.
 
 import copy
 import io
+import os
+import uuid
 
 import cairocffi_min as cairo
 
@@ -129,6 +131,28 @@ class Surface(object):
         tree = Tree(
             bytestring=bytestring, file_obj=file_obj, url=url, unsafe=unsafe,
             **kwargs)
+        return cls.convert_tree(
+            tree, dpi=dpi, parent_width=parent_width,
+            parent_height=parent_height, scale=scale,
+            background_color=background_color, negate_colors=negate_colors,
+            invert_images=invert_images, write_to=write_to,
+            output_width=output_width, output_height=output_height,
+            copy_tree=False)
+
+    @classmethod
+    def convert_tree(cls, tree, *, dpi=96, parent_width=None,
+                     parent_height=None, scale=1, background_color=None,
+                     negate_colors=False, invert_images=False, write_to=None,
+                     output_width=None, output_height=None, copy_tree=True):
+        """Convert an already parsed ``Tree`` to the format for this class.
+
+        The options are the same as for ``convert``. Unless ``copy_tree`` is
+        false, a clone of ``tree`` is drawn and ``tree`` can be converted
+        again, without parsing the SVG source again.
+
+        """
+        if copy_tree:
+            tree = tree.clone()
         output = write_to or io.BytesIO()
         instance = cls(
             tree, output, dpi, None, parent_width, parent_height, scale,
@@ -139,7 +163,47 @@ class Surface(object):
             )
         instance.finish()
         if write_to is None:
-            return output.getvalue()
+            return instance.getvalue()
+
+    @classmethod
+    def replay(cls, recording, *, scale=1, background_color=None,
+               write_to=None, output_width=None, output_height=None):
+        """Paint a ``RecordingSurface`` to a new surface of this class.
+
+        The tree is not drawn again, only the recorded drawing operations are
+        replayed, scaled by ``scale`` or to fit ``output_width`` and
+        ``output_height``. The other parameters are the same as for
+        ``convert``.
+
+        """
+        width, height = recording.width, recording.height
+        scale_x = scale_y = scale
+        if output_width and output_height:
+            scale_x, scale_y = output_width / width, output_height / height
+        elif output_width:
+            scale_x = scale_y = output_width / width
+        elif output_height:
+            scale_x = scale_y = output_height / height
+
+        instance = cls.__new__(cls)
+        instance.output = write_to or io.BytesIO()
+        instance.dpi = recording.dpi
+        units = instance.device_units_per_user_units
+        instance.cairo, instance.width, instance.height = (
+            instance._create_surface(
+                width * scale_x * units, height * scale_y * units))
+        if 0 in (instance.width, instance.height):
+            raise ValueError('The SVG size is undefined')
+        instance.context = cairo.Context(instance.cairo)
+        instance.context.scale(scale_x * units, scale_y * units)
+        if background_color:
+            instance.context.set_source_rgba(*color(background_color))
+            instance.context.paint()
+        instance.context.set_source_surface(recording.cairo)
+        instance.context.paint()
+        instance.finish()
+        if write_to is None:
+            return instance.getvalue()
 
     def __init__(self, tree, output, dpi, parent_surface=None,
                  parent_width=None, parent_height=None,
@@ -275,6 +339,10 @@ class Surface(object):
         """Read the surface content."""
         self.cairo.finish()
 
+    def getvalue(self):
+        """Return the output of ``convert`` when ``write_to`` isn't set."""
+        return self.output.getvalue()
+
     def map_color(self, string, opacity=1):
         """Parse a color ``string`` and apply ``map_rgba`` function to it."""
         rgba = color(string, opacity)
@@ -502,6 +570,116 @@ class PDFSurface(Surface):
     surface_class = cairo.PDFSurface
 
 
+class PDFPages(object):
+    """A PDF document with a page per ``RecordingSurface``.
+
+    All pages are written to a single ``cairo.PDFSurface``, so resources are
+    shared and the output is streamed to ``write_to`` (a filename or a
+    file-like object, the document is returned by ``finish`` if None) page
+    by page. Each page has the size of its recording. Can be used as a
+    context manager, which calls ``finish``, or ``abort`` when left on an
+    exception (including ``GeneratorExit`` of a closed generator).
+
+    A filename is only written once the document is finished: the pages are
+    streamed to a temporary file next to it, which replaces it in
+    ``finish`` and is removed in ``abort``. An aborted document doesn't
+    write anything more to a file-like object, but the pages written so far
+    stay in it.
+
+    """
+
+    def __init__(self, write_to=None):
+        self.write_to = write_to
+        self.pages = 0
+        self._aborted = False
+        self._temp_filename = None
+        if write_to is None:
+            self.output = io.BytesIO()
+        elif hasattr(write_to, 'write'):
+            self.output = write_to
+        else:
+            directory = os.path.dirname(os.path.abspath(write_to))
+            self._temp_filename = os.path.join(
+                directory, f'.{uuid.uuid4().hex}.pdf')
+            self.output = open(self._temp_filename, 'xb')
+        # the size is set for each page, the output is written through
+        # _PDFOutput, so that nothing is written once aborted
+        self.cairo = cairo.PDFSurface(_PDFOutput(self), 1, 1)
+
+    def add_page(self, recording, *, title=None, label=None, scale=1,
+                 background_color=None):
+        """Replay ``recording`` on a new page.
+
+        ``title`` adds an entry linking to the page to the document outline,
+        ``label`` sets the page label. ``scale`` and ``background_color`` are
+        the same as for ``Surface.replay``.
+
+        """
+        units = scale / (recording.dpi * UNITS['pt'])
+        width, height = recording.width * units, recording.height * units
+        if 0 in (width, height):
+            raise ValueError('The SVG size is undefined')
+        self.cairo.set_size(width, height)
+        context = cairo.Context(self.cairo)
+        context.scale(units, units)
+        if background_color:
+            context.set_source_rgba(*color(background_color))
+            context.paint()
+        context.set_source_surface(recording.cairo)
+        context.paint()
+        self.pages += 1
+        if label is not None:
+            self.cairo.set_page_label(label)
+        if title is not None:
+            self.cairo.add_outline(
+                cairo.PDF_OUTLINE_ROOT, title, f'page={self.pages}')
+        self.cairo.show_page()
+
+    def finish(self):
+        """Write the document, return it if ``write_to`` was None."""
+        try:
+            self.cairo.finish()
+        except BaseException:
+            self.abort()
+            raise
+        if self._temp_filename is not None:
+            self.output.close()
+            os.replace(self._temp_filename, self.write_to)
+            self._temp_filename = None
+        elif self.write_to is None:
+            return self.output.getvalue()
+
+    def abort(self):
+        """Discard the document, leaving no file at ``write_to``."""
+        self._aborted = True
+        # cairo writes the end of the document when the surface is finished
+        self.cairo.finish()
+        if self._temp_filename is not None:
+            self.output.close()
+            os.remove(self._temp_filename)
+            self._temp_filename = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+
+
+class _PDFOutput(object):
+    """File-like object writing to the output of ``PDFPages`` until aborted."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def write(self, data):
+        if not self.pages._aborted:
+            self.pages.output.write(data)
+
+
 class PSSurface(Surface):
     """A surface that writes in PostScript format."""
     surface_class = cairo.PSSurface
@@ -528,6 +706,39 @@ class PNGSurface(Surface):
         cairo_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
         return cairo_surface, width, height
 
+    @classmethod
+    def replay_atlas(cls, placements, width, height, *, background_color=None,
+                     write_to=None):
+        """Paint many ``RecordingSurface`` objects to a single image.
+
+        ``placements`` is an iterable of ``(recording, x, y, scale)``, each
+        recording is painted scaled by ``scale`` with its top left corner at
+        ``(x, y)`` in pixels, clipped to its own size. The image of
+        ``width`` x ``height`` pixels is encoded once, the output is the
+        same as for ``replay``.
+
+        """
+        instance = cls.__new__(cls)
+        instance.output = write_to or io.BytesIO()
+        instance.cairo, instance.width, instance.height = (
+            instance._create_surface(width, height))
+        context = instance.context = cairo.Context(instance.cairo)
+        if background_color:
+            context.set_source_rgba(*color(background_color))
+            context.paint()
+        for recording, x, y, scale in placements:
+            context.save()
+            context.translate(x, y)
+            context.scale(scale, scale)
+            context.rectangle(0, 0, recording.width, recording.height)
+            context.clip()
+            context.set_source_surface(recording.cairo)
+            context.paint()
+            context.restore()
+        instance.finish()
+        if write_to is None:
+            return instance.getvalue()
+
     def finish(self):
         """Read the PNG surface content."""
         if self.output is not None:
@@ -535,6 +746,79 @@ class PNGSurface(Surface):
         return super().finish()
 
 
+class ImageSurface(PNGSurface):
+    """A surface that renders to an in-memory ARGB32 image.
+
+    No PNG is encoded: ``convert`` returns the ``cairo.ImageSurface``, whose
+    pixels (native-endian, premultiplied alpha) can be accessed with
+    ``get_data`` and ``get_stride``, and which can still be encoded with
+    ``write_to_png`` if needed.
+
+    """
+
+    @classmethod
+    def replay_tile(cls, recording, x, y, width, height, *, scale=1,
+                    background_color=None):
+        """Paint a region of a ``RecordingSurface`` to a new image.
+
+        The region of ``width`` x ``height`` pixels has its top left corner
+        at ``(x, y)`` in the pixels of the recording scaled by ``scale``, so
+        that a large recording can be shown in tiles without allocating the
+        image of the whole recording. The background color is only painted
+        inside the recording. Return the ``cairo.ImageSurface``.
+
+        """
+        instance = cls.__new__(cls)
+        instance.output = None
+        instance.cairo, instance.width, instance.height = (
+            instance._create_surface(width, height))
+        context = instance.context = cairo.Context(instance.cairo)
+        context.translate(-x, -y)
+        context.scale(scale, scale)
+        context.rectangle(0, 0, recording.width, recording.height)
+        context.clip()
+        if background_color:
+            context.set_source_rgba(*color(background_color))
+            context.paint()
+        context.set_source_surface(recording.cairo)
+        context.paint()
+        instance.finish()
+        return instance.getvalue()
+
+    def finish(self):
+        """Flush pending drawing operations, keep the pixel data."""
+        self.cairo.flush()
+
+    def getvalue(self):
+        """Return the ``cairo.ImageSurface``."""
+        return self.cairo
+
+
+class RecordingSurface(Surface):
+    """A surface that records the drawing operations in user units.
+
+    ``convert`` returns the surface itself, which can then be painted to any
+    other surface type at any scale with ``replay``, so that the tree is
+    walked only once for several output formats and sizes.
+
+    """
+    device_units_per_user_units = 1
+
+    def _create_surface(self, width, height):
+        """Create and return ``(cairo_surface, width, height)``."""
+        cairo_surface = cairo.RecordingSurface(
+            cairo.CONTENT_COLOR_ALPHA, (0, 0, width, height))
+        return cairo_surface, width, height
+
+    def finish(self):
+        """Flush pending drawing operations, keep the recording."""
+        self.cairo.flush()
+
+    def getvalue(self):
+        """Return the surface."""
+        return self
+
+
 class SVGSurface(Surface):
     """A surface that writes in SVG format.
 
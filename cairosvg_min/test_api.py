@@ -7,6 +7,7 @@ These tests can be used as deployment tests.
 
 import io
 import os
+import re
 import shutil
 import sys
 import tempfile
@@ -14,7 +15,9 @@ import tempfile
 import cairocffi_min as cairo
 import pytest
 
-from . import SURFACES, VERSION, parser, surface, svg2pdf, svg2png
+from . import (
+    SURFACES, VERSION, Document, parser, path, surface, svg2image, svg2pdf,
+    svg2png)
 from .__main__ import main
 
 MAGIC_NUMBERS = {
@@ -103,6 +106,219 @@ def test_api():
         raise Exception('TypeError not raised')
 
 
+def test_image():
+    """Test that svg2image returns the pixels that svg2png encodes."""
+    image = svg2image(SVG_SAMPLE, dpi=10)
+    assert isinstance(image, cairo.ImageSurface)
+    assert image.get_format() == cairo.FORMAT_ARGB32
+    assert (image.get_width(), image.get_height()) == (40, 50)
+
+    png = io.BytesIO()
+    image.write_to_png(png)
+    assert png.getvalue() == svg2png(SVG_SAMPLE, dpi=10)
+
+
+def test_document():
+    """Test that a parsed document can be converted many times."""
+    document = Document(SVG_SAMPLE)
+    for format_name in MAGIC_NUMBERS:
+        content = document.convert(format_name)
+        assert content.startswith(MAGIC_NUMBERS[format_name])
+    assert document.convert('png') == svg2png(SVG_SAMPLE)
+    assert document.convert('png') == svg2png(SVG_SAMPLE)
+    assert (
+        document.convert('png', scale=2, background_color='white') ==
+        svg2png(SVG_SAMPLE, scale=2, background_color='white'))
+    assert document.image(dpi=10).get_width() == 40
+
+    # Documents using "use" modify the nodes when drawn
+    svg = b'''\
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"
+     width="20" height="20">
+  <defs><symbol id="a"><rect width="5" height="5" fill="red" /></symbol></defs>
+  <use xlink:href="#a" x="10" y="10" />
+</svg>
+'''
+    document = Document(svg)
+    assert document.convert('png') == svg2png(svg)
+    assert document.convert('png') == svg2png(svg)
+
+
+def test_record():
+    """Test that a recording can be replayed to all formats and scales."""
+    recording = Document(SVG_SAMPLE).record()
+    assert isinstance(recording, surface.RecordingSurface)
+    for format_name, surface_type in SURFACES.items():
+        content = surface_type.replay(recording)
+        assert content.startswith(MAGIC_NUMBERS[format_name])
+
+    png = cairo.ImageSurface.create_from_png(io.BytesIO(
+        surface.PNGSurface.replay(recording, scale=2)))
+    assert (png.get_width(), png.get_height()) == (768, 960)
+    image = surface.ImageSurface.replay(recording, output_width=192)
+    assert (image.get_width(), image.get_height()) == (192, 240)
+
+
+def test_pdf_pages():
+    """Test that recordings are written as pages of a single PDF."""
+    recording = Document(SVG_SAMPLE).record()
+    pages = surface.PDFPages()
+    pages.add_page(recording, title='First', label='1')
+    pages.add_page(recording, scale=.5, background_color='white')
+    content = pages.finish()
+    assert content.startswith(MAGIC_NUMBERS['PDF'])
+    assert len(re.findall(rb'/Type\s*/Page\b', content)) == 2
+
+    file_like = io.BytesIO()
+    with surface.PDFPages(file_like) as pages:
+        pages.add_page(recording)
+    assert file_like.getvalue().startswith(MAGIC_NUMBERS['PDF'])
+
+
+def test_pdf_pages_filename(tmp_path):
+    """Test that a PDF file is only written once finished."""
+    recording = Document(SVG_SAMPLE).record()
+    filename = str(tmp_path / 'pages.pdf')
+    with surface.PDFPages(filename) as pages:
+        pages.add_page(recording)
+        assert not os.path.exists(filename)
+    assert os.listdir(tmp_path) == ['pages.pdf']
+    with open(filename, 'rb') as fd:
+        assert fd.read().startswith(MAGIC_NUMBERS['PDF'])
+
+
+def test_pdf_pages_abort(tmp_path):
+    """Test that failed or cancelled documents leave no output."""
+    recording = Document(SVG_SAMPLE).record()
+    filename = str(tmp_path / 'pages.pdf')
+    with pytest.raises(ValueError):
+        with surface.PDFPages(filename) as pages:
+            pages.add_page(recording)
+            raise ValueError
+    assert os.listdir(tmp_path) == []
+
+    # A file-like object isn't written to anymore, so the PDF isn't finished
+    file_like = io.BytesIO()
+    with pytest.raises(ValueError):
+        with surface.PDFPages(file_like) as pages:
+            pages.add_page(recording)
+            raise ValueError
+    assert b'%%EOF' not in file_like.getvalue()
+
+    # Closing a generator writing pages raises GeneratorExit in it
+    def write_pages():
+        with surface.PDFPages(filename) as pages:
+            for _ in range(3):
+                pages.add_page(recording)
+                yield pages.pages
+
+    generator = write_pages()
+    assert next(generator) == 1
+    generator.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_atlas():
+    """Test that recordings are painted to a single PNG."""
+    recording = Document(SVG_SAMPLE).record(dpi=10)
+    content = surface.PNGSurface.replay_atlas(
+        [(recording, 0, 0, 1), (recording, 41, 0, 1), (recording, 0, 51, .5)],
+        81, 76)
+    png = cairo.ImageSurface.create_from_png(io.BytesIO(content))
+    assert (png.get_width(), png.get_height()) == (81, 76)
+    reference = cairo.ImageSurface.create_from_png(io.BytesIO(
+        surface.PNGSurface.replay(recording)))
+    stride = png.get_stride()
+    data, reference_data = png.get_data(), reference.get_data()
+    for y in range(50):
+        row = data[y * stride:y * stride + 40 * 4]
+        assert row == reference_data[
+            y * reference.get_stride():y * reference.get_stride() + 40 * 4]
+        assert data[y * stride + 41 * 4:y * stride + 81 * 4] == row
+
+
+def test_tile():
+    """Test that tiles of a recording are the pixels of the whole image."""
+    recording = Document(SVG_SAMPLE).record(dpi=10)
+    image = surface.ImageSurface.replay(recording, scale=2)
+    tile = surface.ImageSurface.replay_tile(recording, 30, 40, 16, 16, scale=2)
+    assert (tile.get_width(), tile.get_height()) == (16, 16)
+    stride, tile_stride = image.get_stride(), tile.get_stride()
+    data, tile_data = image.get_data(), tile.get_data()
+    for y in range(16):
+        assert tile_data[y * tile_stride:y * tile_stride + 16 * 4] == (
+            data[(40 + y) * stride + 30 * 4:(40 + y) * stride + 46 * 4])
+
+    # Tiles outside of the recording are transparent
+    tile = surface.ImageSurface.replay_tile(
+        recording, 100, 0, 8, 8, scale=2, background_color='white')
+    assert not any(tile.get_data())
+
+
+def test_path_tokens():
+    """Test the tokenizer of the path "d" attribute."""
+    assert path.tokenize_path('M1-2.5.5,3e-1 4E2L 5px 6')[::-1] == [
+        'M', '1', '-2.5', '.5', '3e-1', '4E2', 'L', '5px', '6']
+    assert path.tokenize_path('a1 1 0 01.5.5')[::-1] == [
+        'a', '1', '1', '0', '01.5', '.5']
+    assert path.tokenize_path('h 4ex v 2em')[::-1] == [
+        'h', '4ex', 'v', '2e', 'm']
+
+
+def test_path_cache():
+    """Test that cached paths are drawn as parsed paths."""
+    d = 'M 1 1 h 4 a 2 2 0 0 1 2 2 v 4 Z'
+    svg = f'''\
+<svg xmlns="http://www.w3.org/2000/svg" width="40" height="20">
+  <path d="{d}" />
+  <path d="{d}" transform="translate(20, 5)" />
+</svg>
+'''.encode()
+    path.PATH_CACHE.clear()
+    # Paths starting with a relative moveto are not cached
+    expected = svg2png(svg.replace(b'"M', b'"m 0 0 M'))
+    assert not path.PATH_CACHE
+    assert svg2png(svg) == expected
+    assert [key[0] for key in path.PATH_CACHE] == [d]
+    assert svg2png(svg) == expected
+
+
+def test_path_cache_units():
+    """Test that cached paths with units follow the font size."""
+    # "em" can't be used, its "m" is a moveto command
+    d = 'M 1 1 h 4ex v 2ex Z'
+    svg = '''\
+<svg xmlns="http://www.w3.org/2000/svg" width="40" height="40">
+  <path d="{}" font-size="4" />
+  <path d="{}" font-size="8" transform="translate(0, 10)" />
+</svg>
+'''
+    path.PATH_CACHE.clear()
+    # 1ex is half the font size
+    expected = svg2png(
+        svg.format('M 1 1 h 8 v 4 Z', 'M 1 1 h 16 v 8 Z').encode())
+    path.PATH_CACHE.clear()
+    assert svg2png(svg.format(d, d).encode()) == expected
+    assert len(path.PATH_CACHE) == 2
+    # Drawn from the cache
+    assert svg2png(svg.format(d, d).encode()) == expected
+    assert len(path.PATH_CACHE) == 2
+
+
+def test_path_cache_lru(monkeypatch):
+    """Test that the least recently used paths are dropped."""
+    monkeypatch.setattr(path, 'PATH_CACHE_SIZE', 2)
+    path.PATH_CACHE.clear()
+    paths = ['M 0 0 h 1', 'M 0 0 h 2', 'M 0 0 h 1', 'M 0 0 h 3']
+    for d in paths:
+        svg2png(f'''\
+<svg xmlns="http://www.w3.org/2000/svg" width="4" height="4">
+  <path d="{d}" />
+</svg>
+'''.encode())
+    assert [key[0] for key in path.PATH_CACHE] == ['M 0 0 h 1', 'M 0 0 h 3']
+
+
 def test_low_level_api():
     """Test the low-level Python API with various parameters."""
     expected_content = svg2png(SVG_SAMPLE)
@@ -0,0 +1,298 @@
+# Headless command line interface to EqualZ.
+#
+# Renders many equations in parallel without starting the GUI:
+#
+#     python -m equalz render equations.txt -o out -f pdf
+#     python -m equalz render equations.txt -o out -f png,pdf,svg
+#     python -m equalz render equations.txt -o out -f png --scale 1,2,3
+#     cat equations.jsonl | python -m equalz render -o out -j 8
+#
+# Input is read from files, directories or stdin. Files contain one equation
+# per line, or one JSON object per line with the keys "tex" (required), "name",
+# "mode", "fontsize", "color" and "bgcolor". In directories every .tex/.txt
+# file is a single (possibly multi-line) equation, .mml files are MathML and
+# .jsonl files are read as described above.
+#
+# Several output formats and PNG scales can be given, each equation is then
+# laid out and parsed only once. PNGs at a scale other than 1 get a suffix,
+# e.g. "name@2x.png".
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from rendercache import RenderCache
+from renderdefs import (
+    DEFAULT_COLOR, DEFAULT_FONTSIZE, FORMATS, RENDER_MODE_NAMES, RenderMode)
+from renderer import render
+
+EQUATION_EXTENSIONS = ('.tex', '.txt')
+MATHML_EXTENSIONS = ('.mml', '.mathml')
+JSONL_EXTENSIONS = ('.jsonl',)
+
+# the keys a JSON line may set, other keys (e.g. "output") are ignored
+JSON_KEYS = ('tex', 'name', 'mode', 'fontsize', 'color', 'bgcolor')
+
+# per process render cache, see init_worker()
+_cache = None
+
+
+########################################
+# Returns a job dict for a single input line, or None for blank lines.
+# Raises ValueError (or KeyError for unknown modes) for invalid lines.
+########################################
+def parse_line(line, defaults):
+    line = line.strip()
+    if not line:
+        return None
+    job = dict(defaults)
+    row = None
+    if line.startswith('{'):
+        # LaTeX lines may start with a brace as well
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            pass
+    if isinstance(row, dict):
+        if 'tex' not in row:
+            raise ValueError('JSON line without "tex" key')
+        job.update((key, row[key]) for key in JSON_KEYS if key in row)
+        if job.get('name') is not None:
+            job['name'] = check_name(job['name'])
+        if isinstance(job['mode'], str):
+            job['mode'] = RENDER_MODE_NAMES[job['mode'].lower()]
+    else:
+        job['tex'] = line
+    return job
+
+
+########################################
+# Returns name if it can be used as file name in the output directory,
+# raises ValueError for names containing path separators or "..", which
+# would write outside of it
+########################################
+def check_name(name):
+    name = str(name)
+    if '/' in name or '\\' in name or os.sep in name or '..' in name:
+        raise ValueError(f'invalid name: {name!r}')
+    return name
+
+
+########################################
+# Yields jobs for an iterable of equation (or JSON) lines
+########################################
+def read_lines(lines, source_name, defaults):
+    for number, line in enumerate(lines, 1):
+        try:
+            job = parse_line(line, defaults)
+        except (ValueError, KeyError) as e:
+            print(f'{source_name}:{number}: {e}', file=sys.stderr)
+            continue
+        if job is None:
+            continue
+        job.setdefault('name', None)
+        if not job['name']:
+            job['name'] = f'{source_name}-{number:05d}'
+        yield job
+
+
+########################################
+# Yields jobs for all input files, directories and stdin ("-")
+########################################
+def read_jobs(inputs, defaults):
+    for path in inputs:
+        if path == '-':
+            yield from read_lines(sys.stdin, 'eq', defaults)
+        elif os.path.isdir(path):
+            for filename in sorted(os.listdir(path)):
+                stem, ext = os.path.splitext(filename)
+                ext = ext.lower()
+                full_path = os.path.join(path, filename)
+                if ext in JSONL_EXTENSIONS:
+                    with open(full_path, 'r', encoding='utf-8') as f:
+                        yield from read_lines(f, stem, defaults)
+                elif ext in EQUATION_EXTENSIONS or ext in MATHML_EXTENSIONS:
+                    with open(full_path, 'r', encoding='utf-8') as f:
+                        tex = f.read().strip()
+                    if not tex:
+                        continue
+                    job = dict(defaults, tex=tex, name=stem)
+                    if ext in MATHML_EXTENSIONS:
+                        job['mode'] = RenderMode.MathML
+                    yield job
+        else:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            with open(path, 'r', encoding='utf-8') as f:
+                yield from read_lines(f, stem, defaults)
+
+
+########################################
+# Parses a comma separated list of output formats
+########################################
+def parse_formats(value):
+    formats = [fmt.strip().lower() for fmt in value.split(',') if fmt.strip()]
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise argparse.ArgumentTypeError(
+                f'invalid format: {fmt!r} (choose from {", ".join(FORMATS)})')
+    if not formats:
+        raise argparse.ArgumentTypeError('no format given')
+    return formats
+
+
+########################################
+# Parses a comma separated list of scales, e.g. "1,2,3" or "1x,1.5x"
+########################################
+def parse_scales(value):
+    try:
+        scales = [float(scale.strip().rstrip('x')) for scale in value.split(',')
+                  if scale.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid scales: {value!r}')
+    if not scales or min(scales) <= 0:
+        raise argparse.ArgumentTypeError(f'invalid scales: {value!r}')
+    return scales
+
+
+########################################
+# Path of the file written for a job, format and scale
+########################################
+def output_filename(job, fmt, scale=1):
+    suffix = f'@{scale:g}x' if scale != 1 else ''
+    return os.path.join(job['output'], f"{check_name(job['name'])}{suffix}.{fmt}")
+
+
+########################################
+# Initializes a worker process
+########################################
+def init_worker(cache_dir=None, cache_size=None):
+    global _cache
+    if cache_dir:
+        _cache = RenderCache(cache_dir, cache_size)
+
+
+########################################
+# Renders a single job and writes the result, runs in worker processes
+# (with the cache of the process, see init_worker()) or in the process
+# itself. Returns (name, error), error is None on success.
+########################################
+def render_job(job, cache=None):
+    if cache is None:
+        cache = _cache
+    try:
+        for fmt in job['formats']:
+            # vector formats are scalable anyway
+            scales = (job.get('scales') or (1,)) if fmt == 'png' else (1,)
+            for scale in scales:
+                data = render(
+                    job['tex'], fmt, job['mode'], job['fontsize'],
+                    job['color'], job['bgcolor'], cache, scale)
+                with open(output_filename(job, fmt, scale), 'wb') as f:
+                    f.write(data)
+        return job['name'], None
+    except Exception as e:
+        return job['name'], f'{type(e).__name__}: {e}'
+
+
+########################################
+# Renders jobs in a process pool, yields (name, error) tuples. With
+# processes=1 the jobs are rendered in this process, using cache if passed
+# (e.g. the one of the GUI), so that there aren't two RenderCache instances
+# evicting each other's files in the same process.
+# The worker processes are spawned, not forked: the GUI calls this from a
+# thread, and a forked child could inherit locks (e.g. of the renderer or
+# the render cache) held by other threads, and deadlock on them.
+########################################
+def render_jobs(jobs, processes=None, chunksize=8, cache_dir=None,
+                cache_size=None, cache=None):
+    if processes == 1:
+        if cache is None and cache_dir:
+            cache = RenderCache(cache_dir, cache_size)
+        for job in jobs:
+            yield render_job(job, cache)
+        return
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(
+            processes, init_worker, (cache_dir, cache_size)) as pool:
+        yield from pool.imap_unordered(render_job, jobs, chunksize)
+
+
+########################################
+# Entry-point of the executable
+########################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='equalz', description='Render LaTeX and MathML equations')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_render = commands.add_parser(
+        'render', help='render equations from files, directories or stdin')
+    parser_render.add_argument(
+        'input', nargs='*', default=['-'],
+        help='input files or directories, "-" for stdin (default)')
+    parser_render.add_argument(
+        '-o', '--output', default='.', help='output directory')
+    parser_render.add_argument(
+        '-f', '--format', default=['png'], type=parse_formats,
+        help=f'comma separated output formats ({", ".join(FORMATS)}), '
+             'default: png')
+    parser_render.add_argument(
+        '--scale', default=[1], type=parse_scales,
+        help='comma separated scales of PNGs, e.g. 1,2,3 for HiDPI '
+             'screens, default: 1')
+    parser_render.add_argument(
+        '-m', '--mode', default='display', choices=sorted(RENDER_MODE_NAMES),
+        help='default render mode')
+    parser_render.add_argument(
+        '-s', '--fontsize', default=DEFAULT_FONTSIZE, type=float,
+        help='default font size')
+    parser_render.add_argument(
+        '-c', '--color', default=DEFAULT_COLOR, help='default text color')
+    parser_render.add_argument(
+        '-b', '--background', metavar='COLOR', default=None,
+        help='default background color (transparent if omitted)')
+    parser_render.add_argument(
+        '-j', '--jobs', default=None, type=int,
+        help='number of worker processes (default: number of cores)')
+    parser_render.add_argument(
+        '--cache', metavar='DIR', default=None,
+        help='render cache directory, reused by later runs')
+    parser_render.add_argument(
+        '--cache-size', metavar='MB', default=500, type=int,
+        help='max. size of the render cache in MB (default: 500)')
+
+    options = parser.parse_args(argv)
+
+    os.makedirs(options.output, exist_ok=True)
+    defaults = {
+        'formats': options.format,
+        'scales': options.scale,
+        'mode': RENDER_MODE_NAMES[options.mode],
+        'fontsize': options.fontsize,
+        'color': options.color,
+        'bgcolor': options.background,
+        'output': options.output,
+    }
+
+    t = time.perf_counter()
+    cnt, failed = 0, 0
+    for name, error in render_jobs(
+            read_jobs(options.input, defaults), options.jobs,
+            cache_dir=options.cache, cache_size=options.cache_size * 1024 * 1024):
+        cnt += 1
+        if error:
+            failed += 1
+            print(f'{name}: {error}', file=sys.stderr)
+    t = time.perf_counter() - t
+
+    print(f'Rendered {cnt - failed} of {cnt} equations in {t:.2f} s '
+          f'({cnt / t if t else 0:.1f}/s)', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,378 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import (Qt, QAbstractListModel, QBuffer, QByteArray, QModelIndex, QObject, QRunnable,
+        QThreadPool, pyqtSignal)
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+
+# max. number of thumbnails kept in memory (shared by all models using the same loader)
+THUMBNAIL_CACHE_SIZE = 512
+
+# rows read from the store at once
+PAGE_SIZE = 100
+
+
+########################################
+#
+########################################
+class ThumbnailJob(QRunnable):
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, loader, key, load, size):
+        super().__init__()
+        self._loader = loader
+        self._key = key
+        self._load = load
+        self._size = size
+
+    ########################################
+    # Decodes the PNG, scaled down while decoding if it doesn't fit
+    ########################################
+    def run(self):
+        img = QImage()
+        png = self._load()
+        if png:
+            buf = QBuffer()
+            buf.setData(QByteArray(png))
+            reader = QImageReader(buf, b'png')
+            size = reader.size()
+            if size.isValid() and (size.width() > self._size.width() or size.height() > self._size.height()):
+                reader.setScaledSize(size.scaled(self._size, Qt.KeepAspectRatio))
+            img = reader.read()
+        # QImage (unlike QPixmap) can be used outside the GUI thread
+        self._loader.loaded.emit(self._key, img)
+
+
+########################################
+# Loads thumbnails that fit into size on background threads and keeps the
+# most recently used ones as QPixmaps in a bounded LRU cache.
+########################################
+class ThumbnailLoader(QObject):
+
+    loaded = pyqtSignal(str, QImage)
+    ready = pyqtSignal(str)
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, size, device_pixel_ratio=1.0, max_count=THUMBNAIL_CACHE_SIZE, parent=None):
+        super().__init__(parent)
+        self._size = size * device_pixel_ratio
+        self._device_pixel_ratio = device_pixel_ratio
+        self._max_count = max_count
+        self._pixmaps = OrderedDict()  # key -> QPixmap, least recently used first
+        self._pending = set()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self.loaded.connect(self._slot_loaded)
+
+    ########################################
+    # Returns the cached pixmap for key, or None after queueing it for loading.
+    # load is called on a background thread and returns the PNG data, ready
+    # is emitted once the pixmap is available.
+    ########################################
+    def get(self, key, load):
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            return pixmap
+        if key not in self._pending:
+            self._pending.add(key)
+            self._pool.start(ThumbnailJob(self, key, load, self._size))
+        return None
+
+    ########################################
+    # Adds an already decoded image, e.g. the one just rendered
+    ########################################
+    def put(self, key, img):
+        if img.width() > self._size.width() or img.height() > self._size.height():
+            img = img.scaled(self._size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self._add(key, QPixmap.fromImage(img))
+
+    ########################################
+    #
+    ########################################
+    def discard(self, key):
+        self._pixmaps.pop(key, None)
+
+    ########################################
+    #
+    ########################################
+    def clear(self):
+        self._pixmaps.clear()
+
+    ########################################
+    #
+    ########################################
+    def wait(self):
+        self._pool.waitForDone()
+
+    ########################################
+    #
+    ########################################
+    def _add(self, key, pixmap):
+        pixmap.setDevicePixelRatio(self._device_pixel_ratio)
+        self._pixmaps[key] = pixmap
+        self._pixmaps.move_to_end(key)
+        while len(self._pixmaps) > self._max_count:
+            self._pixmaps.popitem(last=False)
+
+    ########################################
+    #
+    ########################################
+    def _slot_loaded(self, key, img):
+        self._pending.discard(key)
+        # null if removed meanwhile
+        if not img.isNull():
+            self._add(key, QPixmap.fromImage(img))
+            self.ready.emit(key)
+
+
+########################################
+# List model for the history and bookmarks docks, showing the equations of
+# one kind in an EquationStore, newest first. Rows are read from the store
+# in pages as the view scrolls down (fetchMore), and thumbnails are only
+# requested when a view asks for the decoration of a row, i.e. when it
+# becomes visible. So the cost of populating a view doesn't depend on the
+# number of equations (requires uniform item sizes, which the model
+# provides via SizeHintRole). If a search query is set, only matching
+# equations are shown.
+########################################
+class EquationListModel(QAbstractListModel):
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, store, kind, loader, item_size, parent=None):
+        super().__init__(parent)
+        self._store = store
+        self._kind = kind
+        self._loader = loader
+        self._item_size = item_size
+        self._entries = []  # (uid, row) pairs
+        self._uids = set()
+        self._more = True
+        self._query = ''
+        self._loader.ready.connect(self._slot_thumbnail_ready)
+
+    ########################################
+    #
+    ########################################
+    def set_query(self, query):
+        self._query = query.strip()
+        self.reload()
+
+    ########################################
+    # Drops all rows, they are read again from the store when needed
+    ########################################
+    def reload(self):
+        self.beginResetModel()
+        self._entries = []
+        self._uids = set()
+        self._more = True
+        self.endResetModel()
+
+    ########################################
+    # Inserts a new row at the top, the equation must already be stored.
+    # An existing row with the same uid (i.e. a duplicate) is moved to the
+    # top. img optionally is the already decoded PNG.
+    ########################################
+    def prepend(self, uid, row, img=None):
+        if self._query:
+            # whether it matches is only known by the store
+            self.reload()
+            return
+        if uid in self._uids:
+            self.remove(uid)
+        if img is not None:
+            self._loader.put(self._key(uid), img)
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self._entries.insert(0, (uid, row))
+        self._uids.add(uid)
+        self.endInsertRows()
+
+    ########################################
+    # Removes the row of an equation already removed from the store
+    ########################################
+    def remove(self, uid):
+        if uid not in self._uids:
+            return
+        i = self._row_of(uid)
+        self.beginRemoveRows(QModelIndex(), i, i)
+        del self._entries[i]
+        self._uids.discard(uid)
+        self.endRemoveRows()
+        self._loader.discard(self._key(uid))
+
+    ########################################
+    #
+    ########################################
+    def clear(self):
+        for uid, _ in self._entries:
+            self._loader.discard(self._key(uid))
+        self.beginResetModel()
+        self._entries = []
+        self._uids = set()
+        self._more = False
+        self.endResetModel()
+
+    ########################################
+    #
+    ########################################
+    def uid(self, index):
+        if not index.isValid():
+            return None
+        return self._entries[index.row()][0]
+
+    ########################################
+    #
+    ########################################
+    def row(self, index):
+        if not index.isValid():
+            return None
+        return self._entries[index.row()][1]
+
+    ########################################
+    #
+    ########################################
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._entries)
+
+    ########################################
+    #
+    ########################################
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._more
+
+    ########################################
+    #
+    ########################################
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        after = self._entries[-1] if self._entries else None
+        if self._query:
+            entries = self._store.search(self._kind, self._query, PAGE_SIZE, after)
+        else:
+            entries = self._store.page(self._kind, PAGE_SIZE, after)
+        self._more = len(entries) == PAGE_SIZE
+        if not entries:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._entries), len(self._entries) + len(entries) - 1)
+        self._entries += entries
+        self._uids.update(uid for uid, _ in entries)
+        self.endInsertRows()
+
+    ########################################
+    #
+    ########################################
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        uid, row = self._entries[index.row()]
+        if role == Qt.DecorationRole:
+            return self._loader.get(self._key(uid), lambda: self._store.png(self._kind, uid))
+        if role == Qt.SizeHintRole:
+            return self._item_size
+        if role == Qt.ToolTipRole:
+            return f"Saved on: {row['datetime']}"
+        if role == Qt.UserRole:
+            return uid
+        return None
+
+    ########################################
+    #
+    ########################################
+    def _key(self, uid):
+        return f'{self._kind}/{uid}'
+
+    ########################################
+    #
+    ########################################
+    def _row_of(self, uid):
+        for i, (u, _) in enumerate(self._entries):
+            if u == uid:
+                return i
+        return -1
+
+    ########################################
+    #
+    ########################################
+    def _slot_thumbnail_ready(self, key):
+        # the loader may be shared, so the key isn't necessarily one of ours
+        kind, _, uid = key.partition('/')
+        if kind == self._kind and uid in self._uids:
+            index = self.index(self._row_of(uid))
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+########################################
+#
+########################################
+class CompactionJob(QRunnable):
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, compactor, kind, png_dir, policy):
+        super().__init__()
+        self._compactor = compactor
+        self._kind = kind
+        self._png_dir = png_dir
+        self._policy = policy
+
+    ########################################
+    #
+    ########################################
+    def run(self):
+        store = self._compactor.store
+        try:
+            removed = store.remove_duplicates(self._kind)
+            if self._policy:
+                removed += store.prune(self._kind, **self._policy)
+            if self._png_dir:
+                store.remove_orphans(self._kind, self._png_dir)
+            store.vacuum()
+        except Exception as e:
+            print('ERROR', e)
+            removed = []
+        self._compactor.finished.emit(self._kind, removed)
+
+
+########################################
+# Compacts an EquationStore on a background thread: removes duplicates,
+# applies a retention policy and deletes orphaned PNGs of older versions.
+# The uids of removed equations are delivered via the finished signal.
+########################################
+class StoreCompactor(QObject):
+
+    finished = pyqtSignal(str, list)
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+
+    ########################################
+    # Queues compaction of kind, policy are keyword arguments of
+    # EquationStore.prune (no pruning if None)
+    ########################################
+    def compact(self, kind, png_dir=None, policy=None):
+        self._pool.start(CompactionJob(self, kind, png_dir, policy))
+
+    ########################################
+    #
+    ########################################
+    def is_busy(self):
+        return self._pool.activeThreadCount() > 0
+
+    ########################################
+    #
+    ########################################
+    def wait(self):
+        self._pool.waitForDone()
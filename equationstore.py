@@ -0,0 +1,390 @@
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+
+HISTORY = 'history'
+BOOKMARKS = 'bookmarks'
+
+COLUMNS = ('datetime', 'tex', 'color', 'bgcolor', 'fontsize', 'render_mode')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS equations (
+    kind TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    tex TEXT NOT NULL,
+    color TEXT,
+    bgcolor TEXT,
+    fontsize NUMERIC,
+    render_mode INTEGER,
+    png BLOB,
+    hash TEXT,
+    PRIMARY KEY (kind, uid)
+);
+CREATE INDEX IF NOT EXISTS equations_datetime ON equations (kind, datetime, uid);
+CREATE INDEX IF NOT EXISTS equations_tex ON equations (tex);
+'''
+
+SCHEMA_VERSION = 3
+
+# full-text index of the LaTeX tokens, rowids are those of the equations table. The backslash is a
+# token character, so control sequences are indexed as such. Prefix indexes keep searching while
+# typing fast (all tokens are searched as prefixes).
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS equations_fts USING fts5(tokens, prefix='1 2 3 4 5 6', tokenize="unicode61 tokenchars '\\'");
+'''
+
+# pages returned to the file system per acquisition of the lock by vacuum()
+VACUUM_CHUNK = 256
+
+# control sequences like \frac and literals (names, numbers)
+TEX_TOKEN = re.compile(r'\\[A-Za-z]+|[^\W_]+')
+
+
+########################################
+# Returns the searchable tokens of LaTeX source
+########################################
+def tex_tokens(tex):
+    return TEX_TOKEN.findall(tex)
+
+
+########################################
+# Returns a hash of everything that affects the rendered image of a row
+########################################
+def content_hash(row):
+    return hashlib.sha256(json.dumps((row['tex'], row['render_mode'], float(row['fontsize']), row['color'],
+            row['bgcolor'] or None)).encode()).hexdigest()
+
+
+########################################
+# SQLite store for the history and bookmarks. Each equation is a row with
+# its render settings and the rendered PNG, committed as soon as it's added,
+# so nothing has to be loaded at startup or saved at exit. Rows are read in
+# pages, newest first. The connection is shared between threads (thumbnails
+# are loaded in the background), access is serialized by a lock.
+# If SQLite was built with FTS5, the tokens of the LaTeX source are
+# indexed for search(), otherwise search() falls back to scanning.
+# Equations are deduplicated by a hash of their content: adding one that is
+# already stored only moves it to the top.
+########################################
+class EquationStore():
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, filename):
+        self._filename = filename
+        self._lock = threading.RLock()
+        self._con = sqlite3.connect(filename, check_same_thread=False)
+        # only takes effect before the tables are created, files of older versions are converted by vacuum()
+        self._con.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        self._con.execute('PRAGMA journal_mode=WAL')
+        self._con.execute('PRAGMA synchronous=NORMAL')
+        with self._con:
+            self._con.executescript(SCHEMA)
+        try:
+            with self._con:
+                self._con.executescript(FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError:
+            # no FTS5
+            self._fts = False
+        version = self._con.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            with self._con:
+                if version < 2 and self._fts:
+                    self._con.execute('DELETE FROM equations_fts')
+                    for rowid, tex in self._con.execute('SELECT rowid, tex FROM equations').fetchall():
+                        self._index(rowid, tex)
+                if version < 3:
+                    if 'hash' not in [r[1] for r in self._con.execute('PRAGMA table_info(equations)')]:
+                        self._con.execute('ALTER TABLE equations ADD COLUMN hash TEXT')
+                    rows = self._con.execute(f"SELECT rowid, {', '.join(COLUMNS)} FROM equations").fetchall()
+                    self._con.executemany('UPDATE equations SET hash = ? WHERE rowid = ?',
+                            ((content_hash(dict(zip(COLUMNS, r[1:]))), r[0]) for r in rows))
+                self._con.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        with self._con:
+            self._con.execute('CREATE INDEX IF NOT EXISTS equations_hash ON equations (kind, hash)')
+
+    ########################################
+    #
+    ########################################
+    def close(self):
+        with self._lock:
+            self._con.close()
+
+    ########################################
+    # Adds (or replaces) an equation, row is a dict with keys COLUMNS.
+    # Returns the uid it's stored as, which is that of an equal equation
+    # if there already is one.
+    ########################################
+    def add(self, kind, uid, row, png=None):
+        return self.add_many(kind, ((uid, row, png),))[0]
+
+    ########################################
+    # Adds many equations in a single transaction, items are (uid, row, png).
+    # Returns the uids they are stored as.
+    ########################################
+    def add_many(self, kind, items):
+        uids = []
+        with self._lock, self._con:
+            for uid, row, png in items:
+                h = content_hash(row)
+                res = self._con.execute('SELECT uid FROM equations WHERE kind = ? AND hash = ?', (kind, h)).fetchone()
+                if res is not None:
+                    uid = res[0]
+                self._unindex(kind, uid)
+                rowid = self._con.execute(
+                    'INSERT OR REPLACE INTO equations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (kind, uid) + tuple(row[col] for col in COLUMNS) + (png, h)
+                ).lastrowid
+                self._index(rowid, row['tex'])
+                uids.append(uid)
+        return uids
+
+    ########################################
+    #
+    ########################################
+    def remove(self, kind, uid):
+        with self._lock, self._con:
+            self._unindex(kind, uid)
+            self._con.execute('DELETE FROM equations WHERE kind = ? AND uid = ?', (kind, uid))
+
+    ########################################
+    #
+    ########################################
+    def clear(self, kind):
+        with self._lock, self._con:
+            if self._fts:
+                self._con.execute(
+                    'DELETE FROM equations_fts WHERE rowid IN (SELECT rowid FROM equations WHERE kind = ?)', (kind,))
+            self._con.execute('DELETE FROM equations WHERE kind = ?', (kind,))
+
+    ########################################
+    # Removes the given equations, returns their uids
+    ########################################
+    def remove_many(self, kind, uids):
+        with self._lock, self._con:
+            for uid in uids:
+                self._unindex(kind, uid)
+            self._con.executemany('DELETE FROM equations WHERE kind = ? AND uid = ?', ((kind, uid) for uid in uids))
+        return uids
+
+    ########################################
+    # Removes all but the most recent of equal equations, which older
+    # versions stored several times. Returns the uids of removed equations.
+    ########################################
+    def remove_duplicates(self, kind):
+        with self._lock:
+            uids = [r[0] for r in self._con.execute(
+                'SELECT uid FROM equations e WHERE kind = ? AND EXISTS (SELECT 1 FROM equations d '
+                'WHERE d.kind = e.kind AND d.hash = e.hash AND (d.datetime, d.uid) > (e.datetime, e.uid))',
+                (kind,)
+            )]
+            return self.remove_many(kind, uids)
+
+    ########################################
+    # Removes the oldest equations beyond max_count, older than max_age
+    # days or beyond max_bytes of PNG data (0 means no limit). Returns the
+    # uids of removed equations.
+    ########################################
+    def prune(self, kind, max_count=0, max_age=0, max_bytes=0):
+        uids = set()
+        with self._lock:
+            if max_count:
+                uids.update(r[0] for r in self._con.execute(
+                    'SELECT uid FROM equations WHERE kind = ? ORDER BY datetime DESC, uid DESC LIMIT -1 OFFSET ?',
+                    (kind, max_count)
+                ))
+            if max_age:
+                oldest = (datetime.now() - timedelta(days=max_age)).isoformat(' ', timespec='seconds')
+                uids.update(r[0] for r in self._con.execute(
+                    'SELECT uid FROM equations WHERE kind = ? AND datetime < ?', (kind, oldest)
+                ))
+            if max_bytes:
+                uids.update(r[0] for r in self._con.execute(
+                    'SELECT uid FROM (SELECT uid, SUM(LENGTH(png)) OVER (ORDER BY datetime DESC, uid DESC) AS size '
+                    'FROM equations WHERE kind = ?) WHERE size > ?', (kind, max_bytes)
+                ))
+            return self.remove_many(kind, list(uids))
+
+    ########################################
+    # Returns the total size of the PNG data in bytes
+    ########################################
+    def size(self, kind):
+        with self._lock:
+            return self._con.execute(
+                'SELECT COALESCE(SUM(LENGTH(png)), 0) FROM equations WHERE kind = ?', (kind,)).fetchone()[0]
+
+    ########################################
+    # Returns the space of removed rows to the file system if it makes up
+    # more than fraction of the database file. This is done in steps of
+    # VACUUM_CHUNK pages, so the lock (which the GUI thread takes as well)
+    # is only held briefly. Files of older versions need a full VACUUM once
+    # to switch to incremental vacuuming, which runs on a separate
+    # connection, without the lock.
+    ########################################
+    def vacuum(self, fraction=.25):
+        with self._lock:
+            free = self._con.execute('PRAGMA freelist_count').fetchone()[0]
+            total = self._con.execute('PRAGMA page_count').fetchone()[0]
+            mode = self._con.execute('PRAGMA auto_vacuum').fetchone()[0]
+        if not total or free / total <= fraction:
+            return False
+        if mode != 2:  # not INCREMENTAL
+            con = sqlite3.connect(self._filename)
+            try:
+                con.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                con.execute('VACUUM')
+            finally:
+                con.close()
+            return True
+        while free:
+            with self._lock:
+                # executescript() steps the statement to the end, execute() would only free a single page
+                self._con.executescript(f'PRAGMA incremental_vacuum({VACUUM_CHUNK})')
+                left = self._con.execute('PRAGMA freelist_count').fetchone()[0]
+            if left >= free:
+                break
+            free = left
+        return True
+
+    ########################################
+    #
+    ########################################
+    def count(self, kind):
+        with self._lock:
+            return self._con.execute('SELECT COUNT(*) FROM equations WHERE kind = ?', (kind,)).fetchone()[0]
+
+    ########################################
+    # Returns the row of an equation as dict, or None
+    ########################################
+    def get(self, kind, uid):
+        with self._lock:
+            res = self._con.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM equations WHERE kind = ? AND uid = ?", (kind, uid)
+            ).fetchone()
+        return None if res is None else dict(zip(COLUMNS, res))
+
+    ########################################
+    #
+    ########################################
+    def png(self, kind, uid):
+        with self._lock:
+            res = self._con.execute(
+                'SELECT png FROM equations WHERE kind = ? AND uid = ?', (kind, uid)
+            ).fetchone()
+        return None if res is None else res[0]
+
+    ########################################
+    # Returns up to limit (uid, row) pairs, newest first. after is the last
+    # (uid, row) pair of the previous page, so the cost of a page doesn't
+    # depend on how many were read before.
+    ########################################
+    def page(self, kind, limit, after=None):
+        sql = f"SELECT uid, {', '.join(COLUMNS)} FROM equations WHERE kind = ?"
+        args = [kind]
+        if after is not None:
+            sql += ' AND (datetime, uid) < (?, ?)'
+            args += [after[1]['datetime'], after[0]]
+        sql += ' ORDER BY datetime DESC, uid DESC LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            res = self._con.execute(sql, args).fetchall()
+        return [(r[0], dict(zip(COLUMNS, r[1:]))) for r in res]
+
+    ########################################
+    # Returns up to limit (uid, row) pairs whose LaTeX source contains all
+    # tokens of query (the last one may be incomplete), most recently added
+    # first. after is the last pair of the previous page.
+    ########################################
+    def search(self, kind, query, limit, after=None):
+        tokens = tex_tokens(query)
+        if not tokens:
+            return self.page(kind, limit, after)
+        if self._fts:
+            sql = (f"SELECT e.uid, {', '.join('e.' + col for col in COLUMNS)} FROM equations_fts f "
+                    'JOIN equations e ON e.rowid = f.rowid WHERE equations_fts MATCH ? AND e.kind = ?')
+            # every token as prefix, so results are found while typing
+            args = [' '.join(f'"{token}"*' for token in tokens), kind]
+            order = 'f.rowid'
+        else:
+            sql = f"SELECT e.uid, {', '.join('e.' + col for col in COLUMNS)} FROM equations e WHERE e.kind = ?"
+            args = [kind]
+            for token in tokens:
+                sql += " AND e.tex LIKE ? ESCAPE '!'"
+                args.append('%' + re.sub(r'([!%_])', r'!\1', token) + '%')
+            order = 'e.rowid'
+        if after is not None:
+            sql += f' AND {order} < (SELECT rowid FROM equations WHERE kind = ? AND uid = ?)'
+            args += [kind, after[0]]
+        sql += f' ORDER BY {order} DESC LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            res = self._con.execute(sql, args).fetchall()
+        return [(r[0], dict(zip(COLUMNS, r[1:]))) for r in res]
+
+    ########################################
+    # Imports entries (dict uid -> row) as saved in state.ini by older
+    # versions, together with their PNGs in png_dir, which are deleted
+    # afterwards.
+    ########################################
+    def import_entries(self, kind, entries, png_dir):
+        items = []
+        # oldest first, so search results (ordered by rowid) are in the same order as pages
+        for uid, row in sorted(entries.items(), key=lambda entry: entry[1]['datetime']):
+            png = None
+            fn = os.path.join(png_dir, f'{uid}.png')
+            if os.path.isfile(fn):
+                with open(fn, 'rb') as f:
+                    png = f.read()
+            items.append((uid, row, png))
+        self.add_many(kind, items)
+        for uid in entries:
+            fn = os.path.join(png_dir, f'{uid}.png')
+            if os.path.isfile(fn):
+                os.unlink(fn)
+
+    ########################################
+    # Deletes PNGs left in png_dir by older versions that don't belong to a
+    # stored equation (the PNGs of stored ones were already imported).
+    # Returns the number of deleted files.
+    ########################################
+    def remove_orphans(self, kind, png_dir):
+        if not os.path.isdir(png_dir):
+            return 0
+        count = 0
+        for entry in os.scandir(png_dir):
+            uid, ext = os.path.splitext(entry.name)
+            if ext.lower() == '.png' and self.get(kind, uid) is None:
+                try:
+                    os.unlink(entry.path)
+                    count += 1
+                except OSError:
+                    pass
+        try:
+            os.rmdir(png_dir)
+        except OSError:
+            # not empty
+            pass
+        return count
+
+    ########################################
+    #
+    ########################################
+    def _index(self, rowid, tex):
+        if self._fts:
+            self._con.execute('INSERT INTO equations_fts (rowid, tokens) VALUES (?, ?)', (rowid, ' '.join(tex_tokens(tex))))
+
+    ########################################
+    #
+    ########################################
+    def _unindex(self, kind, uid):
+        if self._fts:
+            self._con.execute(
+                'DELETE FROM equations_fts WHERE rowid IN (SELECT rowid FROM equations WHERE kind = ? AND uid = ?)',
+                (kind, uid))
@@ -1,6 +1,14 @@
-from PyQt5.QtCore import Qt, QRegExp
-from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QFont, QColor
-from PyQt5.QtWidgets import QPlainTextEdit
+import re
+
+from PyQt5.QtCore import Qt, QRegExp, QStringListModel
+from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QFont, QTextCursor
+from PyQt5.QtWidgets import QCompleter, QPlainTextEdit
+
+# letters of a command (after the backslash) typed before completions are shown
+MIN_COMPLETION_PREFIX = 2
+
+# max. number of completions shown
+MAX_COMPLETIONS = 20
 
 
 ########################################
@@ -64,6 +72,13 @@ class LatexEditor(QPlainTextEdit):
     def __init__(self, parent=None):
         super().__init__(parent)
         self._highlighter = LatexHighlighter(self.document())
+        self._completion_source = None
+        self._completion_prefix = ''
+        self._completer = QCompleter(QStringListModel(self), self)
+        self._completer.setWidget(self)
+        # the candidates are already filtered (and may be fuzzy matches)
+        self._completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self._completer.activated[str].connect(self._insert_completion)
 
     ########################################
     #
@@ -72,3 +87,53 @@ class LatexEditor(QPlainTextEdit):
         self._highlighter.rules[0].format.setForeground(control_color)
         self._highlighter.rules[1].format.setForeground(braces_color)
         self._highlighter.rules[2].format.setForeground(comment_color)
+
+    ########################################
+    # Enables completion of commands, source is called with the command
+    # typed so far (e.g. "\alp") and returns a list of commands
+    ########################################
+    def set_completion_source(self, source):
+        self._completion_source = source
+
+    ########################################
+    #
+    ########################################
+    def keyPressEvent(self, event):
+        # keys the completer handles while its popup is shown
+        if self._completer.popup().isVisible() and event.key() in (Qt.Key_Enter, Qt.Key_Return,
+                Qt.Key_Escape, Qt.Key_Tab, Qt.Key_Backtab):
+            event.ignore()
+            return
+        super().keyPressEvent(event)
+        if self._completion_source is not None and event.text():
+            self._update_completions()
+
+    ########################################
+    # Shows the completions of the command left of the cursor
+    ########################################
+    def _update_completions(self):
+        popup = self._completer.popup()
+        cursor = self.textCursor()
+        m = re.search(r'\\[A-Za-z]+$', cursor.block().text()[:cursor.positionInBlock()])
+        if m is None or len(m.group()) - 1 < MIN_COMPLETION_PREFIX:
+            popup.hide()
+            return
+        self._completion_prefix = m.group()
+        commands = self._completion_source(self._completion_prefix)[:MAX_COMPLETIONS]
+        if not commands or commands == [self._completion_prefix]:
+            popup.hide()
+            return
+        self._completer.model().setStringList(commands)
+        rect = self.cursorRect()
+        rect.setWidth(popup.sizeHintForColumn(0) + popup.verticalScrollBar().sizeHint().width())
+        self._completer.complete(rect)
+        popup.setCurrentIndex(self._completer.completionModel().index(0, 0))
+
+    ########################################
+    # Replaces the command left of the cursor with the chosen one
+    ########################################
+    def _insert_completion(self, command):
+        cursor = self.textCursor()
+        cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor, len(self._completion_prefix))
+        cursor.insertText(command)
+        self.setTextCursor(cursor)
@@ -1,17 +1,33 @@
 from datetime import datetime
+import glob
+import multiprocessing
 import os
 import sys
+import threading
+import time
 import traceback
 import uuid
 
-import ziamath as zm
-import cairosvg_min as cairosvg
+from startupprofile import startup_profiler
+
+# enabled before the other imports, so that they are timed as well
+if __name__ == '__main__' and '--startup-profile' in sys.argv:
+    startup_profiler.enable()
 
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from PyQt5 import uic
 
+from equationmodel import EquationListModel, StoreCompactor, ThumbnailLoader
+from equationstore import BOOKMARKS, HISTORY, EquationStore
+from rendercache import RenderCache
+from renderdefs import FORMATS, RenderMode
+from renderprofile import format_profile, profiler
+from renderworker import ExportWorker, RenderWorker
+from symbolindex import SymbolIndex
+from symbolpicker import SymbolPicker
+
 APP_NAME = 'EqualZ'
 APP_VERSION = 1
 
@@ -24,30 +40,6 @@ IS_WIN = sys.platform == 'win32'
 IS_MAC = sys.platform == 'darwin'
 IS_LINUX = not IS_WIN and not IS_MAC
 
-if IS_WIN:
-    reg = QSettings(r'HKEY_CURRENT_USER\Software\Microsoft\Windows\CurrentVersion\Themes\Personalize', QSettings.NativeFormat)
-    IS_DARK = reg.value('AppsUseLightTheme', 1) == 0
-elif IS_MAC:
-    import subprocess
-    p = subprocess.Popen('defaults read -g AppleInterfaceStyle', stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    IS_DARK = bool(p.communicate()[0])
-else:
-    import subprocess
-    try:
-        if 'XDG_CURRENT_DESKTOP' in os.environ and 'cinnamon' in os.environ['XDG_CURRENT_DESKTOP'].lower():
-            out = subprocess.run(
-                ['gsettings', 'get', 'org.cinnamon.theme', 'name'],
-                capture_output=True
-            ).stdout.decode()
-        else:
-            out = subprocess.run(
-                ['gsettings', 'get', 'org.gnome.desktop.interface', 'color-scheme'],
-                capture_output=True
-            ).stdout.decode()
-        IS_DARK = '-dark' in out.lower().strip()[1:-1]
-    except:
-        IS_DARK = False
-
 if IS_FROZEN and IS_MAC:
     RES_DIR = os.path.realpath(os.path.join(APP_DIR, '..', 'Resources'))
 else:
@@ -70,19 +62,126 @@ else:
 if not os.path.isdir(DATA_DIR):
     os.mkdir(DATA_DIR)
 
-BOOKMARKS_DIR = os.path.join(DATA_DIR, 'bookmarks')
-if not os.path.isdir(BOOKMARKS_DIR):
-    os.mkdir(BOOKMARKS_DIR)
+STATE_FILE = os.path.join(DATA_DIR, 'state.ini')
 
+# history and bookmarks
+DB_FILE = os.path.join(DATA_DIR, 'equations.db')
+
+# PNGs of history and bookmarks saved by older versions, imported into DB_FILE
+BOOKMARKS_DIR = os.path.join(DATA_DIR, 'bookmarks')
 HISTORY_DIR = os.path.join(DATA_DIR, 'history')
-if not os.path.isdir(HISTORY_DIR):
-    os.mkdir(HISTORY_DIR)
 
-class RenderMode():
-    Display = 0
-    Inline = 1
-    Text = 2
-    MathML = 3
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+
+# inverted symbol and template icons for dark mode, see load_icon()
+DARK_ICON_DIR = os.path.join(DATA_DIR, 'icons-dark')
+
+# Unicode math symbols and their LaTeX commands, and the search index built from it
+SYMBOLS_FILE = os.path.join(RES_DIR, 'unimathsymbols.txt')
+SYMBOL_INDEX_FILE = os.path.join(DATA_DIR, 'symbols.idx')
+
+# glyphs used in previous sessions, parsed in the background at startup (see renderer.warm_up)
+GLYPH_CACHE_FILE = os.path.join(DATA_DIR, 'glyphs.json')
+
+# live preview: time in ms without further input before rendering
+LIVE_PREVIEW_DELAY = 30
+
+# time in ms between compactions of history and bookmarks (the first one is run shortly after start)
+COMPACTION_INTERVAL = 10 * 60 * 1000
+
+
+########################################
+# Asks the OS if a dark theme is used. On macOS and Linux this runs an
+# external program, see IS_DARK.
+########################################
+def detect_dark_mode():
+    if IS_WIN:
+        reg = QSettings(r'HKEY_CURRENT_USER\Software\Microsoft\Windows\CurrentVersion\Themes\Personalize', QSettings.NativeFormat)
+        return reg.value('AppsUseLightTheme', 1) == 0
+    import subprocess
+    if IS_MAC:
+        p = subprocess.Popen('defaults read -g AppleInterfaceStyle', stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
+        return bool(p.communicate()[0])
+    try:
+        if 'XDG_CURRENT_DESKTOP' in os.environ and 'cinnamon' in os.environ['XDG_CURRENT_DESKTOP'].lower():
+            out = subprocess.run(
+                ['gsettings', 'get', 'org.cinnamon.theme', 'name'],
+                capture_output=True
+            ).stdout.decode()
+        else:
+            out = subprocess.run(
+                ['gsettings', 'get', 'org.gnome.desktop.interface', 'color-scheme'],
+                capture_output=True
+            ).stdout.decode()
+        return '-dark' in out.lower().strip()[1:-1]
+    except:
+        return False
+
+
+########################################
+# Stores the result of detect_dark_mode() for the next start
+########################################
+def update_dark_mode_cache():
+    QSettings(STATE_FILE, QSettings.IniFormat).setValue('Theme/IsDark', detect_dark_mode())
+
+
+########################################
+# Outside of Windows the theme of the last start is used, so that no external program delays the
+# start. It's checked again in the background once the window is shown, a change is applied at the
+# next start.
+########################################
+def load_dark_mode():
+    state = QSettings(STATE_FILE, QSettings.IniFormat)
+    if not IS_WIN and state.contains('Theme/IsDark'):
+        return state.value('Theme/IsDark', type=bool)
+    return detect_dark_mode()
+
+
+# Set at start (see the end of this file), not on import: the worker processes of the batch export
+# are spawned and import this module again (as __mp_main__), they don't need it
+IS_DARK = False
+
+
+########################################
+# Loads the icon of a symbol or template image in RES_DIR. In dark mode
+# the image is inverted, the inverted image is stored in DARK_ICON_DIR
+# under a name containing the modification time of the original, so it's
+# only created again if the original changes.
+########################################
+def load_icon(filename):
+    if not IS_DARK:
+        return QIcon(filename)
+    base = os.path.splitext(os.path.relpath(filename, RES_DIR))[0].replace(os.sep, '_')
+    cached = os.path.join(DARK_ICON_DIR, f'{base}-{os.stat(filename).st_mtime_ns}.png')
+    if os.path.isfile(cached):
+        return QIcon(cached)
+    img = QImage(filename)
+    img.invertPixels()
+    os.makedirs(DARK_ICON_DIR, exist_ok=True)
+    for fn in glob.glob(os.path.join(glob.escape(DARK_ICON_DIR), glob.escape(base) + '-*.png')):
+        os.remove(fn)
+    if not img.save(cached):
+        return QIcon(QPixmap.fromImage(img))
+    return QIcon(cached)
+
+
+########################################
+# Imports the rendering stack (ziamath and its fonts, cairosvg_min,
+# cairocffi_min etc.) on a background thread, so that it doesn't delay
+# showing the window, and warms it up with renderer.warm_up(). Code that
+# renders imports renderer itself, which waits for this import if it isn't
+# finished yet.
+########################################
+def load_render_stack(glyph_cache=None):
+
+    def _load():
+        with startup_profiler.phase('render stack (background)'):
+            import renderer
+        with startup_profiler.phase('warm-up (background)'):
+            renderer.warm_up(glyph_cache)
+        startup_profiler.report()
+
+    threading.Thread(target=_load, name='render stack', daemon=True).start()
 
 
 ########################################
@@ -94,8 +193,15 @@ class Main(QMainWindow):
         super().__init__()
 
         self._text_filename = None
-        self._current_png = None
-        self._current_svg = None
+
+        # the equation shown in the preview, set by slot_render_finished
+        self._current_uid = None
+        self._current_tex = None
+        self._current_rendermode = None
+        self._current_color = None
+        self._current_bgcolor = None
+        self._current_fontsize = None
+        self._current_thumbnail = None
 
         QResource.registerResource(os.path.join(RES_DIR, 'main.rcc'))
         uic.loadUi(os.path.join(RES_DIR, 'main.ui'), self)
@@ -127,15 +233,41 @@ class Main(QMainWindow):
         qss.open(QFile.ReadOnly)
         qApp.setStyleSheet(bytes(qss.readAll()).decode())
 
-        self._state = QSettings(os.path.join(DATA_DIR, 'state.ini'), QSettings.IniFormat)
+        self._state = QSettings(STATE_FILE, QSettings.IniFormat)
+
+        # max. size of the render cache in MB
+        self._cache = RenderCache(CACHE_DIR, self._state.value('RenderCache/MaxSize', 100, type=int) * 1024 * 1024)
+
+        self._use_glyph_cache = self._state.value('RenderCache/GlyphCache', True, type=bool)
 
-        self._bookmarks = self._state.value('Bookmarks')
-        if type(self._bookmarks) != dict:
-            self._bookmarks = {}
+        self._render_worker = RenderWorker(self._cache, self)
+        self._render_worker.finished.connect(self.slot_render_finished)
+        self._render_worker.failed.connect(self.slot_render_failed)
+        self._last_render_key = None
 
-        self._history = self._state.value('History')
-        if type(self._history) != dict:
-            self._history = {}
+        # batch export of history and bookmark entries
+        self._export_worker = ExportWorker(CACHE_DIR, self._state.value('RenderCache/MaxSize', 100, type=int) * 1024 * 1024, self)
+        self._export_worker.progress.connect(self.slot_export_progress)
+        self._export_worker.finished.connect(self.slot_export_finished)
+        self._export_progress = None
+        self._export_count = 0
+
+        # coalesces keystrokes etc. into a single live preview render
+        self._live_preview_timer = QTimer(self)
+        self._live_preview_timer.setSingleShot(True)
+        self._live_preview_timer.setInterval(LIVE_PREVIEW_DELAY)
+        self._live_preview_timer.timeout.connect(lambda: self.slot_render(add_to_history=False, live=True))
+
+        self._store = EquationStore(DB_FILE)
+        self._import_state(BOOKMARKS, 'Bookmarks', BOOKMARKS_DIR)
+        self._import_state(HISTORY, 'History', HISTORY_DIR)
+
+        self._compactor = StoreCompactor(self._store, self)
+        self._compactor.finished.connect(self.slot_compaction_finished)
+        self._compaction_timer = QTimer(self)
+        self._compaction_timer.timeout.connect(self.slot_compact)
+        self._compaction_timer.start(COMPACTION_INTERVAL)
+        QTimer.singleShot(5000, self.slot_compact)
 
         self.renderButton.clicked.connect(self.slot_render)
 
@@ -157,73 +289,22 @@ class Main(QMainWindow):
 
         self.editor.textChanged.connect(self.slot_text_changed)
 
+        self.spinBoxFontSize.valueChanged.connect(self.slot_live_preview_schedule)
+        self.checkBoxTransparent.toggled.connect(self.slot_live_preview_schedule)
+        self.button_group_render_mode.buttonClicked.connect(self.slot_live_preview_schedule)
+
         self.setup_actions()
         self.setup_render_label()
+
+        # both docks share the thumbnail cache, their icon sizes are the same
+        self._thumbnail_loader = ThumbnailLoader(self.listViewHistory.iconSize(), qApp.devicePixelRatio(), parent=self)
+
         self.setup_bookmarks()
         self.setup_history()
 
         self.toolBarTemplates.addWidget(self.templatesBar)
 
-        symbol_settings = QSettings(os.path.join(RES_DIR, 'symbols', 'symbols.ini'),
-                QSettings.IniFormat)
-        for g in symbol_settings.childGroups():
-            group_dir = os.path.join(RES_DIR, 'symbols', g)
-
-            symbol_settings.beginGroup(g)
-
-            tb = QToolButton(self)
-            tb.setToolTip(g)
-            tb.setIcon(QIcon(os.path.join(group_dir, symbol_settings.value('symbols/1/icon'))))
-            tb.setPopupMode(QToolButton.MenuButtonPopup)
-            tb.triggered.connect(self.slot_symbol_selected)
-            self.toolBarSymbols.addWidget(tb)
-
-            menu = QMenu(tb)
-            tb.setMenu(menu)
-            cnt = int(symbol_settings.value('symbols/size'))
-            for i in range(1, cnt + 1):
-                action = menu.addAction(QIcon(os.path.join(group_dir, symbol_settings.value(f'symbols/{i}/icon'))),
-                        symbol_settings.value(f'symbols/{i}/name'))
-                action.setData(symbol_settings.value(f'symbols/{i}/latex'))
-                if i == 1:
-                    tb.setDefaultAction(action)
-
-            symbol_settings.endGroup()
-
-        templates_settings = QSettings(os.path.join(RES_DIR, 'templates', 'templates.ini'),
-                QSettings.IniFormat)
-        for g in templates_settings.childGroups():
-            group_dir = os.path.join(RES_DIR, 'templates', g.lower())
-            templates_settings.beginGroup(g)
-
-            page = QWidget(self)
-            self.templatesBar.addTab(page, g)
-
-            layout = QHBoxLayout()
-            layout.setContentsMargins(1, 1, 1, 1)
-            page.setLayout(layout)
-
-            for k in templates_settings.allKeys():
-                v = templates_settings.value(k)
-                if type(v) == list:
-                    v = ','.join(v)
-                ico = QIcon(os.path.join(group_dir, k))
-                size = ico.availableSizes()[0]
-                if IS_DARK:
-                    img = ico.pixmap(size).toImage()
-                    img.invertPixels()
-                    ico = QIcon(QPixmap.fromImage(img))
-                size.setHeight(46)
-                tb = QToolButton(self)
-                tb.setIconSize(size)
-                tb.setIcon(ico)
-                layout.addWidget(tb)
-                tb.pressed.connect(lambda tex=v: self.editor.insertPlainText(tex))
-
-            templates_settings.endGroup()
-
-            layout.addStretch()
-
+        # the actions of main.ui, the icons of symbols and templates are inverted by load_icon()
         if IS_DARK:
             for act in self.findChildren(QAction):
                 ico_old = act.icon()
@@ -234,6 +315,14 @@ class Main(QMainWindow):
                     ico_new = QIcon(QPixmap.fromImage(img))
                     act.setIcon(ico_new)
 
+        self.setup_symbols()
+        self.setup_templates()
+
+        # loaded on first use, see _get_symbol_index()
+        self._symbol_index = None
+        self.editor.set_completion_source(lambda prefix: [command for command, _, _ in
+                self._get_symbol_index().search(prefix)])
+
         if IS_DARK:
             self.editor.set_colors(QColor('#68D4FF'), QColor('#EE5278'), QColor('#72994C'))
 
@@ -261,6 +350,8 @@ class Main(QMainWindow):
             else:
                 font = QFont('DejaVu Sans Mono', 12)
         self.editor.setFont(font)
+        self.actionLivePreview.setChecked(self._state.value('Editor/LivePreview', False, type=bool))
+        self.actionRenderProfile.setChecked(self._state.value('View/RenderProfile', False, type=bool))
 
         self.show()
 
@@ -270,6 +361,9 @@ class Main(QMainWindow):
         self.actionViewBookmarks.setChecked(self.dockWidgetBookmarks.isVisible())
         self.actionViewHistory.setChecked(self.dockWidgetHistory.isVisible())
 
+        # runs after the pending paint events of the window
+        QTimer.singleShot(0, self._after_first_paint)
+
     ########################################
     #
     ########################################
@@ -278,10 +372,14 @@ class Main(QMainWindow):
         self.actionBookmark.triggered.connect(self.slot_bookmark_add)
         self.actionEditDelete.triggered.connect(lambda: self.editor.insertPlainText(''))
         self.actionEditorFont.triggered.connect(self.slot_set_editor_font)
+        self.actionInsertSymbol.triggered.connect(self.slot_insert_symbol)
         self.actionExportAs.triggered.connect(self.slot_export_as)
+        self.actionLivePreview.toggled.connect(self.slot_live_preview_schedule)
         self.actionNewEquation.triggered.connect(self.slot_new_equation)
         self.actionOpenTextFile.triggered.connect(self.slot_open_text_file)
         self.actionRender.triggered.connect(self.slot_render)
+        self.actionRenderProfile.toggled.connect(self.slot_render_profile_toggled)
+        self.actionExportRenderProfile.triggered.connect(self.slot_render_profile_export)
         self.actionSaveTextFile.triggered.connect(self.slot_save_text_file)
 
     ########################################
@@ -290,12 +388,12 @@ class Main(QMainWindow):
     def setup_render_label(self):
 
         def _context_menu_requested(pos):
-            cm = QMenu(self.renderLabel)
+            cm = QMenu(self.previewView)
             cm.addAction(self.actionBookmark)
             cm.addAction(self.actionExportAs)
             cm.exec(QCursor.pos())
 
-        self.renderLabel.customContextMenuRequested.connect(_context_menu_requested)
+        self.previewView.customContextMenuRequested.connect(_context_menu_requested)
 
     ########################################
     #
@@ -303,29 +401,31 @@ class Main(QMainWindow):
     def setup_bookmarks(self):
 
         def _context_menu_requested(pos):
-            if self.listWidgetBookmarks.count() == 0:
+            if self._bookmarks_model.rowCount() == 0:
                 return
-            cm = QMenu(self.listWidgetBookmarks)
+            cm = QMenu(self.listViewBookmarks)
             a = cm.addAction('Load Equation')
             a.triggered.connect(lambda: self.slot_bookmark_double_clicked(
-                    self.listWidgetBookmarks.currentItem()))
+                    self.listViewBookmarks.currentIndex()))
+            a = cm.addAction('Export Selected...')
+            a.triggered.connect(lambda: self.slot_export_selected(self.listViewBookmarks))
+            a = cm.addAction('Export Selected as PDF Document...')
+            a.triggered.connect(lambda: self.slot_export_selected_pdf(self.listViewBookmarks))
+            a = cm.addAction('Export Selected as Sprite Sheet...')
+            a.triggered.connect(lambda: self.slot_export_selected_atlas(self.listViewBookmarks))
             cm.addSeparator()
             a = cm.addAction('Remove Equation')
             a.triggered.connect(self.slot_bookmark_remove)
             cm.exec(QCursor.pos())
 
-        self.listWidgetBookmarks.customContextMenuRequested.connect(_context_menu_requested)
+        self.listViewBookmarks.customContextMenuRequested.connect(_context_menu_requested)
 
-        self._bookmarks = dict(sorted(self._bookmarks.items(), key=lambda row: row[1]['datetime'],
-                reverse=True))
+        self._bookmarks_model = EquationListModel(self._store, BOOKMARKS, self._thumbnail_loader,
+                self._thumbnail_item_size(self.listViewBookmarks), self)
+        self.listViewBookmarks.setModel(self._bookmarks_model)
+        self.lineEditSearchBookmarks.textChanged.connect(self._bookmarks_model.set_query)
 
-        for uid, row in self._bookmarks.items():
-            lwi = QListWidgetItem(self.listWidgetBookmarks)
-            lwi.setIcon(QIcon(os.path.join(BOOKMARKS_DIR, f'{uid}.png')))
-            lwi.setData(Qt.UserRole, uid)
-            lwi.setToolTip(f"Saved on: {row['datetime']}")
-
-        self.listWidgetBookmarks.itemDoubleClicked.connect(self.slot_bookmark_double_clicked)
+        self.listViewBookmarks.doubleClicked.connect(self.slot_bookmark_double_clicked)
 
         self.dockWidgetBookmarks.visibilityChanged.connect(lambda _:
                 self.actionViewBookmarks.setChecked(self.dockWidgetBookmarks.isVisible()))
@@ -336,11 +436,17 @@ class Main(QMainWindow):
     def setup_history(self):
 
         def _context_menu_requested(pos):
-            if self.listWidgetHistory.count() == 0:
+            if self._history_model.rowCount() == 0:
                 return
-            cm = QMenu(self.listWidgetHistory)
+            cm = QMenu(self.listViewHistory)
             a = cm.addAction('Load Equation')
-            a.triggered.connect(lambda: self.slot_history_double_clicked(self.listWidgetHistory.currentItem()))
+            a.triggered.connect(lambda: self.slot_history_double_clicked(self.listViewHistory.currentIndex()))
+            a = cm.addAction('Export Selected...')
+            a.triggered.connect(lambda: self.slot_export_selected(self.listViewHistory))
+            a = cm.addAction('Export Selected as PDF Document...')
+            a.triggered.connect(lambda: self.slot_export_selected_pdf(self.listViewHistory))
+            a = cm.addAction('Export Selected as Sprite Sheet...')
+            a.triggered.connect(lambda: self.slot_export_selected_atlas(self.listViewHistory))
             cm.addSeparator()
             a = cm.addAction('Remove Equation')
             a.triggered.connect(self.slot_history_remove)
@@ -350,33 +456,81 @@ class Main(QMainWindow):
 
             cm.exec(QCursor.pos())
 
-        self.listWidgetHistory.customContextMenuRequested.connect(_context_menu_requested)
-
-        self._history = dict(sorted(self._history.items(), key=lambda row: row[1]['datetime'], reverse=True))
+        self.listViewHistory.customContextMenuRequested.connect(_context_menu_requested)
 
-        for uid, row in self._history.items():
-            lwi = QListWidgetItem(self.listWidgetHistory)
-            lwi.setIcon(QIcon(os.path.join(HISTORY_DIR, f'{uid}.png')))
-            lwi.setData(Qt.UserRole, uid)
-            lwi.setToolTip(f"Saved on: {row['datetime']}")
+        self._history_model = EquationListModel(self._store, HISTORY, self._thumbnail_loader,
+                self._thumbnail_item_size(self.listViewHistory), self)
+        self.listViewHistory.setModel(self._history_model)
+        self.lineEditSearchHistory.textChanged.connect(self._history_model.set_query)
 
-        self.listWidgetHistory.itemDoubleClicked.connect(self.slot_history_double_clicked)
+        self.listViewHistory.doubleClicked.connect(self.slot_history_double_clicked)
 
         self.dockWidgetHistory.visibilityChanged.connect(lambda _: self.actionViewHistory.setChecked(
                 self.dockWidgetHistory.isVisible()))
 
+    ########################################
+    # Only the first symbol of each group (the default action of its tool
+    # button) is created here, the menus are filled when first opened
+    ########################################
+    def setup_symbols(self):
+        self._symbol_settings = QSettings(os.path.join(RES_DIR, 'symbols', 'symbols.ini'),
+                QSettings.IniFormat)
+        for g in self._symbol_settings.childGroups():
+            tb = QToolButton(self)
+            tb.setToolTip(g)
+            tb.setPopupMode(QToolButton.MenuButtonPopup)
+            tb.triggered.connect(self.slot_symbol_selected)
+            self.toolBarSymbols.addWidget(tb)
+
+            menu = QMenu(tb)
+            tb.setMenu(menu)
+            tb.setDefaultAction(self._add_symbol_action(menu, g, 1))
+            menu.aboutToShow.connect(lambda menu=menu, group=g: self._fill_symbol_menu(menu, group))
+
+    ########################################
+    # Only the current tab is filled here, the others when first selected
+    ########################################
+    def setup_templates(self):
+        self._templates_settings = QSettings(os.path.join(RES_DIR, 'templates', 'templates.ini'),
+                QSettings.IniFormat)
+        for g in self._templates_settings.childGroups():
+            page = QWidget(self)
+            page.setProperty('group', g)
+            self.templatesBar.addTab(page, g)
+
+            layout = QHBoxLayout()
+            layout.setContentsMargins(1, 1, 1, 1)
+            page.setLayout(layout)
+
+        self.templatesBar.currentChanged.connect(self._fill_template_page)
+        self._fill_template_page(self.templatesBar.currentIndex())
+
     def __EVENTS(): pass
 
     ########################################
     #
     ########################################
     def closeEvent(self, e):
+        self._render_worker.cancel()
+        self._render_worker.wait()
+        self.previewView.wait()
+        self._export_worker.cancel()
+        self._export_worker.wait()
+        self._thumbnail_loader.wait()
+        self._compactor.wait()
+        if self._use_glyph_cache:
+            from renderer import save_glyph_cache
+            try:
+                save_glyph_cache(GLYPH_CACHE_FILE)
+            except OSError as err:
+                print('ERROR', err)
         self._state.setValue('MainWindow/Geometry', self.saveGeometry())
         self._state.setValue('MainWindow/State', self.saveState())
         self._state.setValue('MainWindow/Splitter', self.splitter.saveState())
         self._state.setValue('Editor/Font', self.editor.font().toString())
-        self._state.setValue('Bookmarks', self._bookmarks)
-        self._state.setValue('History', self._history)
+        self._state.setValue('Editor/LivePreview', self.actionLivePreview.isChecked())
+        self._state.setValue('View/RenderProfile', self.actionRenderProfile.isChecked())
+        self._store.close()
 
     ########################################
     #
@@ -403,9 +557,14 @@ class Main(QMainWindow):
     ########################################
     def slot_new_equation(self):
         self.actionExportAs.setDisabled(True)
+        self.actionBookmark.setEnabled(False)
+        self.toolButtonBookmark.setEnabled(False)
+        self._current_uid = None
+        self._current_tex = None
+        self._current_thumbnail = None
         self._text_filename = None
         self.editor.clear()
-        self.renderLabel.clear()
+        self.previewView.clear()
 
     ########################################
     #
@@ -433,52 +592,33 @@ class Main(QMainWindow):
     #
     ########################################
     def slot_bookmark_add(self):
-        bookmarks_png = os.path.join(BOOKMARKS_DIR, f'{self._current_uid}.png')
-        with open(bookmarks_png, 'wb') as f:
-            f.write(self._current_png)
-
-        dt = datetime.now().isoformat(' ', timespec='seconds')
-
-        self._bookmarks[self._current_uid] = {
-            'datetime': dt,
-            'tex': self._current_tex,
-            'color': self._current_color,
-            'bgcolor': self._current_bgcolor,
-            'fontsize': self._current_fontsize,
-            'render_mode': self._current_rendermode,
-        }
-
-        lwi = QListWidgetItem()
-        lwi.setIcon(QIcon(bookmarks_png))
-        lwi.setData(Qt.UserRole, self._current_uid)
-        lwi.setToolTip(f"Saved on: {dt}")
-        self.listWidgetBookmarks.insertItem(0, lwi)
+        if self._current_tex is None:
+            return
+        row = self._current_row()
+        # the thumbnail was rendered along with the preview
+        uid = self._store.add(BOOKMARKS, self._current_uid, row, self._current_thumbnail)
+        self._bookmarks_model.prepend(uid, row)
 
     ########################################
     #
     ########################################
     def slot_bookmark_remove(self):
-        lwi = self.listWidgetBookmarks.currentItem()
-        if lwi is None:
+        uid = self._bookmarks_model.uid(self.listViewBookmarks.currentIndex())
+        if uid is None:
             return
-        uid = lwi.data(Qt.UserRole)
-        png = os.path.join(BOOKMARKS_DIR, f'{uid}.png')
-        if os.path.isfile(png):
-            os.unlink(png)
-        del self._bookmarks[uid]
-        self.listWidgetBookmarks.takeItem(self.listWidgetBookmarks.row(lwi))
+        self._store.remove(BOOKMARKS, uid)
+        self._bookmarks_model.remove(uid)
 
     ########################################
     #
     ########################################
-    def slot_bookmark_double_clicked(self, lwi):
-        if lwi is None:
+    def slot_bookmark_double_clicked(self, index):
+        bm = self._bookmarks_model.row(index)
+        if bm is None:
             return
-        uid = lwi.data(Qt.UserRole)
-        bm = self._bookmarks[uid]
 
         self._text_filename = None
-        self.renderLabel.clear()
+        self.previewView.clear()
         self.editor.setPlainText(bm['tex'])
         self.spinBoxFontSize.setValue(bm['fontsize'])
         self.toolButtonColor.setColor(QColor(bm['color']))
@@ -499,37 +639,28 @@ class Main(QMainWindow):
         if res != QMessageBox.Yes:
             return
 
-        for uid in self._history.keys():
-            png = os.path.join(HISTORY_DIR, f'{uid}.png')
-            if os.path.isfile(png):
-                os.unlink(png)
-        self._history = {}
-        self.listWidgetHistory.clear()
+        self._store.clear(HISTORY)
+        self._history_model.clear()
 
     ########################################
     #
     ########################################
     def slot_history_remove(self):
-        lwi = self.listWidgetHistory.currentItem()
-        if lwi is None:
+        uid = self._history_model.uid(self.listViewHistory.currentIndex())
+        if uid is None:
             return
-        uid = lwi.data(Qt.UserRole)
-        png = os.path.join(HISTORY_DIR, f'{uid}.png')
-        if os.path.isfile(png):
-            os.unlink(png)
-        del self._history[uid]
-        self.listWidgetHistory.takeItem(self.listWidgetHistory.row(lwi))
+        self._store.remove(HISTORY, uid)
+        self._history_model.remove(uid)
 
     ########################################
     #
     ########################################
-    def slot_history_double_clicked(self, lwi):
-        if lwi is None:
+    def slot_history_double_clicked(self, index):
+        bm = self._history_model.row(index)
+        if bm is None:
             return
-        uid = lwi.data(Qt.UserRole)
-        bm = self._history[uid]
         self._text_filename = None
-        self.renderLabel.clear()
+        self.previewView.clear()
         self.editor.setPlainText(bm['tex'])
         self.spinBoxFontSize.setValue(bm['fontsize'])
         self.toolButtonColor.setColor(QColor(bm['color']))
@@ -545,12 +676,22 @@ class Main(QMainWindow):
     #
     ########################################
     def slot_text_changed(self):
-        self.actionBookmark.setEnabled(False)
-        self.toolButtonBookmark.setEnabled(False)
+        # with live preview, the bookmark is the equation still shown until the next render succeeds
+        if not self.actionLivePreview.isChecked():
+            self.actionBookmark.setEnabled(False)
+            self.toolButtonBookmark.setEnabled(False)
         is_empty = self.editor.document().isEmpty()
         self.renderButton.setDisabled(is_empty)
         self.actionRender.setDisabled(is_empty)
         self.actionSaveTextFile.setDisabled(is_empty)
+        self.slot_live_preview_schedule()
+
+    ########################################
+    #
+    ########################################
+    def slot_live_preview_schedule(self):
+        if self.actionLivePreview.isChecked() and not self.editor.document().isEmpty():
+            self._live_preview_timer.start()
 
     ########################################
     #
@@ -558,6 +699,15 @@ class Main(QMainWindow):
     def slot_symbol_selected(self, action):
         self.editor.insertPlainText(action.data())
 
+    ########################################
+    #
+    ########################################
+    def slot_insert_symbol(self):
+        dlg = SymbolPicker(self._get_symbol_index(), self)
+        if dlg.exec_() == QDialog.Accepted:
+            self.editor.insertPlainText(dlg.command())
+        self.editor.setFocus()
+
     ########################################
     #
     ########################################
@@ -621,34 +771,138 @@ class Main(QMainWindow):
                 f.write(r'\]\end{document}')
 
         else:
-            try:
-                if fmt == 'BMP' or fmt == 'JPEG':
-                    # no transparency support, so always use current bgcolor
-                    png_data = cairosvg.svg2png(
-                        bytestring=self._current_svg,
-                        background_color=self.toolButtonBgColor.color().name()
-                    )
-                    pm = QPixmap()
-                    pm.loadFromData(png_data, 'png')
-                    pm.save(fn, quality=100)
-                elif fmt == 'TIFF':
-                    pm = QPixmap()
-                    pm.loadFromData(self._current_png, 'png')
-                    pm.save(fn, quality=100)
-                else:
-                    with open(fn, 'wb') as f:
-                        if fmt == 'PNG':
-                            f.write(self._current_png)
-                        elif fmt == 'PDF':
-                            f.write(cairosvg.svg2pdf(
-                                bytestring=self._current_svg,
-                                background_color=self._current_bgcolor if self._current_bgcolor else None
-                            ))
-                        elif fmt == 'SVG':
-                            f.write(self._current_svg.encode())
-            except Exception as e:
-                print(e)
-                self.statusBar.showMessage(str(e))
+            if self._export_worker.is_busy():
+                self.statusBar.showMessage('Another export is still running')
+                return
+            equation = self._current_row()
+            if fmt == 'BMP' or fmt == 'JPEG':
+                # no transparency support, so always use current bgcolor
+                equation['bgcolor'] = self.toolButtonBgColor.color().name()
+            # rendered in the background, the result is reported by slot_export_finished()
+            self._export_count = 1
+            self._export_worker.start_file(equation, fmt, fn, self._cache)
+
+    ########################################
+    # Re-renders the entries selected in view (history or bookmarks) from their stored settings, to a
+    # format and directory selected by the user
+    ########################################
+    def slot_export_selected(self, view):
+        if self._export_worker.is_busy():
+            return
+        rows = self._selected_rows(view)
+        if not rows:
+            return
+
+        formats = [fmt.upper() for fmt in FORMATS]
+        fmt, ok = QInputDialog.getItem(self, 'Export Selected', 'Format:', formats,
+                formats.index(self._state.value('Export/Format', 'PDF')), False)
+        if not ok:
+            return
+        scales = [1]
+        if fmt == 'PNG':
+            # e.g. for HiDPI screens, each equation is still laid out and parsed only once
+            items = ['1x', '1x, 2x', '1x, 2x, 3x']
+            last = self._state.value('Export/Scales', items[0])
+            item, ok = QInputDialog.getItem(self, 'Export Selected', 'Scales:', items,
+                    items.index(last) if last in items else 0, False)
+            if not ok:
+                return
+            self._state.setValue('Export/Scales', item)
+            scales = [int(scale.strip().rstrip('x')) for scale in item.split(',')]
+        out_dir = QFileDialog.getExistingDirectory(self, 'Export Selected to...',
+                self._state.value('Export/Directory', APP_DIR))
+        if not out_dir:
+            return
+        self._state.setValue('Export/Format', fmt)
+        self._state.setValue('Export/Directory', out_dir)
+
+        jobs = []
+        for i, row in enumerate(rows, 1):
+            jobs.append({
+                'name': f'equation-{i:04d}',
+                'tex': row['tex'],
+                'mode': row['render_mode'],
+                'fontsize': row['fontsize'],
+                'color': row['color'],
+                'bgcolor': row['bgcolor'] or None,
+                'formats': [fmt.lower()],
+                'scales': scales,
+                'output': out_dir,
+            })
+
+        self._show_export_progress(len(jobs))
+        # starting worker processes only pays off for more than a few equations
+        self._export_worker.start(jobs, 1 if len(jobs) < 8 else None, self._cache)
+
+    ########################################
+    # Renders the entries selected in view into a single PDF document, a page per equation
+    ########################################
+    def slot_export_selected_pdf(self, view):
+        if self._export_worker.is_busy():
+            return
+        rows = self._selected_rows(view)
+        if not rows:
+            return
+        fn, _ = QFileDialog.getSaveFileName(self, 'Export Selected as PDF Document...',
+                os.path.join(self._state.value('Export/Directory', APP_DIR), 'equations'), 'PDF File (*.pdf)')
+        if not fn:
+            return
+        self._state.setValue('Export/Directory', os.path.dirname(fn))
+
+        equations = []
+        for i, row in enumerate(rows, 1):
+            # outline entry
+            title = row['tex'].strip().splitlines()[0] if row['tex'].strip() else ''
+            equations.append(dict(row, title=f'{i}: {title[:60]}'))
+
+        self._show_export_progress(len(equations))
+        self._export_worker.start_pdf(equations, fn, self._cache)
+
+    ########################################
+    # Renders the entries selected in view into sprite sheet PNGs plus a JSON manifest of the positions
+    # of the equations, keyed by their uid
+    ########################################
+    def slot_export_selected_atlas(self, view):
+        if self._export_worker.is_busy():
+            return
+        rows = self._selected_rows(view)
+        if not rows:
+            return
+        fn, _ = QFileDialog.getSaveFileName(self, 'Export Selected as Sprite Sheet...',
+                os.path.join(self._state.value('Export/Directory', APP_DIR), 'equations'), 'PNG File (*.png)')
+        if not fn:
+            return
+        if not fn.lower().endswith('.png'):
+            fn += '.png'
+        self._state.setValue('Export/Directory', os.path.dirname(fn))
+
+        self._show_export_progress(len(rows))
+        self._export_worker.start_atlas(rows, fn, self._cache)
+
+    ########################################
+    #
+    ########################################
+    def slot_export_progress(self, done, total):
+        if self._export_progress and not self._export_worker.is_cancelled():
+            self._export_progress.setValue(done)
+
+    ########################################
+    #
+    ########################################
+    def slot_export_finished(self, errors):
+        cancelled = self._export_worker.is_cancelled()
+        total = self._export_count
+        if self._export_progress:
+            self._export_progress.close()
+            self._export_progress = None
+        if errors:
+            for error in errors:
+                print('ERROR', error)
+            self.statusBar.showMessage(f'Export failed for {len(errors)} equation(s): {errors[0]}')
+        elif cancelled:
+            self.statusBar.showMessage('Export cancelled')
+        else:
+            self.statusBar.showMessage(f'Exported {total} equation(s)')
 
     ########################################
     #
@@ -657,6 +911,7 @@ class Main(QMainWindow):
         col = QColorDialog.getColor(self.toolButtonColor.color(), self)
         if col.isValid():
             self.toolButtonColor.setColor(col)
+            self.slot_live_preview_schedule()
 
     ########################################
     #
@@ -665,102 +920,281 @@ class Main(QMainWindow):
         col = QColorDialog.getColor(self.toolButtonBgColor.color(), self)
         if col.isValid():
             self.toolButtonBgColor.setColor(col)
+            self.slot_live_preview_schedule()
 
     ########################################
     #
     ########################################
-    def slot_render(self, _=None, add_to_history=True):
+    def slot_render(self, _=None, add_to_history=True, live=False):
+        self._live_preview_timer.stop()
         tex = self.editor.toPlainText()
         if not tex:
             return
+        render_mode = self.button_group_render_mode.checkedId()
+        color = self.toolButtonColor.color().name()
+        bgcolor = '' if self.checkBoxTransparent.isChecked() else self.toolButtonBgColor.color().name()
+        fontsize = self.spinBoxFontSize.value()
+        # thumbnails are rendered at the device pixel ratio (unless too large for the docks), for sharp icons
+        scale = self.previewView.devicePixelRatioF()
+        thumbnail_size = self.listViewHistory.iconSize() * qApp.devicePixelRatio()
+
+        # live preview skips renders of unchanged input, the last good image is kept until the new one arrives
+        key = (tex, render_mode, color, bgcolor, fontsize, scale)
+        if live and key == self._last_render_key:
+            return
+        self._last_render_key = key
+
+        if not live:
+            self.statusBar.clearMessage()
+        uid = str(uuid.uuid4())
+        self._render_worker.submit({
+            'uid': uid,
+            'tex': tex,
+            'render_mode': render_mode,
+            'color': color,
+            'bgcolor': bgcolor,
+            'fontsize': fontsize,
+            'scale': scale,
+            'thumbnail_size': (thumbnail_size.width(), thumbnail_size.height()),
+            'add_to_history': add_to_history,
+            'submitted': time.perf_counter(),
+        })
+
+    ########################################
+    #
+    ########################################
+    def slot_render_finished(self, job_id, res):
+        if self._render_worker.is_stale(job_id):
+            return
         self.statusBar.clearMessage()
+        self._current_uid = res['uid']
+        self._current_tex = res['tex']
+        self._current_rendermode = res['render_mode']
+        self._current_color = res['color']
+        self._current_bgcolor = res['bgcolor']
+        self._current_fontsize = res['fontsize']
+        self._current_thumbnail = res['thumbnail']
+
+        # the preview rasterizes the visible tiles of the recording itself
+        t = time.perf_counter()
+        self.previewView.set_recording(res['recording'], res['bgcolor'])
+
+        profile = res['profile']
+        if profile:
+            profiler.add_stage(profile, 'display', (time.perf_counter() - t) * 1000)
+
+        if res['add_to_history']:
+            t = time.perf_counter()
+            row = self._current_row()
+            # an equal equation already in the history is only moved to the top
+            uid = self._store.add(HISTORY, self._current_uid, row, res['thumbnail'])
+            if profile:
+                profiler.add_stage(profile, 'write', (time.perf_counter() - t) * 1000)
+            # the thumbnail is shown from the image just rendered instead of decoding the PNG again
+            self._history_model.prepend(uid, row, res['image'])
+
+        if profile:
+            profile['latency'] = (time.perf_counter() - res['submitted']) * 1000
+            self.statusBar.showMessage(format_profile(profile))
+            self.actionExportRenderProfile.setEnabled(True)
+
+        self.actionBookmark.setEnabled(True)
+        self.toolButtonBookmark.setEnabled(True)
+        self.actionExportAs.setEnabled(True)
+
+    ########################################
+    #
+    ########################################
+    def slot_render_failed(self, job_id, msg):
+        if self._render_worker.is_stale(job_id):
+            return
+        print('ERROR', msg)
+        # the preview keeps showing the last good image, and bookmarks and exports still refer to it
+        self.statusBar.showMessage(f'Error: {msg}')
+
+    ########################################
+    # Removes duplicates, applies the history retention settings (0 means no limit) and deletes
+    # orphaned PNGs, on a background thread
+    ########################################
+    def slot_compact(self):
+        if self._compactor.is_busy():
+            return
+        self._compactor.compact(HISTORY, HISTORY_DIR, {
+            # opt-in, by default the history is kept completely
+            'max_count': self._state.value('History/MaxCount', 0, type=int),
+            'max_age': self._state.value('History/MaxAge', 0, type=int),  # days
+            'max_bytes': self._state.value('History/MaxSize', 0, type=int) * 1024 * 1024,  # MB
+        })
+        self._compactor.compact(BOOKMARKS, BOOKMARKS_DIR)
+
+    ########################################
+    #
+    ########################################
+    def slot_compaction_finished(self, kind, uids):
+        model = self._history_model if kind == HISTORY else self._bookmarks_model
+        for uid in uids:
+            model.remove(uid)
+
+    ########################################
+    #
+    ########################################
+    def slot_render_profile_toggled(self, checked):
+        profiler.enabled = checked
+        if not checked:
+            self.statusBar.clearMessage()
+
+    ########################################
+    #
+    ########################################
+    def slot_render_profile_export(self):
+        fltr = 'CSV File (*.csv);;JSON File (*.json)'
+        fn, fltr = QFileDialog.getSaveFileName(self, 'Export Render Profile...', os.path.join(APP_DIR, 'render-profile'), fltr)
+        if not fn:
+            return
         try:
-            self._current_tex = tex
-            self._current_rendermode = self.button_group_render_mode.checkedId()
-            self._current_color = self.toolButtonColor.color().name()
-            self._current_bgcolor = '' if self.checkBoxTransparent.isChecked() else self.toolButtonBgColor.color().name()
-            self._current_fontsize = self.spinBoxFontSize.value()
-
-            if self._current_rendermode == RenderMode.MathML:
-                zm.config.math.color = self._current_color
-                res = zm.Math(
-                    tex,
-                    size=self._current_fontsize
-                )
-            elif self._current_rendermode == RenderMode.Text:
-                #######################################
-                # Mixed text and latex math. Inline math delimited by single $..$, and display-mode math delimited
-                # by double $$…$$. Can contain multiple lines. Drawn to SVG
-                #######################################
-                res = zm.zmath.Text(
-                    tex,
-                    size=self._current_fontsize,
-                    color=self._current_color,
-                    linespacing=1.6,
-                )
+            if fltr.startswith('JSON'):
+                profiler.export_json(fn)
             else:
-                ########################################
-                # Create Math Renderer from a single LaTeX expression.
-                ########################################
-                res = zm.Latex(
-                    tex,
-                    size=self._current_fontsize,
-                    color=self._current_color,
-                    inline=self._current_rendermode==RenderMode.Inline
-                )
-
-            self._current_uid = str(uuid.uuid4())
-            self._current_svg = res.svg()
-            self._current_png = cairosvg.svg2png(
-                bytestring=self._current_svg,
-                background_color=self._current_bgcolor if self._current_bgcolor else None
-            )
-
-            pm = QPixmap()
-            pm.loadFromData(self._current_png, 'png')
-            self.renderLabel.setPixmap(pm)
-
-            if add_to_history:
-                history_png = os.path.join(HISTORY_DIR, f'{self._current_uid}.png')
-                with open(history_png, 'wb') as f:
-                    f.write(self._current_png)
-
-                dt = datetime.now().isoformat(' ', timespec='seconds')
-
-                self._history[self._current_uid] = {
-                    'datetime': dt,
-                    'tex': self._current_tex,
-                    'color': self._current_color,
-                    'bgcolor': self._current_bgcolor,
-                    'fontsize': self._current_fontsize,
-                    'render_mode': self._current_rendermode,
-                }
-
-                lwi = QListWidgetItem()
-                lwi.setIcon(QIcon(history_png))
-                lwi.setData(Qt.UserRole, self._current_uid)
-                lwi.setToolTip(f"Saved on: {dt}")
-                self.listWidgetHistory.insertItem(0, lwi)
-
-            self.actionBookmark.setEnabled(True)
-            self.toolButtonBookmark.setEnabled(True)
-            self.actionExportAs.setEnabled(True)
+                profiler.export_csv(fn)
         except Exception as e:
-            print('ERROR', e)
-            self.statusBar.showMessage(f'Error: {e}')
-            self.actionBookmark.setEnabled(False)
-            self.toolButtonBookmark.setEnabled(False)
-            self.actionExportAs.setEnabled(False)
+            self.statusBar.showMessage(str(e))
+
+    ########################################
+    # Row for the history or bookmarks with the settings of the current equation
+    ########################################
+    def _current_row(self):
+        return {
+            'datetime': datetime.now().isoformat(' ', timespec='seconds'),
+            'tex': self._current_tex,
+            'color': self._current_color,
+            'bgcolor': self._current_bgcolor,
+            'fontsize': self._current_fontsize,
+            'render_mode': self._current_rendermode,
+        }
 
+    ########################################
+    # Moves history or bookmarks saved in state.ini by older versions into the store
+    ########################################
+    def _import_state(self, kind, key, png_dir):
+        entries = self._state.value(key)
+        if type(entries) == dict:
+            self._store.import_entries(kind, entries, png_dir)
+        self._state.remove(key)
+        if os.path.isdir(png_dir) and not os.listdir(png_dir):
+            os.rmdir(png_dir)
+
+    ########################################
+    # Work deferred until the window is shown
+    ########################################
+    def _after_first_paint(self):
+        startup_profiler.mark('first paint')
+        load_render_stack(GLYPH_CACHE_FILE if self._use_glyph_cache else None)
+        if not IS_WIN:
+            threading.Thread(target=update_dark_mode_cache, name='dark mode', daemon=True).start()
+
+    ########################################
+    # Adds symbol i (starting at 1) of group g to menu
+    ########################################
+    def _add_symbol_action(self, menu, g, i):
+        settings = self._symbol_settings
+        action = menu.addAction(load_icon(os.path.join(RES_DIR, 'symbols', g, settings.value(f'{g}/symbols/{i}/icon'))),
+                settings.value(f'{g}/symbols/{i}/name'))
+        action.setData(settings.value(f'{g}/symbols/{i}/latex'))
+        return action
+
+    ########################################
+    # Adds the remaining symbols of group g, when its menu is first shown
+    ########################################
+    def _fill_symbol_menu(self, menu, g):
+        menu.aboutToShow.disconnect()
+        for i in range(2, int(self._symbol_settings.value(f'{g}/symbols/size')) + 1):
+            self._add_symbol_action(menu, g, i)
+
+    ########################################
+    # Adds the template buttons to a tab, when it's first selected
+    ########################################
+    def _fill_template_page(self, index):
+        page = self.templatesBar.widget(index)
+        if page is None or page.property('group') is None:
+            return
+        g = page.property('group')
+        page.setProperty('group', None)
+        group_dir = os.path.join(RES_DIR, 'templates', g.lower())
+        layout = page.layout()
+
+        self._templates_settings.beginGroup(g)
+        for k in self._templates_settings.allKeys():
+            v = self._templates_settings.value(k)
+            if type(v) == list:
+                v = ','.join(v)
+            ico = load_icon(os.path.join(group_dir, k))
+            size = ico.availableSizes()[0]
+            size.setHeight(46)
+            tb = QToolButton(self)
+            tb.setIconSize(size)
+            tb.setIcon(ico)
+            layout.addWidget(tb)
+            tb.pressed.connect(lambda tex=v: self.editor.insertPlainText(tex))
+        self._templates_settings.endGroup()
+
+        layout.addStretch()
+
+    ########################################
+    # Rows of the docks are all as high as the largest thumbnail
+    ########################################
+    def _thumbnail_item_size(self, view):
+        return view.iconSize() + QSize(0, 2 * view.style().pixelMetric(QStyle.PM_FocusFrameVMargin))
+
+    ########################################
+    #
+    ########################################
+    def _show_export_progress(self, count):
+        self._export_count = count
+        self._export_progress = QProgressDialog(f'Exporting {count} equations...', 'Cancel', 0, count, self)
+        self._export_progress.setWindowTitle('Export Selected')
+        self._export_progress.setWindowModality(Qt.WindowModal)
+        self._export_progress.setMinimumDuration(0)
+        self._export_progress.canceled.connect(self._export_worker.cancel)
+        self._export_progress.setValue(0)
+
+    ########################################
+    # Rows of the entries selected in view (history or bookmarks) with their uid, in list order
+    ########################################
+    def _selected_rows(self, view):
+        model = view.model()
+        indexes = sorted(view.selectionModel().selectedIndexes(), key=lambda index: index.row())
+        return [dict(model.row(index), uid=model.uid(index)) for index in indexes]
+
+    ########################################
+    # Loaded (or built) on first use, it's only needed by the symbol picker
+    # and command completion
+    ########################################
+    def _get_symbol_index(self):
+        if self._symbol_index is None:
+            try:
+                self._symbol_index = SymbolIndex.load(SYMBOLS_FILE, SYMBOL_INDEX_FILE)
+            except Exception as e:
+                print('ERROR', e)
+                self.statusBar.showMessage(f'Symbol index not available: {e}')
+                # not tried again in this session
+                self._symbol_index = SymbolIndex([])
+        return self._symbol_index
 
 ########################################
 #
 ########################################
 if __name__ == '__main__':
+    # the batch export starts worker processes
+    multiprocessing.freeze_support()
+    startup_profiler.mark('imports')
     sys.excepthook = traceback.print_exception
+    with startup_profiler.phase('dark mode detection'):
+        IS_DARK = load_dark_mode()
     if IS_WIN and IS_DARK:
         os.environ["QT_QPA_PLATFORM"] = "windows:darkmode=1"
     QApplication.setStyle('Fusion')
-    app = QApplication(sys.argv)
-    main = Main()
+    with startup_profiler.phase('QApplication'):
+        app = QApplication(sys.argv)
+    with startup_profiler.phase('main window'):
+        main = Main()
     sys.exit(app.exec_())
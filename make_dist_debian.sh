@@ -16,12 +16,19 @@ echo '****************************************'
 #pip install -r requirements.txt
 #pip install -r requirements_dist.txt
 
+echo
+echo '****************************************'
+echo 'Precompiling cairo bindings...'
+echo '****************************************'
+
+env/bin/python cairocffi_min/ffi_build.py
+
 echo
 echo '****************************************'
 echo 'Running pyinstaller...'
 echo '****************************************'
 
-#env/bin/pyinstaller -F --noupx -w -n EqualZ --hidden-import ziamath.fonts --hidden-import colorbutton --hidden-import latexeditor --hidden-import renderlabel -D main.py
+#env/bin/pyinstaller -F --noupx -w -n EqualZ --hidden-import ziamath.fonts --hidden-import colorbutton --hidden-import latexeditor --hidden-import previewview -D main.py
 env/bin/pyinstaller "${APP_NAME}_debian.spec"
 
 echo
@@ -32,6 +39,7 @@ echo '****************************************'
 mkdir "dist/$APP_NAME/_internal/resources"
 cp resources/main.ui "dist/$APP_NAME/_internal/resources/"
 cp resources/main.rcc "dist/$APP_NAME/_internal/resources/"
+cp resources/unimathsymbols.txt "dist/$APP_NAME/_internal/resources/"
 
 cp -R  resources/symbols "dist/$APP_NAME/_internal/resources/symbols/"
 cp -R resources/templates "dist/$APP_NAME/_internal/resources/templates/"
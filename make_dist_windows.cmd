@@ -13,12 +13,19 @@ rmdir /s /q "dist\%APP_NAME%" 2>nul
 del "dist\%APP_NAME%-windows-x64-setup.exe" 2>nul
 del "dist\%APP_NAME%-windows-x64-portable.7z" 2>nul
 
+echo.
+echo ****************************************
+echo Precompiling cairo bindings...
+echo ****************************************
+
+python cairocffi_min\ffi_build.py
+
 echo.
 echo ****************************************
 echo Running pyinstaller...
 echo ****************************************
 
-::pyinstaller --noupx -w -i "%APP_ICON%" -n "%APP_NAME%" --version-file=version_res.txt --hidden-import ziamath.fonts --hidden-import colorbutton --hidden-import latexeditor --hidden-import renderlabel -D main.py
+::pyinstaller --noupx -w -i "%APP_ICON%" -n "%APP_NAME%" --version-file=version_res.txt --hidden-import ziamath.fonts --hidden-import colorbutton --hidden-import latexeditor --hidden-import previewview -D main.py
 pyinstaller %APP_NAME%_windows.spec
 
 echo.
@@ -29,6 +36,7 @@ echo ****************************************
 mkdir "dist\%APP_NAME%\_internal\resources"
 copy resources\main.ui "dist\%APP_NAME%\_internal\resources\"
 copy resources\main.rcc "dist\%APP_NAME%\_internal\resources\"
+copy resources\unimathsymbols.txt "dist\%APP_NAME%\_internal\resources\"
 xcopy /e /q resources\symbols "dist\%APP_NAME%\_internal\resources\symbols\"
 xcopy /e /q resources\templates "dist\%APP_NAME%\_internal\resources\templates\"
 
@@ -0,0 +1,325 @@
+from collections import OrderedDict
+import math
+
+from PyQt5.QtCore import Qt, QPointF, QRunnable, QSize, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QAbstractScrollArea
+from PyQt5 import sip
+
+# edge length of the square tiles in device pixels
+TILE_SIZE = 256
+
+# max. number of cached tiles (256 KB each)
+MAX_TILES = 192
+
+MIN_ZOOM = .1
+MAX_ZOOM = 16
+ZOOM_STEP = 1.25
+
+
+########################################
+# Rasterizes a single tile of a recording
+########################################
+class TileJob(QRunnable):
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, view, key, recording, bgcolor):
+        super().__init__()
+        self._view = view
+        self._key = key
+        self._recording = recording
+        self._bgcolor = bgcolor
+
+    ########################################
+    #
+    ########################################
+    def run(self):
+        # imported here, see main.load_render_stack
+        from renderer import render_tile
+        _, zoom, ratio, tx, ty = self._key
+        try:
+            surface = render_tile(self._recording, tx * TILE_SIZE, ty * TILE_SIZE, TILE_SIZE, TILE_SIZE,
+                    zoom * ratio, self._bgcolor)
+            # copied, the cairo surface is freed when this returns
+            img = QImage(
+                sip.voidptr(surface.get_data()),
+                surface.get_width(),
+                surface.get_height(),
+                surface.get_stride(),
+                QImage.Format_ARGB32_Premultiplied
+            ).copy()
+        except Exception as e:
+            print('ERROR', e)
+            img = QImage()
+        self._view.tile_loaded.emit(self._key, img)
+
+
+########################################
+# Zoomable and pannable preview of a recorded equation (see
+# renderer.render_recording). Only the tiles of the document that are
+# visible are rasterized, at the current zoom and device pixel ratio, on
+# background threads. The most recently used tiles are kept in a bounded
+# LRU cache, so memory doesn't depend on the size of the document, and
+# zooming back and forth doesn't rasterize the same tiles again.
+# Ctrl+wheel and Ctrl++/Ctrl+-/Ctrl+0 zoom, dragging pans.
+########################################
+class PreviewView(QAbstractScrollArea):
+
+    tile_loaded = pyqtSignal(object, QImage)
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._recording = None
+        self._bgcolor = None
+        self._generation = 0
+        self._zoom = 1
+        self._tiles = OrderedDict()  # (generation, zoom, ratio, tx, ty) -> QPixmap, least recently used first
+        self._pending = set()
+        self._drag_pos = None
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self.tile_loaded.connect(self._slot_tile_loaded)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.horizontalScrollBar().setSingleStep(20)
+        self.verticalScrollBar().setSingleStep(20)
+
+    ########################################
+    # Shows a recording, with background color bgcolor (None for transparent)
+    ########################################
+    def set_recording(self, recording, bgcolor=None):
+        self._recording = recording
+        self._bgcolor = bgcolor or None
+        self._generation += 1
+        self._tiles.clear()
+        self._discard_pending()
+        self._update_scroll_bars()
+        self.viewport().update()
+
+    ########################################
+    #
+    ########################################
+    def clear(self):
+        self.set_recording(None)
+
+    ########################################
+    #
+    ########################################
+    def zoom(self):
+        return self._zoom
+
+    ########################################
+    # Zooms keeping the document point at anchor (viewport coordinates,
+    # default: center) in place
+    ########################################
+    def set_zoom(self, zoom, anchor=None):
+        zoom = min(MAX_ZOOM, max(MIN_ZOOM, zoom))
+        if zoom == self._zoom:
+            return
+        if anchor is None:
+            anchor = QPointF(self.viewport().width() / 2, self.viewport().height() / 2)
+        origin = self._origin()
+        x = (anchor.x() - origin.x()) / self._zoom
+        y = (anchor.y() - origin.y()) / self._zoom
+        self._zoom = zoom
+        # tiles at other zooms are kept, but not rendered anymore
+        self._discard_pending()
+        self._update_scroll_bars()
+        self.horizontalScrollBar().setValue(round(x * zoom - anchor.x()))
+        self.verticalScrollBar().setValue(round(y * zoom - anchor.y()))
+        self.viewport().update()
+
+    ########################################
+    #
+    ########################################
+    def zoom_in(self):
+        self.set_zoom(self._zoom * ZOOM_STEP)
+
+    ########################################
+    #
+    ########################################
+    def zoom_out(self):
+        self.set_zoom(self._zoom / ZOOM_STEP)
+
+    ########################################
+    #
+    ########################################
+    def reset_zoom(self):
+        self.set_zoom(1)
+
+    ########################################
+    # Waits for running tile jobs
+    ########################################
+    def wait(self):
+        self._pool.clear()
+        self._pool.waitForDone()
+
+    ########################################
+    #
+    ########################################
+    def minimumSizeHint(self):
+        return QSize(0, 0)
+
+    ########################################
+    #
+    ########################################
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), self.palette().base())
+        if self._recording is None:
+            return
+        ratio = self.viewport().devicePixelRatioF()
+        origin = self._origin()
+        # visible part of the document in device pixels
+        width, height = self._document_size()
+        left = max(0, -origin.x()) * ratio
+        top = max(0, -origin.y()) * ratio
+        right = min(width, self.viewport().width() - origin.x()) * ratio
+        bottom = min(height, self.viewport().height() - origin.y()) * ratio
+        if right <= left or bottom <= top:
+            return
+        for ty in range(int(top // TILE_SIZE), math.ceil(bottom / TILE_SIZE)):
+            for tx in range(int(left // TILE_SIZE), math.ceil(right / TILE_SIZE)):
+                key = (self._generation, self._zoom, ratio, tx, ty)
+                pixmap = self._tiles.get(key)
+                if pixmap is None:
+                    self._request(key)
+                    continue
+                self._tiles.move_to_end(key)
+                painter.drawPixmap(QPointF(origin.x() + tx * TILE_SIZE / ratio,
+                        origin.y() + ty * TILE_SIZE / ratio), pixmap)
+
+    ########################################
+    #
+    ########################################
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scroll_bars()
+
+    ########################################
+    #
+    ########################################
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    ########################################
+    #
+    ########################################
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            steps = event.angleDelta().y() / 120
+            if steps:
+                self.set_zoom(self._zoom * ZOOM_STEP ** steps, QPointF(event.pos()))
+            event.accept()
+        else:
+            super().wheelEvent(event)
+
+    ########################################
+    #
+    ########################################
+    def keyPressEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            if event.key() in (Qt.Key_Plus, Qt.Key_Equal):
+                self.zoom_in()
+                return
+            if event.key() == Qt.Key_Minus:
+                self.zoom_out()
+                return
+            if event.key() == Qt.Key_0:
+                self.reset_zoom()
+                return
+        super().keyPressEvent(event)
+
+    ########################################
+    #
+    ########################################
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag_pos = event.pos()
+            self.viewport().setCursor(Qt.ClosedHandCursor)
+        super().mousePressEvent(event)
+
+    ########################################
+    #
+    ########################################
+    def mouseMoveEvent(self, event):
+        if self._drag_pos is not None:
+            delta = event.pos() - self._drag_pos
+            self._drag_pos = event.pos()
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - delta.x())
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - delta.y())
+        super().mouseMoveEvent(event)
+
+    ########################################
+    #
+    ########################################
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton and self._drag_pos is not None:
+            self._drag_pos = None
+            self.viewport().unsetCursor()
+        super().mouseReleaseEvent(event)
+
+    ########################################
+    #
+    ########################################
+    def _slot_tile_loaded(self, key, img):
+        self._pending.discard(key)
+        # null if failed, stale if the recording was replaced meanwhile
+        if img.isNull() or key[0] != self._generation:
+            return
+        pixmap = QPixmap.fromImage(img)
+        pixmap.setDevicePixelRatio(key[2])
+        self._tiles[key] = pixmap
+        while len(self._tiles) > MAX_TILES:
+            self._tiles.popitem(last=False)
+        self.viewport().update()
+
+    ########################################
+    #
+    ########################################
+    def _request(self, key):
+        if key not in self._pending:
+            self._pending.add(key)
+            self._pool.start(TileJob(self, key, self._recording, self._bgcolor))
+
+    ########################################
+    # Drops queued tile jobs, e.g. of tiles at a previous zoom
+    ########################################
+    def _discard_pending(self):
+        self._pool.clear()
+        self._pending.clear()
+
+    ########################################
+    # Size of the document at the current zoom in logical pixels
+    ########################################
+    def _document_size(self):
+        if self._recording is None:
+            return 0, 0
+        return self._recording.width * self._zoom, self._recording.height * self._zoom
+
+    ########################################
+    # Top left corner of the document in viewport coordinates, documents
+    # smaller than the viewport are centered, snapped to device pixels
+    ########################################
+    def _origin(self):
+        width, height = self._document_size()
+        vw, vh = self.viewport().width(), self.viewport().height()
+        ratio = self.viewport().devicePixelRatioF()
+        x = (vw - width) / 2 if width < vw else -self.horizontalScrollBar().value()
+        y = (vh - height) / 2 if height < vh else -self.verticalScrollBar().value()
+        return QPointF(round(x * ratio) / ratio, round(y * ratio) / ratio)
+
+    ########################################
+    #
+    ########################################
+    def _update_scroll_bars(self):
+        width, height = self._document_size()
+        vw, vh = self.viewport().width(), self.viewport().height()
+        self.horizontalScrollBar().setRange(0, max(0, math.ceil(width - vw)))
+        self.horizontalScrollBar().setPageStep(vw)
+        self.verticalScrollBar().setRange(0, max(0, math.ceil(height - vh)))
+        self.verticalScrollBar().setPageStep(vh)
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# min. time in seconds between rescans of the cache dir, which pick up the
+# entries written and evicted by other instances (e.g. batch render workers)
+RESCAN_INTERVAL = 10
+
+
+########################################
+# Persistent, size-bounded LRU cache for rendered equations.
+# Entries are stored as files named by the hash of the exact render inputs,
+# the file mtime is used as last access time, so the LRU order survives
+# restarts. Files are written atomically, so several processes (e.g. batch
+# render workers) can share a cache dir. Entries of other instances are
+# found by get(), and counted against max_bytes after the next rescan.
+########################################
+class RenderCache():
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, cache_dir, max_bytes=100 * 1024 * 1024):
+        self._dir = cache_dir
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()  # filename -> size, least recently used first
+        self._size = 0
+        self._lock = threading.RLock()
+        if not os.path.isdir(self._dir):
+            os.makedirs(self._dir, exist_ok=True)
+        with self._lock:
+            self._scan()
+            self._evict()
+
+    ########################################
+    #
+    ########################################
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    ########################################
+    #
+    ########################################
+    def get(self, key, ext):
+        with self._lock:
+            fn = f'{key}.{ext}'
+            path = os.path.join(self._dir, fn)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)
+            except OSError:
+                # not cached, or evicted by another instance
+                if fn in self._entries:
+                    self._size -= self._entries.pop(fn)
+                return None
+            if fn not in self._entries:
+                # written by another instance
+                self._entries[fn] = len(data)
+                self._size += len(data)
+            self._entries.move_to_end(fn)
+            return data
+
+    ########################################
+    #
+    ########################################
+    def put(self, key, ext, data):
+        with self._lock:
+            fn = f'{key}.{ext}'
+            tmp = None
+            try:
+                fd, tmp = tempfile.mkstemp(prefix='.', dir=self._dir)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, os.path.join(self._dir, fn))
+            except OSError:
+                # e.g. disk full, temp files aren't indexed, so they would never be evicted
+                if tmp is not None:
+                    try:
+                        os.unlink(tmp)
+                    except OSError:
+                        pass
+                return
+            if fn in self._entries:
+                self._size -= self._entries.pop(fn)
+            self._entries[fn] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    ########################################
+    #
+    ########################################
+    def clear(self):
+        with self._lock:
+            self._scan()
+            for fn in self._entries:
+                try:
+                    os.unlink(os.path.join(self._dir, fn))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._size = 0
+
+    ########################################
+    #
+    ########################################
+    def size(self):
+        return self._size
+
+    ########################################
+    # Rebuilds the index from the files in the cache dir, ordered by mtime
+    ########################################
+    def _scan(self):
+        files = []
+        for entry in os.scandir(self._dir):
+            if entry.is_file() and not entry.name.startswith('.'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, entry.name, st.st_size))
+        self._entries = OrderedDict((fn, size) for _, fn, size in sorted(files))
+        self._size = sum(self._entries.values())
+        self._last_scan = time.monotonic()
+
+    ########################################
+    #
+    ########################################
+    def _evict(self):
+        if time.monotonic() - self._last_scan >= RESCAN_INTERVAL:
+            self._scan()
+        while self._size > self._max_bytes and self._entries:
+            fn, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.unlink(os.path.join(self._dir, fn))
+            except OSError:
+                pass
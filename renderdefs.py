@@ -0,0 +1,23 @@
+# Render settings shared by the GUI and the renderer, kept apart from
+# renderer so that they can be used without importing the rendering stack
+# (ziamath, cairosvg_min etc.), which takes a while
+
+
+class RenderMode():
+    Display = 0
+    Inline = 1
+    Text = 2
+    MathML = 3
+
+
+RENDER_MODE_NAMES = {
+    'display': RenderMode.Display,
+    'inline': RenderMode.Inline,
+    'text': RenderMode.Text,
+    'mathml': RenderMode.MathML,
+}
+
+FORMATS = ('png', 'pdf', 'svg', 'ps', 'eps')
+
+DEFAULT_FONTSIZE = 24
+DEFAULT_COLOR = '#000000'
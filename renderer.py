@@ -0,0 +1,387 @@
+from functools import lru_cache
+import io
+import json
+import math
+import os
+import re
+import threading
+
+import ziafont
+import ziamath as zm
+import cairosvg_min as cairosvg
+
+import atlas
+from renderdefs import DEFAULT_COLOR, DEFAULT_FONTSIZE, RenderMode
+from renderprofile import profiler
+
+# part of all cache keys, so cached results are invalidated by engine updates
+ENGINE_VERSION = f'ziamath-{zm.__version__}/cairosvg-{cairosvg.VERSION}'
+
+# ziamath uses global config (e.g. the MathML color), so layouts from
+# different threads must not overlap
+_layout_lock = threading.Lock()
+
+# recordings are shared between threads, cairo doesn't allow replaying the
+# same recording concurrently
+_replay_lock = threading.Lock()
+
+# tiny equations rendered by warm_up(), one per render mode
+WARM_UP_EQUATIONS = {
+    RenderMode.Display: r'\frac{1}{2}\sum_{i=1}^n x_i^2',
+    RenderMode.Inline: r'\sqrt{a+b}',
+    RenderMode.Text: r'a $x^2$',
+    RenderMode.MathML: '<math><mi>x</mi><mo>=</mo><mn>1</mn></math>',
+}
+
+# number of glyphs parsed per acquisition of _layout_lock when preloading,
+# so that a render waits for at most a few ms
+GLYPH_PRELOAD_CHUNK = 32
+
+
+########################################
+# Creates the SVG source for an equation, using the same ziamath settings
+# as the GUI. If a RenderCache is passed, results are looked up in and
+# added to it.
+########################################
+def render_svg(tex, render_mode=RenderMode.Display, fontsize=DEFAULT_FONTSIZE, color=DEFAULT_COLOR, cache=None):
+    if cache is not None:
+        # SVG output does not depend on the background color
+        with profiler.stage('cache'):
+            data = get_cached(cache, 'svg', tex, render_mode, fontsize, color)
+        if data is not None:
+            return data.decode()
+        svg = render_svg(tex, render_mode, fontsize, color)
+        with profiler.stage('cache'):
+            put_cached(cache, svg.encode(), 'svg', tex, render_mode, fontsize, color)
+        return svg
+
+    with _layout_lock:
+        with profiler.stage('layout'):
+            res = layout(tex, render_mode, fontsize, color)
+        with profiler.stage('svg'):
+            return res.svg()
+
+
+########################################
+# Renders a tiny equation in each render mode and replays it to PNG, so
+# that ziamath's lazily loaded fonts and tables and cairo's lazy
+# initialisation are paid for before the first actual render. If
+# glyph_cache (a file created by save_glyph_cache) is passed, the glyphs
+# used in previous sessions are parsed afterwards. Meant to run on a
+# background thread.
+########################################
+def warm_up(glyph_cache=None):
+    for render_mode, tex in WARM_UP_EQUATIONS.items():
+        image_to_png(replay_image(render_recording(tex, render_mode)))
+    if glyph_cache:
+        load_glyph_cache(glyph_cache)
+
+
+########################################
+# Saves the ids of all glyphs parsed so far, per font. ziafont parses the
+# outline and metrics of each glyph from the font file on first use, which
+# adds about a millisecond per glyph to the first render using it.
+########################################
+def save_glyph_cache(filename):
+    with _layout_lock:
+        fonts = {os.path.basename(str(font.fname)): sorted(font._glyphs) for font in _loaded_fonts()}
+    with open(filename, 'w') as f:
+        json.dump({'engine': ENGINE_VERSION, 'fonts': fonts}, f)
+
+
+########################################
+# Parses the glyphs listed in a file created by save_glyph_cache, for the
+# fonts that are loaded. Files of other engine versions and invalid files
+# are ignored.
+########################################
+def load_glyph_cache(filename):
+    try:
+        with open(filename) as f:
+            data = json.load(f)
+        if data['engine'] != ENGINE_VERSION:
+            return
+        fonts = data['fonts']
+    except (OSError, ValueError, KeyError, TypeError):
+        return
+    for font in _loaded_fonts():
+        ids = fonts.get(os.path.basename(str(font.fname)), [])
+        for i in range(0, len(ids), GLYPH_PRELOAD_CHUNK):
+            with _layout_lock:
+                for glyph_id in ids[i:i + GLYPH_PRELOAD_CHUNK]:
+                    try:
+                        font.glyph_fromid(glyph_id)
+                    except Exception:
+                        pass
+
+
+########################################
+# Fonts loaded by ziamath, text fonts that weren't found are marked with a string
+########################################
+def _loaded_fonts():
+    fonts = list(zm.zmath.loadedfonts.values()) + list(zm.zmath.loadedtextfonts.values())
+    return [font for font in fonts if isinstance(font, ziafont.Font)]
+
+
+########################################
+# Lays out an equation with ziamath, returns the ziamath object. Not
+# thread-safe, see _layout_lock.
+########################################
+def layout(tex, render_mode=RenderMode.Display, fontsize=DEFAULT_FONTSIZE, color=DEFAULT_COLOR):
+    if render_mode == RenderMode.MathML:
+        zm.config.math.color = color
+        res = zm.Math(
+            tex,
+            size=fontsize
+        )
+    elif render_mode == RenderMode.Text:
+        #######################################
+        # Mixed text and latex math. Inline math delimited by single $..$, and display-mode math delimited
+        # by double $$…$$. Can contain multiple lines. Drawn to SVG
+        #######################################
+        res = zm.zmath.Text(
+            tex,
+            size=fontsize,
+            color=color,
+            linespacing=1.6,
+        )
+    else:
+        ########################################
+        # Create Math Renderer from a single LaTeX expression.
+        ########################################
+        res = zm.Latex(
+            tex,
+            size=fontsize,
+            color=color,
+            inline=render_mode==RenderMode.Inline
+        )
+    return res
+
+
+########################################
+# Parses SVG source into a cairosvg Document.
+########################################
+def compile_svg(svg):
+    with profiler.stage('parse'):
+        return cairosvg.Document(svg.encode())
+
+
+########################################
+# Parses and draws SVG source once into a cairo recording surface. The most
+# recent recordings are kept, so converting the same equation to several
+# formats, backgrounds or sizes only replays the recorded drawing operations.
+########################################
+@lru_cache(maxsize=16)
+def record_svg(svg):
+    document = compile_svg(svg)
+    with profiler.stage('draw'):
+        return document.record()
+
+
+########################################
+# Converts SVG source to one of FORMATS, returns bytes. scale is the number
+# of output pixels (or points) per CSS pixel, e.g. 2 for HiDPI screens.
+########################################
+def convert_svg(svg, fmt='png', bgcolor=None, scale=1):
+    fmt = fmt.lower()
+    if fmt == 'svg':
+        return svg.encode()
+    recording = record_svg(svg)
+    with _replay_lock:
+        return cairosvg.SURFACES[fmt.upper()].replay(
+            recording,
+            scale=scale,
+            background_color=bgcolor if bgcolor else None
+        )
+
+
+########################################
+#
+########################################
+def render(tex, fmt='png', render_mode=RenderMode.Display, fontsize=DEFAULT_FONTSIZE, color=DEFAULT_COLOR,
+        bgcolor=None, cache=None, scale=1):
+    fmt = fmt.lower()
+    if fmt == 'svg':
+        return render_svg(tex, render_mode, fontsize, color, cache).encode()
+    if cache is None:
+        return convert_svg(render_svg(tex, render_mode, fontsize, color), fmt, bgcolor, scale)
+    data = get_cached(cache, fmt, tex, render_mode, fontsize, color, bgcolor, scale)
+    if data is None:
+        data = convert_svg(render_svg(tex, render_mode, fontsize, color, cache), fmt, bgcolor, scale)
+        put_cached(cache, data, fmt, tex, render_mode, fontsize, color, bgcolor, scale)
+    return data
+
+
+########################################
+# Renders many equations into a single PDF document (write_to is a filename
+# or a file object), a page per equation, sized to fit it, with an outline
+# entry per page. equations are dicts with the keys tex, render_mode,
+# fontsize, color, bgcolor and optionally title. Pages are streamed to
+# write_to as they are rendered. Generator, yields (equation, error) after
+# each equation, error is None on success, failed equations are skipped.
+# The document is finished when the generator is exhausted. If it is closed
+# before, the document is discarded: a filename isn't written at all, a file
+# object keeps the pages written so far, but is never finished.
+########################################
+def render_pdf_pages(equations, write_to, cache=None):
+    with cairosvg.surface.PDFPages(write_to) as pages:
+        for equation in equations:
+            try:
+                recording = record_svg(render_svg(equation['tex'], equation['render_mode'], equation['fontsize'],
+                        equation['color'], cache))
+                with _replay_lock:
+                    pages.add_page(
+                        recording,
+                        title=equation.get('title'),
+                        label=str(pages.pages + 1),
+                        background_color=equation['bgcolor'] if equation['bgcolor'] else None
+                    )
+            except Exception as e:
+                yield equation, f'{type(e).__name__}: {e}'
+            else:
+                yield equation, None
+
+
+########################################
+# Renders many equations into one or more sprite sheet PNGs (atlases of at
+# most max_size x max_size pixels) plus a JSON manifest. filename is the
+# path of the first atlas, further atlases get the suffixes -1, -2 etc.,
+# the manifest is written next to it with the extension .json. It maps
+# the uid of each equation to its atlas index and its rectangle x, y, w, h
+# in pixels, and baseline, the distance in pixels of the baseline from the
+# top of the rectangle. equations are dicts with the keys uid, tex,
+# render_mode, fontsize, color and bgcolor. Generator, yields (equation,
+# error) after each equation is rendered, failed equations are skipped.
+# The atlases and the manifest are written when the generator is
+# exhausted, nothing is written if it is closed before.
+########################################
+def render_atlas(equations, filename, max_size=2048, padding=2, scale=1, cache=None):
+    sprites = []
+    for equation in equations:
+        try:
+            svg = render_svg(equation['tex'], equation['render_mode'], equation['fontsize'], equation['color'], cache)
+            recording = record_svg(svg)
+        except Exception as e:
+            yield equation, f'{type(e).__name__}: {e}'
+        else:
+            sprites.append((equation, recording, svg_baseline(svg, recording.height) * scale))
+            yield equation, None
+    if not sprites:
+        return
+
+    sizes = [(math.ceil(recording.width * scale), math.ceil(recording.height * scale))
+            for _, recording, _ in sprites]
+    positions, atlas_sizes = atlas.pack(sizes, max_size, padding)
+
+    root, ext = os.path.splitext(filename)
+    filenames = [filename] + [f'{root}-{i}{ext}' for i in range(1, len(atlas_sizes))]
+    for i, (width, height) in enumerate(atlas_sizes):
+        placements = [(recording, x, y, scale)
+                for (_, recording, _), (a, x, y) in zip(sprites, positions) if a == i]
+        with _replay_lock, profiler.stage('raster'):
+            cairosvg.surface.PNGSurface.replay_atlas(placements, width, height, write_to=filenames[i])
+
+    manifest = {
+        'atlases': [{'file': os.path.basename(fn), 'width': w, 'height': h}
+                for fn, (w, h) in zip(filenames, atlas_sizes)],
+        'sprites': {},
+    }
+    for (equation, _, baseline), (a, x, y), (w, h) in zip(sprites, positions, sizes):
+        manifest['sprites'][equation['uid']] = {
+            'atlas': a, 'x': x, 'y': y, 'w': w, 'h': h, 'baseline': round(baseline, 2)}
+    with open(root + '.json', 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+
+########################################
+# Distance of the baseline from the top of an equation rendered from svg
+# with a height of height pixels. ziamath places the baseline at y=0 of
+# the viewBox.
+########################################
+def svg_baseline(svg, height):
+    m = re.search(r'viewBox="([^"]+)"', svg)
+    if m is None:
+        return height
+    _, y, _, h = (float(v) for v in m.group(1).replace(',', ' ').split())
+    return -y * height / h if h else height
+
+
+########################################
+# Lays out and records an equation, returns the cairosvg RecordingSurface,
+# which can be replayed at any scale. Only the SVG is cached.
+########################################
+def render_recording(tex, render_mode=RenderMode.Display, fontsize=DEFAULT_FONTSIZE, color=DEFAULT_COLOR,
+        cache=None):
+    return record_svg(render_svg(tex, render_mode, fontsize, color, cache))
+
+
+########################################
+# Rasterizes a width x height pixels region of a recording scaled by scale,
+# with its top left corner at x, y, returns a cairo ImageSurface.
+########################################
+def render_tile(recording, x, y, width, height, scale=1, bgcolor=None):
+    with _replay_lock:
+        return cairosvg.surface.ImageSurface.replay_tile(
+            recording, x, y, width, height,
+            scale=scale,
+            background_color=bgcolor if bgcolor else None
+        )
+
+
+########################################
+# Renders to a cairo ImageSurface (ARGB32, premultiplied alpha) without
+# encoding a PNG, scale is e.g. the device pixel ratio of the screen. Only
+# the SVG is cached.
+########################################
+def render_image(tex, render_mode=RenderMode.Display, fontsize=DEFAULT_FONTSIZE, color=DEFAULT_COLOR,
+        bgcolor=None, cache=None, scale=1):
+    return replay_image(render_recording(tex, render_mode, fontsize, color, cache), bgcolor, scale)
+
+
+########################################
+# Rasterizes a whole recording to a cairo ImageSurface
+########################################
+def replay_image(recording, bgcolor=None, scale=1):
+    with _replay_lock, profiler.stage('raster'):
+        return cairosvg.surface.ImageSurface.replay(
+            recording,
+            scale=scale,
+            background_color=bgcolor if bgcolor else None
+        )
+
+
+########################################
+#
+########################################
+def image_to_png(image):
+    output = io.BytesIO()
+    with profiler.stage('encode'):
+        image.write_to_png(output)
+    return output.getvalue()
+
+
+########################################
+# Render cache access, returns None if not cached
+########################################
+def get_cached(cache, fmt, tex, render_mode, fontsize, color, bgcolor=None, scale=1):
+    if cache is None:
+        return None
+    return cache.get(_cache_key(cache, fmt, tex, render_mode, fontsize, color, bgcolor, scale), fmt)
+
+
+########################################
+#
+########################################
+def put_cached(cache, data, fmt, tex, render_mode, fontsize, color, bgcolor=None, scale=1):
+    if cache is None:
+        return
+    cache.put(_cache_key(cache, fmt, tex, render_mode, fontsize, color, bgcolor, scale), fmt, data)
+
+
+########################################
+# The scale is only part of the key if not 1, so existing cache entries stay valid
+########################################
+def _cache_key(cache, fmt, tex, render_mode, fontsize, color, bgcolor, scale):
+    parts = (ENGINE_VERSION, tex, render_mode, float(fontsize), color, bgcolor or None, fmt)
+    if scale != 1:
+        parts += (float(scale),)
+    return cache.key(*parts)
@@ -0,0 +1,139 @@
+from collections import deque
+from contextlib import contextmanager
+import csv
+from datetime import datetime
+import json
+import threading
+import time
+
+# all stages in pipeline order, used as CSV columns
+STAGES = ('cache', 'layout', 'svg', 'parse', 'draw', 'raster', 'encode', 'decode', 'write', 'display')
+
+
+########################################
+# Opt-in timing of the render stages. A render starts a profile with begin()
+# on the thread it runs on, stage() blocks add their time to it and end()
+# stores it. While disabled, begin() does nothing and stage() costs only a
+# lookup, so the instrumentation can stay in place.
+########################################
+class RenderProfiler():
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, max_profiles=1000):
+        self.enabled = False
+        self._profiles = deque(maxlen=max_profiles)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    ########################################
+    # Starts a profile on the current thread, info is stored with it
+    ########################################
+    def begin(self, **info):
+        if self.enabled:
+            self._local.profile = dict(info, time=time.time(), stages={})
+            self._local.start = time.perf_counter()
+
+    ########################################
+    # Adds the time spent in the with block to stage name of the current profile
+    ########################################
+    @contextmanager
+    def stage(self, name):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            yield
+            return
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(profile, name, (time.perf_counter() - t) * 1000)
+
+    ########################################
+    # Stores and returns the current profile (None if profiling is disabled)
+    ########################################
+    def end(self):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            return None
+        self._local.profile = None
+        profile['total'] = (time.perf_counter() - self._local.start) * 1000
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    ########################################
+    # Drops the current profile, e.g. if the render was abandoned
+    ########################################
+    def discard(self):
+        self._local.profile = None
+
+    ########################################
+    # Adds ms to stage name of profile, e.g. for stages in the GUI thread
+    ########################################
+    def add_stage(self, profile, name, ms):
+        stages = profile['stages']
+        stages[name] = stages.get(name, 0) + ms
+
+    ########################################
+    #
+    ########################################
+    def profiles(self):
+        with self._lock:
+            return list(self._profiles)
+
+    ########################################
+    #
+    ########################################
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    ########################################
+    #
+    ########################################
+    def export_json(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.profiles(), f, indent=2)
+
+    ########################################
+    # One row per render, times in ms
+    ########################################
+    def export_csv(self, filename):
+        with open(filename, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('time', 'uid', 'render_mode', 'fontsize', 'tex') + STAGES + ('total', 'latency'))
+            for profile in self.profiles():
+                writer.writerow(
+                    (
+                        datetime.fromtimestamp(profile['time']).isoformat(' ', timespec='milliseconds'),
+                        profile.get('uid'),
+                        profile.get('render_mode'),
+                        profile.get('fontsize'),
+                        profile.get('tex'),
+                    )
+                    + tuple(_format_ms(profile['stages'].get(stage)) for stage in STAGES)
+                    + (_format_ms(profile.get('total')), _format_ms(profile.get('latency')))
+                )
+
+
+########################################
+#
+########################################
+def _format_ms(ms):
+    return '' if ms is None else f'{ms:.3f}'
+
+
+########################################
+# Returns a short summary like "layout 12ms, parse 4ms, draw 9ms"
+########################################
+def format_profile(profile):
+    parts = [f'{name} {ms:.1f}ms' if ms < 10 else f'{name} {ms:.0f}ms' for name, ms in profile['stages'].items()]
+    if 'latency' in profile:
+        parts.append(f"total {profile['latency']:.0f}ms")
+    return ', '.join(parts)
+
+
+# shared by the GUI and the render thread
+profiler = RenderProfiler()
@@ -0,0 +1,283 @@
+from contextlib import closing
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage
+from PyQt5 import sip
+
+from renderdefs import FORMATS
+from renderprofile import profiler
+
+# max. size in pixels of the thumbnails stored in the history and bookmarks,
+# the size of their icons in main.ui
+THUMBNAIL_SIZE = (200, 80)
+
+# equalz and renderer import the rendering stack, which is loaded in the
+# background at startup (see main.load_render_stack), so they are only
+# imported when actually needed
+
+
+########################################
+#
+########################################
+class RenderJob(QRunnable):
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, worker, job_id, params):
+        super().__init__()
+        self._worker = worker
+        self._job_id = job_id
+        self._params = params
+
+    ########################################
+    #
+    ########################################
+    def run(self):
+        worker, p = self._worker, self._params
+        if worker.is_stale(self._job_id):
+            return
+        from renderer import image_to_png, render_recording, replay_image
+        profiler.begin(uid=p['uid'], tex=p['tex'], render_mode=p['render_mode'], fontsize=p['fontsize'])
+        try:
+            # the preview rasterizes the recording itself, in tiles and only as far as visible
+            recording = render_recording(p['tex'], p['render_mode'], p['fontsize'], p['color'], worker.cache)
+            if worker.is_stale(self._job_id):
+                profiler.discard()
+                return
+            # the whole equation is never rasterized at full size, the history and bookmarks only store a
+            # thumbnail, replayed from the recording at a scale that fits thumbnail_size (in device pixels)
+            width, height = p.get('thumbnail_size', THUMBNAIL_SIZE)
+            scale = min(p.get('scale', 1), width / max(recording.width, 1), height / max(recording.height, 1))
+            surface = replay_image(recording, p['bgcolor'], scale)
+            # wraps cairo's pixel buffer without copying, surface must outlive the QImage.
+            # QImage (unlike QPixmap) can be used outside the GUI thread.
+            img = QImage(
+                sip.voidptr(surface.get_data()),
+                surface.get_width(),
+                surface.get_height(),
+                surface.get_stride(),
+                QImage.Format_ARGB32_Premultiplied
+            )
+            png = image_to_png(surface)
+            profile = profiler.end()
+            worker.finished.emit(self._job_id, dict(p, thumbnail=png, image=img, surface=surface,
+                    recording=recording, profile=profile))
+        except Exception as e:
+            profiler.end()
+            worker.failed.emit(self._job_id, str(e))
+
+
+########################################
+# Renders equations on a background thread. Only the most recent request
+# is of interest: submitting a new one makes queued jobs return without
+# rendering and running ones drop their result. Results are delivered via
+# the finished and failed signals (queued into the GUI thread).
+########################################
+class RenderWorker(QObject):
+
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, cache=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._job_id = 0
+        self._pool = QThreadPool(self)
+        # ziamath isn't thread-safe, so all jobs run on a single thread
+        self._pool.setMaxThreadCount(1)
+
+    ########################################
+    # Queues a render job, returns its id
+    ########################################
+    def submit(self, params):
+        self._job_id += 1
+        self._pool.start(RenderJob(self, self._job_id, params))
+        return self._job_id
+
+    ########################################
+    #
+    ########################################
+    def cancel(self):
+        self._job_id += 1
+
+    ########################################
+    #
+    ########################################
+    def is_stale(self, job_id):
+        return job_id != self._job_id
+
+    ########################################
+    #
+    ########################################
+    def wait(self):
+        self._pool.waitForDone()
+
+
+########################################
+#
+########################################
+class ExportJob(QRunnable):
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, worker, results, total):
+        super().__init__()
+        self._worker = worker
+        self._results = results
+        self._total = total
+
+    ########################################
+    #
+    ########################################
+    def run(self):
+        worker = self._worker
+        errors = []
+        # generator of (name, error) tuples, created here so its work is done in this thread
+        results = self._results()
+        try:
+            for done, (name, error) in enumerate(results, 1):
+                if error:
+                    errors.append(f'{name}: {error}')
+                worker.progress.emit(done, self._total)
+                if worker.is_cancelled():
+                    break
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            # terminates the worker processes or finishes the PDF if cancelled
+            results.close()
+        worker.finished.emit(errors)
+
+
+########################################
+# Renders and saves equations in the background, either many as separate
+# files (jobs as used by equalz.render_jobs) in a process pool, as pages
+# of a single PDF or as sprite sheets, or the current one to a file.
+# Reports progress via the progress signal and the list of errors via the
+# finished signal.
+########################################
+class ExportWorker(QObject):
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(list)
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, cache_dir=None, cache_size=None, parent=None):
+        super().__init__(parent)
+        self._cache_dir = cache_dir
+        self._cache_size = cache_size
+        self._cancelled = False
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+
+    ########################################
+    # Starts exporting jobs, processes is the number of worker processes
+    # (default: number of cores, 1 renders in the background thread itself,
+    # using cache instead of a RenderCache of its own)
+    ########################################
+    def start(self, jobs, processes=None, cache=None):
+        from equalz import render_jobs
+        self._cancelled = False
+        self._pool.start(ExportJob(
+            self,
+            lambda: render_jobs(jobs, processes, cache_dir=self._cache_dir, cache_size=self._cache_size,
+                    cache=cache),
+            len(jobs)
+        ))
+
+    ########################################
+    # Starts rendering a single equation (a dict with the keys tex,
+    # render_mode, fontsize, color and bgcolor) to filename, fmt is one of
+    # FORMATS or an image format Qt can write (e.g. BMP, JPEG or TIFF)
+    ########################################
+    def start_file(self, equation, fmt, filename, cache=None):
+        self._cancelled = False
+        self._pool.start(ExportJob(self, lambda: export_file(equation, fmt, filename, cache), 1))
+
+    ########################################
+    # Starts rendering equations (see renderer.render_pdf_pages) as pages of
+    # a single PDF. All pages are drawn to the same surface, so this is done
+    # in the background thread itself.
+    ########################################
+    def start_pdf(self, equations, filename, cache=None):
+        self._cancelled = False
+        self._pool.start(ExportJob(self, lambda: export_pdf(equations, filename, cache), len(equations)))
+
+    ########################################
+    # Starts rendering equations (see renderer.render_atlas) into sprite
+    # sheet PNGs plus a JSON manifest
+    ########################################
+    def start_atlas(self, equations, filename, cache=None):
+        from renderer import render_atlas
+        self._cancelled = False
+        self._pool.start(ExportJob(
+            self,
+            lambda: ((eq['uid'], error) for eq, error in render_atlas(equations, filename, cache=cache)),
+            len(equations)
+        ))
+
+    ########################################
+    #
+    ########################################
+    def cancel(self):
+        self._cancelled = True
+
+    ########################################
+    #
+    ########################################
+    def is_cancelled(self):
+        return self._cancelled
+
+    ########################################
+    #
+    ########################################
+    def is_busy(self):
+        return self._pool.activeThreadCount() > 0
+
+    ########################################
+    #
+    ########################################
+    def wait(self):
+        self._pool.waitForDone()
+
+
+########################################
+# Renders equation to filename, see ExportWorker.start_file(). Generator
+# for ExportJob, yields a single (filename, error) tuple.
+########################################
+def export_file(equation, fmt, filename, cache=None):
+    from renderer import render
+    fmt = fmt.lower()
+    try:
+        # other image formats are converted from a PNG at scale 1
+        data = render(equation['tex'], fmt if fmt in FORMATS else 'png', equation['render_mode'],
+                equation['fontsize'], equation['color'], equation['bgcolor'], cache)
+        if fmt in FORMATS:
+            with open(filename, 'wb') as f:
+                f.write(data)
+        elif not QImage.fromData(data, 'png').save(filename, fmt, 100):
+            raise OSError(f'could not write {fmt.upper()} file')
+    except Exception as e:
+        yield filename, f'{type(e).__name__}: {e}'
+    else:
+        yield filename, None
+
+
+########################################
+# Renders equations as pages of a single PDF, see ExportWorker.start_pdf().
+# Generator for ExportJob, yields (title, error) tuples. If it is closed
+# before all are done (i.e. cancelled), the pages are closed as well, so
+# no partial PDF is left under the chosen name (see renderer.render_pdf_pages).
+########################################
+def export_pdf(equations, filename, cache=None):
+    from renderer import render_pdf_pages
+    with closing(render_pdf_pages(equations, filename, cache)) as pages:
+        for eq, error in pages:
+            yield eq['title'], error
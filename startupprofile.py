@@ -0,0 +1,130 @@
+import builtins
+from contextlib import contextmanager
+import importlib.util
+import sys
+import threading
+import time
+
+# imports faster than this (in ms) are left out of the report
+MIN_IMPORT_TIME = 2
+
+# nested imports deeper than this are left out of the report
+MAX_IMPORT_DEPTH = 3
+
+
+########################################
+# Opt-in breakdown of the startup time (main.py --startup-profile). While
+# enabled, every import of a module that wasn't imported before is timed
+# (including the modules it imports itself), and phase() blocks and mark()
+# record named steps. report() prints all of it relative to the time this
+# module was imported, i.e. about the start of the process.
+########################################
+class StartupProfiler():
+
+    ########################################
+    #
+    ########################################
+    def __init__(self):
+        self.enabled = False
+        self._start = time.perf_counter()
+        self._imports = []  # (start ms, ms, depth, module name, thread name)
+        self._steps = []  # (start ms, ms or None, name)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._import = None
+
+    ########################################
+    # Starts timing imports
+    ########################################
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    ########################################
+    # Records the time spent in the with block as step name
+    ########################################
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_step(name, t, time.perf_counter())
+
+    ########################################
+    # Records a point in time, e.g. the first paint of the window
+    ########################################
+    def mark(self, name):
+        if self.enabled:
+            self._add_step(name, time.perf_counter(), None)
+
+    ########################################
+    # Prints the steps and the slowest imports, and stops timing imports
+    ########################################
+    def report(self, file=None):
+        if not self.enabled:
+            return
+        builtins.__import__ = self._import
+        self.enabled = False
+        file = file or sys.stderr
+        print('Startup profile (ms since start):', file=file)
+        for start, ms, name in sorted(self._steps):
+            if ms is None:
+                print(f'{start:8.1f}           {name}', file=file)
+            else:
+                print(f'{start:8.1f} {ms:8.1f}  {name}', file=file)
+        print(f'Imports of at least {MIN_IMPORT_TIME} ms (ms since start, ms incl. nested imports):', file=file)
+        for start, ms, depth, name, thread in sorted(self._imports):
+            if ms >= MIN_IMPORT_TIME and depth <= MAX_IMPORT_DEPTH:
+                where = '' if thread == 'MainThread' else f'  [{thread}]'
+                print(f'{start:8.1f} {ms:8.1f}  {"  " * depth}{name}{where}', file=file)
+
+    ########################################
+    #
+    ########################################
+    def _add_step(self, name, t0, t1):
+        with self._lock:
+            self._steps.append(((t0 - self._start) * 1000, None if t1 is None else (t1 - t0) * 1000, name))
+
+    ########################################
+    # Replaces builtins.__import__ while enabled
+    ########################################
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        depth = getattr(self._local, 'depth', 0)
+        count = len(sys.modules)
+        self._local.depth = depth + 1
+        t = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            ms = (time.perf_counter() - t) * 1000
+            self._local.depth = depth
+            # only imports that actually loaded modules are of interest
+            if len(sys.modules) > count:
+                with self._lock:
+                    self._imports.append(((t - self._start) * 1000, ms, depth,
+                            self._module_name(name, globals, fromlist, level), threading.current_thread().name))
+
+    ########################################
+    # Absolute name of an imported module, e.g. "cairosvg_min (surface)"
+    # for "from . import surface" in cairosvg_min
+    ########################################
+    @staticmethod
+    def _module_name(name, globals, fromlist, level):
+        if level:
+            try:
+                name = importlib.util.resolve_name('.' * level + name, (globals or {}).get('__package__'))
+            except (ImportError, ValueError):
+                return name
+        submodules = [item for item in fromlist or () if f'{name}.{item}' in sys.modules]
+        return f'{name} ({", ".join(submodules)})' if submodules else name
+
+
+# single instance, enabled by main.py
+startup_profiler = StartupProfiler()
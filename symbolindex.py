@@ -0,0 +1,248 @@
+from array import array
+from bisect import bisect_left
+import os
+import re
+import struct
+import tempfile
+import zlib
+
+# first bytes of the binary index file, followed by the format version
+MAGIC = b'EQZSYM'
+INDEX_VERSION = 1
+
+# max. number of results of a search
+MAX_RESULTS = 50
+
+# fuzzy matches must contain at least this fraction of the trigrams of the query
+MIN_TRIGRAM_SCORE = .6
+
+_HEADER = struct.Struct('<6sHQQ')  # magic, version, size and mtime (ns) of the symbols file
+
+
+########################################
+# Searchable index of the LaTeX commands in unimathsymbols.txt (the file
+# latex2mathml, and thereby ziamath, gets its symbols from). Each entry is
+# a tuple (command, character, description). Entries are sorted by their
+# lowercase command, so the commands starting with a prefix are a
+# contiguous range that is found by binary search - a trie flattened into
+# a sorted array. For fuzzy matching, the trigrams of the words of each
+# command and description are indexed. The index is cached in a compact
+# binary file (zlib compressed string tables and posting lists), see load().
+########################################
+class SymbolIndex():
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, entries, trigrams=None):
+        self.entries = entries
+        self._keys = [command[1:].lower() for command, _, _ in entries]
+        if trigrams is None:
+            trigrams = self._build_trigrams(entries)
+        self._trigrams, self._offsets, self._postings = trigrams
+        self._trigram_ids = {trigram: i for i, trigram in enumerate(self._trigrams)}
+
+    ########################################
+    #
+    ########################################
+    def __len__(self):
+        return len(self.entries)
+
+    ########################################
+    # Parses unimathsymbols.txt. As in latex2mathml, the LaTeX and
+    # unicode-math columns and the aliases in the comments ("= \cmd",
+    # "# \cmd") are commands, the first entry of a command wins. Only
+    # commands consisting of letters are used.
+    ########################################
+    @classmethod
+    def build(cls, filename):
+        entries = {}
+        with open(filename, encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                columns = line.rstrip('\r\n').split('^')
+                if len(columns) < 8:
+                    continue
+                char, description = columns[1], columns[-1].strip()
+                commands = [columns[2].strip(), columns[3].strip()]
+                commands += re.findall(r'[=#]\s*(\\[^,^ ]+),?', description)
+                for command in commands:
+                    if re.fullmatch(r'\\[A-Za-z]+', command) and command not in entries:
+                        entries[command] = (command, char, description)
+        return cls(sorted(entries.values(), key=lambda entry: (entry[0].lower(), entry[0])))
+
+    ########################################
+    # Returns the index of the symbols file filename. If cache_file is
+    # passed, the index is read from it, or built and written to it if it
+    # doesn't exist or was built from a different version of the file.
+    # If filename is missing, the cached index is used as it is, without
+    # one the index is empty.
+    ########################################
+    @classmethod
+    def load(cls, filename, cache_file=None):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            st = None
+        if cache_file is not None:
+            try:
+                with open(cache_file, 'rb') as f:
+                    data = f.read()
+                magic, version, size, mtime = _HEADER.unpack_from(data)
+                if (magic, version) == (MAGIC, INDEX_VERSION) and (
+                        st is None or (size, mtime) == (st.st_size, st.st_mtime_ns)):
+                    return cls._from_bytes(zlib.decompress(data[_HEADER.size:]))
+            except (OSError, struct.error, zlib.error, ValueError, IndexError):
+                pass
+        if st is None:
+            print('ERROR', f'symbols file not found: {filename}')
+            return cls([])
+        index = cls.build(filename)
+        if cache_file is None:
+            return index
+        try:
+            index.save(cache_file, st)
+        except OSError as e:
+            print('ERROR', e)
+        return index
+
+    ########################################
+    # Writes the index to filename, st is the os.stat() result of the
+    # symbols file it was built from. The file is written atomically.
+    ########################################
+    def save(self, filename, st):
+        strings = '\0'.join(f'{command}\0{char}\0{description}' for command, char, description in self.entries)
+        payload = b''.join([
+            _block(strings.encode()),
+            _block('\0'.join(self._trigrams).encode()),
+            _block(self._offsets.tobytes()),
+            _block(self._postings.tobytes()),
+        ])
+        fd, tmp = tempfile.mkstemp(prefix='.', dir=os.path.dirname(os.path.abspath(filename)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, INDEX_VERSION, st.st_size, st.st_mtime_ns))
+                f.write(zlib.compress(payload))
+            os.replace(tmp, filename)
+        except OSError:
+            os.remove(tmp)
+            raise
+
+    ########################################
+    # Returns up to limit entries for query, which is the beginning of a
+    # command (with or without backslash) or some words of its description,
+    # possibly misspelled. Commands starting with the query come first,
+    # shortest first, then fuzzy matches, best first. limit None returns
+    # all matches.
+    ########################################
+    def search(self, query, limit=MAX_RESULTS):
+        if limit is None:
+            limit = len(self.entries)
+        key = query.strip().lstrip('\\').lower()
+        if not key:
+            return self.entries[:limit]
+        ids = self._prefix_range(key)
+        ids = sorted(ids, key=lambda i: (len(self._keys[i]), self._keys[i]))[:limit]
+        if len(ids) < limit:
+            found = set(ids)
+            ids += [i for i in self._fuzzy(key) if i not in found][:limit - len(ids)]
+        return [self.entries[i] for i in ids]
+
+    ########################################
+    # Indexes of all entries whose command starts with key
+    ########################################
+    def _prefix_range(self, key):
+        start = bisect_left(self._keys, key)
+        # U+FFFF sorts after all characters of commands
+        return range(start, bisect_left(self._keys, key + '\uffff', start))
+
+    ########################################
+    # Indexes of the entries containing at least MIN_TRIGRAM_SCORE of the
+    # trigrams of key. Commands containing the words of key come first, then
+    # the ones most similar to key, then the ones with the most trigrams in
+    # common in command and description.
+    ########################################
+    def _fuzzy(self, key):
+        query = _trigrams(key)
+        if not query:
+            return []
+        counts = {}
+        for trigram in query:
+            i = self._trigram_ids.get(trigram)
+            if i is None:
+                continue
+            for entry in self._postings[self._offsets[i]:self._offsets[i + 1]]:
+                counts[entry] = counts.get(entry, 0) + 1
+        min_count = MIN_TRIGRAM_SCORE * len(query)
+        matches = [i for i, count in counts.items() if count >= min_count]
+        words = ''.join(re.findall(r'[a-z0-9]+', key))
+
+        def _similarity(i):
+            # Dice coefficient of the trigrams of key and of the command
+            trigrams = _trigrams(self._keys[i])
+            return 2 * len(query & trigrams) / (len(query) + len(trigrams))
+
+        return sorted(matches, key=lambda i: (words not in self._keys[i], -_similarity(i), -counts[i],
+                len(self._keys[i]), self._keys[i]))
+
+    ########################################
+    # Sorted trigrams, and for each the ids of the entries containing it,
+    # concatenated into postings, the ones of trigram i are
+    # postings[offsets[i]:offsets[i + 1]]
+    ########################################
+    @staticmethod
+    def _build_trigrams(entries):
+        index = {}
+        for i, (command, _, description) in enumerate(entries):
+            for trigram in _trigrams(f'{command[1:]} {description}'.lower()):
+                index.setdefault(trigram, []).append(i)
+        trigrams = sorted(index)
+        offsets = array('I', [0])
+        postings = array('H')
+        for trigram in trigrams:
+            postings.extend(index[trigram])
+            offsets.append(len(postings))
+        return trigrams, offsets, postings
+
+    ########################################
+    #
+    ########################################
+    @classmethod
+    def _from_bytes(cls, data):
+        pos = 0
+        blocks = []
+        for _ in range(4):
+            size, = struct.unpack_from('<I', data, pos)
+            pos += 4
+            blocks.append(data[pos:pos + size])
+            pos += size
+        strings = blocks[0].decode().split('\0')
+        entries = [tuple(strings[i:i + 3]) for i in range(0, len(strings), 3)]
+        trigrams = blocks[1].decode().split('\0')
+        offsets = array('I')
+        offsets.frombytes(blocks[2])
+        postings = array('H')
+        postings.frombytes(blocks[3])
+        if len(offsets) != len(trigrams) + 1 or offsets[-1] != len(postings):
+            raise ValueError('invalid symbol index')
+        return cls(entries, (trigrams, offsets, postings))
+
+
+########################################
+# Trigrams of the words of text, each word padded with a space on both
+# sides, so words shorter than 3 letters and word boundaries count as well
+########################################
+def _trigrams(text):
+    res = set()
+    for word in re.findall(r'[a-z0-9]+', text):
+        word = f' {word} '
+        res.update(word[i:i + 3] for i in range(len(word) - 2))
+    return res
+
+
+########################################
+# Length prefixed bytes
+########################################
+def _block(data):
+    return struct.pack('<I', len(data)) + data
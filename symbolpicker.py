@@ -0,0 +1,82 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QDialog, QDialogButtonBox, QLineEdit,
+        QTreeWidget, QTreeWidgetItem, QVBoxLayout)
+
+
+########################################
+# Dialog for finding a symbol in a SymbolIndex by command or description,
+# the list is updated on each keystroke. exec_() returns QDialog.Accepted
+# if a symbol was chosen, its command is returned by command().
+########################################
+class SymbolPicker(QDialog):
+
+    ########################################
+    #
+    ########################################
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self._index = index
+        self.setWindowTitle('Insert Symbol')
+        self.resize(560, 480)
+
+        self._line_edit = QLineEdit(self)
+        self._line_edit.setPlaceholderText('Search, e.g. "\\right", "arrow" or "integral"')
+        self._line_edit.setClearButtonEnabled(True)
+        self._line_edit.textChanged.connect(self._update)
+        self._line_edit.installEventFilter(self)
+
+        self._tree = QTreeWidget(self)
+        self._tree.setHeaderLabels(['Symbol', 'Command', 'Description'])
+        self._tree.setRootIsDecorated(False)
+        self._tree.setUniformRowHeights(True)
+        self._tree.setSelectionMode(QAbstractItemView.SingleSelection)
+        self._tree.setColumnWidth(0, 60)
+        self._tree.setColumnWidth(1, 180)
+        self._tree.itemActivated.connect(self.accept)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
+        buttons.button(QDialogButtonBox.Ok).setText('Insert')
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self._line_edit)
+        layout.addWidget(self._tree)
+        layout.addWidget(buttons)
+
+        self._update('')
+
+    ########################################
+    # Command of the selected symbol, or None
+    ########################################
+    def command(self):
+        item = self._tree.currentItem()
+        return item.text(1) if item else None
+
+    ########################################
+    #
+    ########################################
+    def accept(self):
+        if self.command():
+            super().accept()
+
+    ########################################
+    # Up/down in the search field move the selection
+    ########################################
+    def eventFilter(self, obj, event):
+        if event.type() == event.KeyPress and event.key() in (Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp,
+                Qt.Key_PageDown):
+            QApplication.sendEvent(self._tree, event)
+            return True
+        return super().eventFilter(obj, event)
+
+    ########################################
+    # All symbols for an empty query
+    ########################################
+    def _update(self, query):
+        self._tree.clear()
+        entries = self._index.search(query, None if not query.strip() else 200)
+        self._tree.addTopLevelItems([QTreeWidgetItem([char, command, description])
+                for command, char, description in entries])
+        if entries:
+            self._tree.setCurrentItem(self._tree.topLevelItem(0))
@@ -0,0 +1,41 @@
+# Tests of the shelf packing of sprite sheets (atlas.py)
+
+import atlas
+
+
+def _overlap(a, b):
+    (ax, ay, aw, ah), (bx, by, bw, bh) = a, b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+def test_pack():
+    sizes = [(100, 50), (30, 20), (200, 40), (60, 50), (10, 10)]
+    positions, atlases = atlas.pack(sizes, 256, 2)
+    assert len(atlases) == 1
+    width, height = atlases[0]
+    assert width <= 256 and height <= 256
+    rects = [(x, y, w, h) for (_, x, y), (w, h) in zip(positions, sizes)]
+    for x, y, w, h in rects:
+        assert x + w <= width and y + h <= height
+    for i, a in enumerate(rects):
+        for b in rects[i + 1:]:
+            assert not _overlap(a, b)
+
+
+def test_pack_several_atlases():
+    positions, atlases = atlas.pack([(60, 60)] * 5, 128, 0)
+    assert len(atlases) == 2
+    assert atlases == [(120, 120), (60, 60)]
+    assert sorted(a for a, _, _ in positions) == [0, 0, 0, 0, 1]
+
+
+def test_pack_oversized():
+    # too wide for a new shelf of the first atlas, gets an atlas of its own
+    positions, atlases = atlas.pack([(100, 50), (3000, 20), (50, 50)], 2048, 2)
+    assert atlases[positions[1][0]] == (3000, 20)
+    assert positions[1][1:] == (0, 0)
+    assert positions[0][0] == positions[2][0] != positions[1][0]
+    assert atlases[positions[0][0]] == (152, 50)
+    # too high
+    positions, atlases = atlas.pack([(10, 10), (20, 3000)], 2048, 2)
+    assert atlases == [(20, 3000), (10, 10)]
@@ -0,0 +1,113 @@
+# Tests of the headless command line interface (equalz.py)
+
+import os
+
+import pytest
+
+import equalz
+from rendercache import RenderCache
+from renderdefs import DEFAULT_COLOR, DEFAULT_FONTSIZE, RenderMode
+
+
+def _defaults(output='.'):
+    return {
+        'formats': ['svg'],
+        'scales': [1],
+        'mode': RenderMode.Display,
+        'fontsize': DEFAULT_FONTSIZE,
+        'color': DEFAULT_COLOR,
+        'bgcolor': None,
+        'output': output,
+    }
+
+
+def test_parse_line_plain():
+    assert equalz.parse_line('   ', _defaults()) is None
+    job = equalz.parse_line(r'  \frac{a}{b} ', _defaults())
+    assert job['tex'] == r'\frac{a}{b}'
+    assert job['mode'] == RenderMode.Display
+
+
+def test_parse_line_brace():
+    # LaTeX starting with a brace is not JSON
+    job = equalz.parse_line('{a}^2', _defaults())
+    assert job['tex'] == '{a}^2'
+
+
+def test_parse_line_json():
+    job = equalz.parse_line(
+        '{"tex": "x^2", "name": "square", "mode": "Inline", "fontsize": 12}',
+        _defaults())
+    assert job['tex'] == 'x^2'
+    assert job['name'] == 'square'
+    assert job['mode'] == RenderMode.Inline
+    assert job['fontsize'] == 12
+
+
+def test_parse_line_json_whitelist():
+    job = equalz.parse_line(
+        '{"tex": "x", "output": "/etc", "formats": ["ps"]}', _defaults('out'))
+    assert job['output'] == 'out'
+    assert job['formats'] == ['svg']
+
+
+@pytest.mark.parametrize('name', ('../x', '../../x', 'a/b', 'a\\b', '..'))
+def test_parse_line_json_invalid_name(name):
+    line = '{"tex": "x", "name": %s}' % equalz.json.dumps(name)
+    with pytest.raises(ValueError):
+        equalz.parse_line(line, _defaults())
+
+
+def test_parse_line_json_invalid():
+    with pytest.raises(ValueError):
+        equalz.parse_line('{"name": "x"}', _defaults())
+    with pytest.raises(KeyError):
+        equalz.parse_line('{"tex": "x", "mode": "nope"}', _defaults())
+
+
+def test_read_lines_skips_invalid(capsys):
+    jobs = list(equalz.read_lines(
+        ['a', '', '{"tex": "b", "name": "../b"}', '{"tex": "c"}'], 'eq',
+        _defaults()))
+    assert [job['name'] for job in jobs] == ['eq-00001', 'eq-00004']
+    assert 'eq:3' in capsys.readouterr().err
+
+
+def test_output_filename():
+    job = dict(_defaults('out'), name='eq')
+    assert equalz.output_filename(job, 'png') == os.path.join('out', 'eq.png')
+    assert equalz.output_filename(job, 'png', 2) == os.path.join('out', 'eq@2x.png')
+    assert equalz.output_filename(job, 'png', 1.5) == os.path.join('out', 'eq@1.5x.png')
+    with pytest.raises(ValueError):
+        equalz.output_filename(dict(job, name='../eq'), 'png')
+
+
+def test_render_jobs(tmp_path):
+    defaults = dict(_defaults(str(tmp_path)), formats=['svg', 'png'], scales=[1, 2])
+    jobs = [dict(defaults, tex='x^2', name='a'), dict(defaults, tex=r'\sqrt{y}', name='b')]
+    results = sorted(equalz.render_jobs(jobs, processes=1))
+    assert results == [('a', None), ('b', None)]
+    assert sorted(os.listdir(tmp_path)) == [
+        'a.png', 'a.svg', 'a@2x.png', 'b.png', 'b.svg', 'b@2x.png']
+    assert (tmp_path / 'a.svg').read_bytes().startswith(b'<svg')
+
+
+def test_render_jobs_cache(tmp_path, monkeypatch):
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    cache = RenderCache(str(tmp_path / 'cache'))
+    # the cache passed in is used, no second instance is created on the same directory
+    monkeypatch.setattr(equalz, 'RenderCache', None)
+    jobs = [dict(_defaults(str(out_dir)), formats=['svg'], tex='x^2', name='a')]
+    results = list(equalz.render_jobs(jobs, processes=1, cache_dir=str(tmp_path / 'cache'), cache=cache))
+    assert results == [('a', None)]
+    assert cache.size() > 0
+
+
+def test_render_jobs_processes(tmp_path):
+    defaults = dict(_defaults(str(tmp_path)), formats=['svg'])
+    jobs = [dict(defaults, tex=f'x^{i}', name=f'eq{i}') for i in range(4)]
+    results = sorted(equalz.render_jobs(jobs, processes=2, chunksize=1))
+    assert results == [(f'eq{i}', None) for i in range(4)]
+    assert sorted(os.listdir(tmp_path)) == [f'eq{i}.svg' for i in range(4)]
+
@@ -0,0 +1,268 @@
+# Tests of the SQLite store of history and bookmarks (equationstore.py)
+
+from datetime import datetime, timedelta
+import os
+import sqlite3
+
+import pytest
+
+from equationstore import BOOKMARKS, COLUMNS, HISTORY, EquationStore
+
+# schema of the first version, without user_version, full-text index and hash column
+SCHEMA_V1 = '''
+CREATE TABLE equations (
+    kind TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    tex TEXT NOT NULL,
+    color TEXT,
+    bgcolor TEXT,
+    fontsize NUMERIC,
+    render_mode INTEGER,
+    png BLOB,
+    PRIMARY KEY (kind, uid)
+);
+'''
+
+
+def _row(tex, second=0, **kwargs):
+    row = {
+        'datetime': f'2024-01-01 00:00:{second:02d}',
+        'tex': tex,
+        'color': '#000000',
+        'bgcolor': '',
+        'fontsize': 24,
+        'render_mode': 0,
+    }
+    row.update(kwargs)
+    return row
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EquationStore(str(tmp_path / 'equations.db'))
+    yield store
+    store.close()
+
+
+def test_add_get(store):
+    store.add(HISTORY, 'a', _row('x^2'), b'png')
+    assert store.get(HISTORY, 'a') == _row('x^2')
+    assert store.png(HISTORY, 'a') == b'png'
+    assert store.get(BOOKMARKS, 'a') is None
+    assert store.count(HISTORY) == 1
+    store.remove(HISTORY, 'a')
+    assert store.get(HISTORY, 'a') is None
+
+
+def test_page(store):
+    store.add_many(HISTORY, [(str(i), _row(f'x^{i}', i), None) for i in range(5)])
+    first = store.page(HISTORY, 2)
+    assert [uid for uid, _ in first] == ['4', '3']
+    second = store.page(HISTORY, 2, first[-1])
+    assert [uid for uid, _ in second] == ['2', '1']
+    assert [uid for uid, _ in store.page(HISTORY, 2, second[-1])] == ['0']
+
+
+def test_migrate_v1(tmp_path):
+    filename = str(tmp_path / 'equations.db')
+    con = sqlite3.connect(filename)
+    con.executescript(SCHEMA_V1)
+    for uid, row in (('a', _row('\\frac{a}{b}', 1)), ('b', _row('x^2', 2))):
+        con.execute('INSERT INTO equations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (HISTORY, uid) + tuple(row[col] for col in COLUMNS) + (b'png',))
+    con.commit()
+    con.close()
+
+    store = EquationStore(filename)
+    try:
+        assert store.count(HISTORY) == 2
+        assert store.get(HISTORY, 'a') == _row('\\frac{a}{b}', 1)
+        assert store.png(HISTORY, 'b') == b'png'
+        assert [uid for uid, _ in store.page(HISTORY, 10)] == ['b', 'a']
+    finally:
+        store.close()
+
+
+def test_import_entries(store, tmp_path):
+    png_dir = tmp_path / 'history'
+    png_dir.mkdir()
+    (png_dir / 'a.png').write_bytes(b'png')
+    store.import_entries(HISTORY, {'a': _row('x^2', 1), 'b': _row('y^2', 2)}, str(png_dir))
+    assert store.png(HISTORY, 'a') == b'png'
+    assert store.png(HISTORY, 'b') is None
+    assert not (png_dir / 'a.png').exists()
+
+
+def test_remove_orphans(store, tmp_path):
+    png_dir = tmp_path / 'history'
+    png_dir.mkdir()
+    store.add(HISTORY, 'a', _row('x^2'))
+    for name in ('a.png', 'orphan.png', 'notes.txt'):
+        (png_dir / name).write_bytes(b'data')
+    assert store.remove_orphans(HISTORY, str(png_dir)) == 1
+    assert sorted(os.listdir(png_dir)) == ['a.png', 'notes.txt']
+    # the directory itself is removed once empty
+    os.unlink(png_dir / 'a.png')
+    os.unlink(png_dir / 'notes.txt')
+    assert store.remove_orphans(HISTORY, str(png_dir)) == 0
+    assert not png_dir.exists()
+
+
+def _uids(results):
+    return [uid for uid, _ in results]
+
+
+@pytest.mark.skipif(not sqlite3.connect(':memory:').execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        .fetchone()[0], reason='SQLite without FTS5')
+def test_search_fts(store):
+    assert store._fts
+    store.add_many(HISTORY, [
+        ('a', _row('\\frac{a}{b}', 1), None),
+        ('b', _row('\\frac{\\alpha}{2} + x_1', 2), None),
+        ('c', _row('\\sqrt{\\alpha}', 3), None),
+    ])
+    store.add(BOOKMARKS, 'd', _row('\\frac{1}{2}'))
+    # most recently added first, only of the given kind
+    assert _uids(store.search(HISTORY, '\\frac', 10)) == ['b', 'a']
+    # all tokens are prefixes, so equations are found while typing
+    assert _uids(store.search(HISTORY, '\\fr', 10)) == ['b', 'a']
+    assert _uids(store.search(HISTORY, '\\al', 10)) == ['c', 'b']
+    # control sequences are tokens of their own
+    assert _uids(store.search(HISTORY, 'alpha', 10)) == []
+    assert _uids(store.search(HISTORY, '\\frac \\alpha', 10)) == ['b']
+    assert _uids(store.search(HISTORY, 'x_1', 10)) == ['b']
+    assert _uids(store.search(HISTORY, '\\int', 10)) == []
+    # paging, after is the last result of the previous page
+    first = store.search(HISTORY, '\\al', 1)
+    assert _uids(first) == ['c']
+    assert _uids(store.search(HISTORY, '\\al', 1, first[-1])) == ['b']
+    # removed equations are no longer found
+    store.remove(HISTORY, 'b')
+    assert _uids(store.search(HISTORY, '\\frac', 10)) == ['a']
+
+
+def test_search_without_fts(store):
+    store._fts = False
+    store.add_many(HISTORY, [('a', _row('\\frac{a}{b}', 1), None), ('b', _row('x_{10}', 2), None)])
+    assert _uids(store.search(HISTORY, '\\fr', 10)) == ['a']
+    assert _uids(store.search(HISTORY, 'a b', 10)) == ['a']
+    assert _uids(store.search(HISTORY, '10', 10)) == ['b']
+
+
+def test_search_empty_query(store):
+    store.add_many(HISTORY, [('a', _row('x', 1), None), ('b', _row('y', 2), None)])
+    assert _uids(store.search(HISTORY, '  ', 10)) == ['b', 'a']
+
+
+def test_migrate_v1_search(tmp_path):
+    filename = str(tmp_path / 'equations.db')
+    con = sqlite3.connect(filename)
+    con.executescript(SCHEMA_V1)
+    con.execute('INSERT INTO equations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (HISTORY, 'a') + tuple(_row('\\sum_{i=1}^n i')[col] for col in COLUMNS) + (None,))
+    con.commit()
+    con.close()
+
+    store = EquationStore(filename)
+    try:
+        # the full-text index is built for the existing equations
+        assert _uids(store.search(HISTORY, '\\su', 10)) == ['a']
+    finally:
+        store.close()
+
+
+def test_add_duplicate(store):
+    assert store.add(HISTORY, 'a', _row('x^2', 1), b'old') == 'a'
+    # equal content (an empty and no background color are the same) returns the existing uid and moves it up
+    assert store.add(HISTORY, 'b', _row('x^2', 3, bgcolor=None, fontsize=24.0), b'new') == 'a'
+    store.add(HISTORY, 'c', _row('y^2', 2))
+    assert store.count(HISTORY) == 2
+    assert store.png(HISTORY, 'a') == b'new'
+    assert _uids(store.page(HISTORY, 10)) == ['a', 'c']
+    # other settings or kinds are different equations
+    assert store.add(HISTORY, 'd', _row('x^2', 4, color='#ff0000')) == 'd'
+    assert store.add(BOOKMARKS, 'e', _row('x^2', 4)) == 'e'
+
+
+def test_migrate_v2_remove_duplicates(tmp_path):
+    filename = str(tmp_path / 'equations.db')
+    con = sqlite3.connect(filename)
+    con.executescript(SCHEMA_V1)
+    for uid, row in (('a', _row('x^2', 1)), ('b', _row('y^2', 2)), ('c', _row('x^2', 3)), ('d', _row('x^2', 2))):
+        con.execute('INSERT INTO equations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (HISTORY, uid) + tuple(row[col] for col in COLUMNS) + (None,))
+    con.execute('PRAGMA user_version = 2')
+    con.commit()
+    con.close()
+
+    store = EquationStore(filename)
+    try:
+        # the hashes of the existing equations are added, only the most recent of equal ones is kept
+        assert sorted(store.remove_duplicates(HISTORY)) == ['a', 'd']
+        assert _uids(store.page(HISTORY, 10)) == ['c', 'b']
+        assert store.add(HISTORY, 'e', _row('y^2', 4)) == 'b'
+    finally:
+        store.close()
+
+
+def test_prune_count(store):
+    store.add_many(HISTORY, [(str(i), _row(f'x^{i}', i), None) for i in range(5)])
+    store.add(BOOKMARKS, 'b', _row('x'))
+    assert store.prune(HISTORY) == []
+    assert sorted(store.prune(HISTORY, max_count=3)) == ['0', '1']
+    assert _uids(store.page(HISTORY, 10)) == ['4', '3', '2']
+    assert store.count(BOOKMARKS) == 1
+
+
+def test_prune_age(store):
+    now = datetime.now()
+    for uid, days in (('old', 40), ('recent', 10), ('new', 0)):
+        row = _row(uid, datetime=(now - timedelta(days=days)).isoformat(' ', timespec='seconds'))
+        store.add(HISTORY, uid, row)
+    assert store.prune(HISTORY, max_age=30) == ['old']
+    assert _uids(store.page(HISTORY, 10)) == ['new', 'recent']
+
+
+def test_prune_bytes(store):
+    store.add_many(HISTORY, [(str(i), _row(f'x^{i}', i), b'x' * 100) for i in range(5)])
+    # the newest equations that fit into max_bytes are kept
+    assert sorted(store.prune(HISTORY, max_bytes=250)) == ['0', '1', '2']
+    assert store.size(HISTORY) == 200
+    # the limits are combined
+    store.add_many(HISTORY, [(str(i), _row(f'x^{i}', i), b'x') for i in range(5, 8)])
+    assert sorted(store.prune(HISTORY, max_count=4, max_bytes=201)) == ['3']
+
+
+def test_vacuum(store):
+    store.add_many(HISTORY, [(str(i), _row(f'x^{i}', i % 60), b'x' * 4096) for i in range(200)])
+    store.prune(HISTORY, max_count=10)
+    pages = store._con.execute('PRAGMA page_count').fetchone()[0]
+    assert store.vacuum()
+    assert store._con.execute('PRAGMA page_count').fetchone()[0] < pages / 4
+    assert store._con.execute('PRAGMA freelist_count').fetchone()[0] == 0
+    # nothing to return to the file system
+    assert not store.vacuum()
+    assert store.count(HISTORY) == 10
+
+
+def test_vacuum_v1(tmp_path):
+    filename = str(tmp_path / 'equations.db')
+    con = sqlite3.connect(filename)
+    con.executescript(SCHEMA_V1)
+    con.commit()
+    con.close()
+
+    store = EquationStore(filename)
+    try:
+        # files of older versions aren't incrementally vacuumed until they are converted by a full VACUUM
+        assert store._con.execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+        store.add_many(HISTORY, [(str(i), _row(f'x^{i}', i % 60), b'x' * 4096) for i in range(100)])
+        store.clear(HISTORY)
+        assert store.vacuum()
+        assert store.count(HISTORY) == 0
+        assert store._con.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        assert store._con.execute('PRAGMA freelist_count').fetchone()[0] == 0
+    finally:
+        store.close()
+
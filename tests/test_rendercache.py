@@ -0,0 +1,110 @@
+# Tests of the persistent render cache (rendercache.py)
+
+import os
+
+import pytest
+
+import rendercache
+from rendercache import RenderCache
+
+
+@pytest.fixture
+def no_rescan(monkeypatch):
+    # only rescan when a test asks for it
+    monkeypatch.setattr(rendercache, 'RESCAN_INTERVAL', float('inf'))
+
+
+def _touch(cache_dir, fn, mtime):
+    os.utime(os.path.join(cache_dir, fn), (mtime, mtime))
+
+
+def test_get_put(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    key = cache.key('x^2', 24)
+    assert key == RenderCache.key('x^2', 24)
+    assert key != cache.key('x^2', 25)
+    assert cache.get(key, 'png') is None
+    cache.put(key, 'png', b'data')
+    assert cache.get(key, 'png') == b'data'
+    assert cache.get(key, 'svg') is None
+    assert cache.size() == 4
+
+
+def test_lru_order(tmp_path, no_rescan):
+    cache = RenderCache(str(tmp_path), max_bytes=30)
+    for i, key in enumerate('abc'):
+        cache.put(key, 'png', b'x' * 10)
+        _touch(tmp_path, f'{key}.png', 1000 + i)
+    # a is used again, so b is the least recently used one
+    assert cache.get('a', 'png')
+    cache.put('d', 'png', b'x' * 10)
+    assert cache.get('b', 'png') is None
+    assert not (tmp_path / 'b.png').exists()
+    for key in 'acd':
+        assert cache.get(key, 'png')
+
+
+def test_lru_order_survives_restart(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    for i, key in enumerate('abc'):
+        cache.put(key, 'png', b'x' * 10)
+        _touch(tmp_path, f'{key}.png', 1000 + i)
+    _touch(tmp_path, 'a.png', 2000)
+    RenderCache(str(tmp_path), max_bytes=20)
+    assert sorted(os.listdir(tmp_path)) == ['a.png', 'c.png']
+
+
+def test_byte_limit(tmp_path, no_rescan):
+    cache = RenderCache(str(tmp_path), max_bytes=100)
+    for i in range(20):
+        cache.put(str(i), 'png', b'x' * 30)
+    assert cache.size() <= 100
+    assert sum(os.path.getsize(tmp_path / fn) for fn in os.listdir(tmp_path)) <= 100
+    # larger than the whole cache
+    cache.put('big', 'png', b'x' * 200)
+    assert cache.size() <= 100
+
+
+def test_failed_put_leaves_no_temp_file(tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path))
+
+    def _fail(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(rendercache.os, 'replace', _fail)
+    cache.put('a', 'png', b'data')
+    assert os.listdir(tmp_path) == []
+    assert cache.size() == 0
+
+
+def test_cross_instance(tmp_path, monkeypatch):
+    monkeypatch.setattr(rendercache, 'RESCAN_INTERVAL', float('inf'))
+    gui = RenderCache(str(tmp_path), max_bytes=100)
+    worker = RenderCache(str(tmp_path), max_bytes=100)
+
+    # entries of other instances are found
+    worker.put('a', 'png', b'x' * 40)
+    assert gui.get('a', 'png') == b'x' * 40
+    assert gui.size() == 40
+
+    # and entries evicted by them are dropped
+    worker.put('b', 'png', b'x' * 40)
+    worker.put('c', 'png', b'x' * 40)
+    assert not (tmp_path / 'a.png').exists()
+    assert gui.get('a', 'png') is None
+    assert gui.size() == 0
+
+    # entries of other instances count against max_bytes after a rescan
+    monkeypatch.setattr(rendercache, 'RESCAN_INTERVAL', 0)
+    gui.put('d', 'png', b'x' * 40)
+    assert sum(os.path.getsize(tmp_path / fn) for fn in os.listdir(tmp_path)) <= 100
+    assert gui.size() <= 100
+
+
+def test_clear(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    cache.put('a', 'png', b'data')
+    RenderCache(str(tmp_path)).put('b', 'png', b'data')
+    cache.clear()
+    assert os.listdir(tmp_path) == []
+    assert cache.size() == 0
@@ -0,0 +1,110 @@
+# Tests of the search index of LaTeX commands (symbolindex.py)
+
+import os
+
+import pytest
+
+from symbolindex import SymbolIndex
+
+SYMBOLS = '''\
+# comment lines are skipped
+003B1^α^\\alpha^\\upalpha^A^mathalpha^-literal^= \\alphaup (kpfonts), alpha, greek
+02190^←^\\leftarrow^\\leftarrow^R^mathrel^^= \\gets, a: leftward arrow
+02192^→^\\rightarrow^\\rightarrow^R^mathrel^^= \\to, rightward arrow
+021D2^⇒^\\Rightarrow^\\Rightarrow^R^mathrel^^rightward double arrow
+0222B^∫^\\int^\\int^L^mathop^^INTEGRAL operator
+0002E^.^.^\\period^P^mathalpha^^FULL STOP, period
+1D6FC^\U0001d6fc^\\alpha^\\mitalpha^A^mathalpha^^MATHEMATICAL ITALIC SMALL ALPHA
+not a symbol line
+'''
+
+
+@pytest.fixture
+def symbols_file(tmp_path):
+    filename = tmp_path / 'unimathsymbols.txt'
+    filename.write_text(SYMBOLS, encoding='utf-8')
+    return str(filename)
+
+
+def _commands(entries):
+    return [command for command, _, _ in entries]
+
+
+def test_build(symbols_file):
+    index = SymbolIndex.build(symbols_file)
+    assert _commands(index.entries) == [
+        '\\alpha', '\\alphaup', '\\gets', '\\int', '\\leftarrow', '\\mitalpha', '\\period', '\\Rightarrow',
+        '\\rightarrow', '\\to', '\\upalpha']
+    # the first entry of a command wins, aliases get the character of their line
+    assert index.entries[0] == ('\\alpha', 'α', '= \\alphaup (kpfonts), alpha, greek')
+    assert index.entries[2][:2] == ('\\gets', '←')
+
+
+def test_search_prefix(symbols_file):
+    index = SymbolIndex.build(symbols_file)
+    # with or without backslash, case-insensitive, shortest first
+    assert _commands(index.search('\\al'))[:2] == ['\\alpha', '\\alphaup']
+    assert _commands(index.search('righ'))[:2] == ['\\Rightarrow', '\\rightarrow']
+    assert _commands(index.search('int', limit=1)) == ['\\int']
+    assert len(index.search('', limit=None)) == len(index)
+    assert len(index.search('', limit=3)) == 3
+
+
+def test_search_fuzzy(symbols_file):
+    index = SymbolIndex.build(symbols_file)
+    # words of the description, and misspellings
+    assert _commands(index.search('integral')) == ['\\int']
+    assert _commands(index.search('intgral')) == ['\\int']
+    assert '\\leftarrow' in _commands(index.search('leftward'))
+    assert _commands(index.search('xyzzy')) == []
+
+
+def test_save_load(symbols_file, tmp_path):
+    cache_file = str(tmp_path / 'symbols.idx')
+    index = SymbolIndex.load(symbols_file, cache_file)
+    assert os.path.isfile(cache_file)
+    loaded = SymbolIndex.load(symbols_file, cache_file)
+    assert loaded.entries == index.entries
+    assert _commands(loaded.search('intgral')) == ['\\int']
+
+    # the index is rebuilt if the symbols file changes
+    with open(symbols_file, 'a', encoding='utf-8') as f:
+        f.write('0222C^∬^\\iint^\\iint^L^mathop^^DOUBLE INTEGRAL operator\n')
+    st = os.stat(symbols_file)
+    os.utime(symbols_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert '\\iint' in _commands(SymbolIndex.load(symbols_file, cache_file).entries)
+    assert '\\iint' in _commands(SymbolIndex.load(symbols_file, cache_file).entries)
+
+
+def test_load_mtime(symbols_file, tmp_path, monkeypatch):
+    cache_file = str(tmp_path / 'symbols.idx')
+    builds = []
+    build = SymbolIndex.build.__func__
+    monkeypatch.setattr(SymbolIndex, 'build', classmethod(lambda cls, fn: builds.append(fn) or build(cls, fn)))
+    SymbolIndex.load(symbols_file, cache_file)
+    SymbolIndex.load(symbols_file, cache_file)
+    assert len(builds) == 1
+    # a new modification time alone invalidates the cached index
+    st = os.stat(symbols_file)
+    os.utime(symbols_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    SymbolIndex.load(symbols_file, cache_file)
+    SymbolIndex.load(symbols_file, cache_file)
+    assert len(builds) == 2
+
+
+def test_load_invalid_cache(symbols_file, tmp_path):
+    cache_file = tmp_path / 'symbols.idx'
+    cache_file.write_bytes(b'EQZSYM garbage')
+    assert len(SymbolIndex.load(symbols_file, str(cache_file))) == 11
+
+
+def test_load_without_symbols_file(symbols_file, tmp_path):
+    cache_file = str(tmp_path / 'symbols.idx')
+    SymbolIndex.load(symbols_file, cache_file)
+    os.unlink(symbols_file)
+    # the cached index is used as it is
+    assert len(SymbolIndex.load(symbols_file, cache_file)) == 11
+    # without one the index is empty
+    index = SymbolIndex.load(symbols_file, str(tmp_path / 'missing.idx'))
+    assert len(index) == 0
+    assert index.search('int') == []